@@ -0,0 +1,144 @@
+import os
+import sys
+import socket
+import threading
+import time
+
+# Beacon format and defaults are shared with the server
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Server'))
+from protocol import DEFAULT_PORT
+from beacon import BeaconView, MAX_DATAGRAM
+
+# A lobby disappears from the browser when its server hasn't mentioned it for
+# this long (full snapshots come every few seconds, see beacon_full_every)
+LOBBY_TTL = 15.0
+# How often expired lobbies are swept out, also the longest recvfrom() wait
+SWEEP_INTERVAL = 1.0
+# Wait before trying the discovery port again if it can't be bound
+BIND_RETRY = 5.0
+
+
+class DiscoveryListener:
+    """Keeps one UDP socket open and tracks every lobby announced on the LAN.
+
+    Lobbies live in a dict keyed by (ip, code) and are evicted after
+    LOBBY_TTL of silence. on_change(updated, removed) is called from the
+    listener thread with only what changed: lobby dicts that are new or
+    different, and (ip, code) keys that went away.
+    """
+    def __init__(self, port=DEFAULT_PORT, ttl=LOBBY_TTL):
+        self.port = port
+        self.ttl = ttl
+        self.on_change = None
+        self.view = BeaconView() # server snapshots and deltas, only touched by the listener thread
+        self.found = {} # (ip, code) -> lobby dict
+        self.legacy_seen = {} # (ip, code) -> last beacon from an old one-datagram-per-lobby server
+        self.lock = threading.Lock()
+        self.thread = None
+        self.running = False
+
+    def start(self):
+        if self.thread:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def snapshot(self):
+        """Every lobby currently known."""
+        with self.lock:
+            return list(self.found.values())
+
+    def open_socket(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        # Allow multiple clients to bind to the same port on the same machine (essential for local testing)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind(("", self.port))
+        except OSError as e:
+            print(f"Warning: Could not bind to discovery port: {e}")
+            sock.close()
+            return None
+        sock.settimeout(SWEEP_INTERVAL)
+        return sock
+
+    def run(self):
+        sock = None
+        next_sweep = time.monotonic() + SWEEP_INTERVAL
+        while self.running:
+            if sock is None:
+                sock = self.open_socket()
+                if sock is None:
+                    time.sleep(BIND_RETRY)
+                    continue
+            try:
+                data, addr = sock.recvfrom(MAX_DATAGRAM)
+                self.handle_datagram(addr[0], data)
+            except socket.timeout:
+                pass
+            except OSError as e:
+                print(f"Discovery Error: {e}")
+                sock.close()
+                sock = None
+            except Exception as e:
+                print(f"Discovery Error: {e}") # one bad datagram shouldn't stop discovery
+            now = time.monotonic()
+            if now >= next_sweep:
+                self.sweep(now)
+                next_sweep = now + SWEEP_INTERVAL
+        if sock:
+            sock.close()
+
+    def handle_datagram(self, ip, data):
+        now = time.monotonic()
+        if data.startswith(b"IMPOSTOR_GAME:"):
+            parts = data.decode(errors="ignore").split(":")
+            key = (ip, parts[1])
+            info = {"ip": ip, "code": parts[1], "host": parts[2] if len(parts) > 2 else "Unknown"}
+            with self.lock:
+                self.legacy_seen[key] = now
+                if self.found.get(key) == info:
+                    return
+                self.found[key] = info
+            self.publish([info], [])
+            return
+
+        changes = self.view.feed(ip, data, now)
+        if not changes:
+            return
+        updated = []
+        removed = []
+        with self.lock:
+            for code, info in changes:
+                key = (ip, code)
+                if info is None:
+                    if self.found.pop(key, None) is not None:
+                        removed.append(key)
+                else:
+                    self.found[key] = info
+                    updated.append(info)
+        self.publish(updated, removed)
+
+    def sweep(self, now):
+        """Evicts lobbies whose server (or legacy beacon) has gone quiet."""
+        last_seen = self.view.last_seen
+        removed = []
+        with self.lock:
+            for key, info in list(self.found.items()):
+                server_id = info.get("server_id")
+                seen = self.legacy_seen.get(key) if server_id is None else last_seen.get((key[0], server_id))
+                if seen is None or now - seen > self.ttl:
+                    del self.found[key]
+                    self.legacy_seen.pop(key, None)
+                    removed.append(key)
+        self.view.expire(self.ttl, now)
+        if removed:
+            self.publish([], removed)
+
+    def publish(self, updated, removed):
+        if self.on_change and (updated or removed):
+            self.on_change(updated, removed)
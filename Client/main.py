@@ -15,7 +15,7 @@ from ui.main_menu import MainMenu
 
 # Import MSG_GAME_OVER locally if not imported or rely on string if network_client exports it.
 # Check imports above... missing MSG_GAME_OVER in imports from network_client
-from network_client import NetworkClient, MSG_LOGIN, MSG_GAME_START, MSG_CLUE, MSG_STATE_UPDATE, MSG_ERROR, MSG_CREATE_GAME, MSG_VOTE, MSG_GAME_OVER
+from network_client import NetworkClient, MSG_LOGIN, MSG_GAME_START, MSG_CLUE, MSG_STATE_UPDATE, MSG_ERROR, MSG_CREATE_GAME, MSG_JOIN_GAME, MSG_VOTE, MSG_GAME_OVER, MSG_REDIRECT, MSG_LOBBY_DELTA, MSG_SYNC, MSG_RESUME_SUCCESS, ERR_SESSION_EXPIRED
 
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
@@ -34,6 +34,8 @@ class App(ctk.CTk):
         self.network = NetworkClient()
         self.network.on_message_callback = self.handle_network_message
         self.network.on_disconnect_callback = self.handle_disconnect
+        self.network.on_reconnecting_callback = self.handle_reconnecting
+        self.reset_lobby_version()
         
         self.container = ctk.CTkFrame(self)
         self.container.pack(fill="both", expand=True)
@@ -83,30 +85,42 @@ class App(ctk.CTk):
              self.update_idletasks() # Force UI update
 
         # 1. Connect first
-        success, err = self.network.connect(ip, 5555, nickname)
+        success, err = self.network.connect(ip, 5555, nickname, bind=code)
         if not success:
              print(f"Connection Failed: {err}")
              if self.frames.get("MainMenu"):
                  self.frames["MainMenu"].set_status(f"Error: {err}")
              return
 
-        # 2. If 'code' is provided (Join), send JOIN_GAME. 
-        #    We wait for LOGIN_SUCCESS to send the actual request to avoid packet sticking
-        #    since we don't have advanced framing.
-        pass
+        self.reset_lobby_version()
 
-    def scan_servers(self):
-        # Run in thread to not freeze UI
-        def scan():
-            servers = self.network.find_servers()
-            self.after(0, lambda: self.frames["MainMenu"].update_server_list(servers))
-        threading.Thread(target=scan, daemon=True).start()
+        # 2. Frames are length-prefixed, so the lobby request can be pipelined
+        #    right behind LOGIN; NetworkClient holds it until LOGIN_SUCCESS
+        #    brings the session key.
+        if self.is_host:
+            msg = {"type": MSG_CREATE_GAME, "nickname": nickname}
+            if getattr(self, 'game_settings', None):
+                msg["settings"] = self.game_settings
+            self.network.send(msg)
+        else:
+            self.network.send({"type": MSG_JOIN_GAME, "code": code, "nickname": nickname})
+
+    def start_discovery(self):
+        # The listener runs in its own thread; UI updates go through the main loop
+        def on_change(updated, removed):
+            self.after(0, lambda: self.frames["MainMenu"].apply_server_changes(updated, removed))
+        self.network.start_discovery(on_change)
+
+    def reset_lobby_version(self):
+        # Lobby version we're up to (None until the first full player list)
+        self.lobby_version = None
+        self.sync_requested = False
 
     def start_game_request(self):
         self.network.send({"type": MSG_GAME_START})
         
     def leave_game(self):
-        self.network.disconnect()
+        self.network.leave()
         self.show_frame("MainMenu")
 
     def send_clue(self, clue):
@@ -120,17 +134,21 @@ class App(ctk.CTk):
         m_type = msg.get("type")
         
         if m_type == "LOGIN_SUCCESS":
-            # 1. Login to Server OK. Now Create or Join Lobby.
+            # 1. Login to Server OK. The Create/Join request is already on its way.
             if self.frames.get("MainMenu"):
                  self.frames["MainMenu"].set_status("Login OK. Joining Lobby...")
-            
-            if self.is_host:
-                 msg = {"type": MSG_CREATE_GAME, "nickname": self.my_nickname}
-                 if hasattr(self, 'game_settings') and self.game_settings:
-                     msg["settings"] = self.game_settings
-                 self.network.send(msg)
+
+        elif m_type == MSG_REDIRECT:
+            # The lobby lives on another server shard: reconnect there and join again
+            success, err = self.network.redirect(msg.get("port"))
+            if not success:
+                self.show_toast(f"Error: {err}", color="#FF5555")
+                return
+            self.reset_lobby_version()
+            if self.network.resume_pending:
+                self.network.send_resume()
             else:
-                 self.network.send({"type": "JOIN_GAME", "code": self.game_code, "nickname": self.my_nickname})
+                self.network.send({"type": MSG_JOIN_GAME, "code": msg.get("code"), "nickname": self.my_nickname})
 
         elif m_type == "JOIN_SUCCESS":
             # 2. Joined Lobby OK. Switch to Lobby UI.
@@ -158,6 +176,8 @@ class App(ctk.CTk):
                 players = msg.get("players", [])
                 host = msg.get("host")
                 self.frames["LobbyFrame"].update_players(players, host)
+                self.lobby_version = msg.get("version")
+                self.sync_requested = False
                 info = msg.get("info")
                 if info:
                     self.frames["LobbyFrame"].set_status(info)
@@ -165,11 +185,17 @@ class App(ctk.CTk):
             elif phase == "CLUE_PHASE":
                 current_turn = msg.get("current_turn")
                 self.show_frame("GameFrame") # Ensure we are on game frame
-                self.frames["GameFrame"].set_turn(current_turn, current_turn == self.my_nickname)
+                self.frames["GameFrame"].set_turn(current_turn, current_turn == self.my_nickname, msg.get("time_limit"))
             elif phase == "VOTING":
                 candidates = msg.get("candidates")
                 self.show_frame("GameFrame")
-                self.frames["GameFrame"].setup_voting(candidates)
+                self.frames["GameFrame"].setup_voting(candidates, msg.get("time_limit"))
+
+        elif m_type == MSG_LOBBY_DELTA:
+            self.apply_lobby_delta(msg)
+
+        elif m_type == MSG_RESUME_SUCCESS:
+            self.restore_session(msg)
 
         elif m_type == MSG_GAME_START:
             role = msg.get("role")
@@ -186,6 +212,10 @@ class App(ctk.CTk):
         elif m_type == MSG_ERROR:
             err = msg.get("message")
             print(f"Server Error: {err}") 
+            if err == ERR_SESSION_EXPIRED:
+                # Back too late, the seat is gone
+                self.network.disconnect()
+                return
             self.show_toast(f"Error: {err}", color="#FF5555")
 
         elif m_type == MSG_GAME_OVER:
@@ -197,6 +227,53 @@ class App(ctk.CTk):
             # Show game over dialog
             self.show_game_over_dialog(winner, reason, imposter, word)
 
+    def restore_session(self, msg):
+        """Redraws the lobby or the running game from a RESUME_SUCCESS snapshot."""
+        self.my_nickname = msg.get("nickname")
+        self.game_code = msg.get("code")
+        lobby = self.frames["LobbyFrame"]
+        lobby.set_code(self.game_code)
+        lobby.update_players(msg.get("players", []), msg.get("host"))
+        self.lobby_version = msg.get("version")
+        self.sync_requested = False
+
+        state = msg.get("state")
+        if state not in ("PLAYING", "VOTING"):
+            self.show_frame("LobbyFrame")
+            lobby.set_status("Reconnected!")
+            return
+
+        game = self.frames["GameFrame"]
+        self.show_frame("GameFrame")
+        game.clear_log()
+        game.setup_game(msg.get("role"), msg.get("word"))
+        for sender, clue in msg.get("clues", []):
+            game.log(f"{sender}: {clue}")
+        if state == "PLAYING":
+            current_turn = msg.get("current_turn")
+            game.set_turn(current_turn, current_turn == self.my_nickname)
+        elif msg.get("voted"):
+            game.set_status("Reconnected. Waiting for the other votes...")
+        else:
+            game.setup_voting(msg.get("candidates", []))
+
+    def apply_lobby_delta(self, msg):
+        version = msg.get("version")
+        current = self.lobby_version
+        if current is not None and version <= current:
+            return # already covered by a newer full list
+        if current is None or version != current + 1:
+            # Missed one: ask for the whole list once instead of guessing
+            if not self.sync_requested:
+                self.sync_requested = True
+                self.network.send({"type": MSG_SYNC})
+            return
+        self.lobby_version = version
+        self.frames["LobbyFrame"].apply_delta(msg.get("joined"), msg.get("left"), msg.get("host"))
+        info = msg.get("info")
+        if info:
+            self.frames["LobbyFrame"].set_status(info)
+
     def show_game_over_dialog(self, winner, reason, imposter, word):
         # Create a top level window
         dialog = ctk.CTkToplevel(self)
@@ -244,6 +321,9 @@ class App(ctk.CTk):
     def send_vote(self, suspect):
         self.network.send({"type": MSG_VOTE, "suspect": suspect})
 
+    def handle_reconnecting(self, attempt):
+        self.after(0, lambda: self.show_toast(f"Connection lost. Reconnecting (attempt {attempt})...", duration=2000))
+
     def handle_disconnect(self):
         print("Disconnected!")
         self.show_toast("Disconnected from server", color="#FF5555")
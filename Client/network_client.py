@@ -1,23 +1,29 @@
+import os
+import random
+import sys
 import socket
 import threading
-import json
-import base64
-import hashlib
+import time
 from cryptography.fernet import Fernet
 
-# Replicating Protocol constants here to avoid import issues 
-# if Client is run separately (though we could share the file)
-MSG_LOGIN = "LOGIN"
-MSG_CREATE_GAME = "CREATE_GAME"
-MSG_GAME_START = "GAME_START"
-MSG_CLUE = "CLUE"
-MSG_VOTE = "VOTE"
-MSG_STATE_UPDATE = "STATE_UPDATE"
-MSG_GAME_OVER = "GAME_OVER"
-MSG_ERROR = "ERROR"
+# The wire protocol (constants, framing, encryption) is shared with the server
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Server'))
+from protocol import (
+    MSG_LOGIN, MSG_CREATE_GAME, MSG_JOIN_GAME, MSG_GAME_START, MSG_CLUE, MSG_VOTE,
+    MSG_STATE_UPDATE, MSG_GAME_OVER, MSG_ERROR, MSG_REDIRECT, MSG_LOBBY_DELTA, MSG_SYNC,
+    MSG_RESUME, MSG_RESUME_SUCCESS, MSG_LEAVE, MSG_SPECTATE, FEATURE_LOBBY_DELTAS, ERR_SESSION_EXPIRED,
+    DEFAULT_PORT, BUFFER_SIZE,
+    FrameDecoder, get_protocol_key, pack_message, decrypt_message,
+    JSON_CODEC, CODECS, PREFERRED_CODECS, offer_session, complete_session, open_feed, is_feed_frame,
+)
+from discovery import DiscoveryListener
 
-DEFAULT_PORT = 5555
-BUFFER_SIZE = 4096
+# After a drop we reconnect with "full jitter" backoff: a random wait below
+# min(RECONNECT_CAP, RECONNECT_BASE * 2^attempt), for up to RECONNECT_WINDOW
+# (the server holds our seat for resume_grace_seconds, 30 by default)
+RECONNECT_BASE = 0.25
+RECONNECT_CAP = 5.0
+RECONNECT_WINDOW = 30.0
 
 class NetworkClient:
     def __init__(self):
@@ -27,116 +33,100 @@ class NetworkClient:
         self.running = False
         self.on_message_callback = None # Function to call when message received
         self.on_disconnect_callback = None
+        self.on_reconnecting_callback = None # called with the attempt number while we try to resume
         
-        # Hardcoded match with Server
-        key_source = "IMPOSTOR_GAME_GLOBAL_SECURE_KEY_2026"
-        self.global_key = base64.urlsafe_b64encode(hashlib.sha256(key_source.encode()).digest())
+        self.global_key = get_protocol_key()
+        self.send_lock = threading.Lock()
+        self.key_exchange = None # set while waiting for the server's half of the session key
+        self.pending = [] # messages sent before the session key was ready
+        self.resume_info = None # (code, nickname, token) from JOIN_SUCCESS / RESUME_SUCCESS
+        self.resume_pending = False # RESUME sent, answer not in yet
+        self.spectating = False
+        self.feed_cipher = None # opens the lobby's shared spectator frames (session keys only)
+        self.reconnecting = False
+        self.discovery = DiscoveryListener()
 
-    def connect(self, ip, port, nickname):
-        """Connects to server. Lobby join happens via messages later."""
+    def connect(self, ip, port, nickname, bind=None):
+        """Connects to server. Lobby join happens via messages later.
+
+        'bind' ties the session key to the lobby code we're about to join.
+        """
         try:
-            self.cipher = Fernet(self.global_key)
+            self.cipher = Fernet(self.global_key) # only until LOGIN_SUCCESS brings the session key
+            self.codec = JSON_CODEC # switched if the server accepts our offer
+            self.bind = bind
+            self.key_exchange, session_offer = offer_session(bind)
+            self.pending = []
+            self.spectating = False
+            self.feed_cipher = None
             
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.sock.connect((ip, port))
+            self.server_ip = ip
+            self.server_port = port
             self.running = True
             
             # Start listener thread
-            thread = threading.Thread(target=self.listen_loop, daemon=True)
+            thread = threading.Thread(target=self.listen_loop, args=(self.sock,), daemon=True)
             thread.start()
 
             # Send Login (Initial Handshake)
-            self.send({
+            self.send_now({
                 "type": MSG_LOGIN,
-                "nickname": nickname
+                "nickname": nickname,
+                "codecs": PREFERRED_CODECS,
+                "features": [FEATURE_LOBBY_DELTAS],
+                **session_offer
             })
             self.nickname = nickname
             return True, None
         except Exception as e:
             return False, str(e)
 
-    def find_servers(self, timeout=3.0):
-        """Listens for UDP beacons. Returns list of (ip, code)."""
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        # Allow multiple clients to bind to the same port on the same machine (essential for local testing)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        try:
-            sock.bind(("", DEFAULT_PORT))
-        except OSError as e:
-            print(f"Warning: Could not bind to discovery port: {e}")
-            return []
-            
-        sock.settimeout(timeout)
-        
-        found_servers = [] # List of dicts
-        
-        # We just listen for 'timeout' seconds
-        import time
-        end_time = time.time() + timeout
-        
-        while time.time() < end_time:
-            try:
-                data, addr = sock.recvfrom(1024)
-                msg = data.decode()
-                if msg.startswith("IMPOSTOR_GAME:"):
-                    parts = msg.split(":")
-                    code = parts[1]
-                    host = parts[2] if len(parts) > 2 else "Unknown"
-                    
-                    server_info = {"ip": addr[0], "code": code, "host": host}
-                    # Avoid duplicates (check code/ip)
-                    # We use a tuple key for checking
-                    existing = False
-                    for s in found_servers:
-                        if s["code"] == code and s["ip"] == addr[0]:
-                           existing = True
-                           break
-                    if not existing:
-                        found_servers.append(server_info)
-            except socket.timeout:
-                break
-            except Exception:
-                pass
-        
-        sock.close()
-        return found_servers
-        try:
-            sock.bind(("", DEFAULT_PORT))
-        except OSError as e:
-            print(f"Warning: Could not bind to discovery port: {e}")
-            return []
-            
-        sock.settimeout(timeout)
-        
-        found_servers = [] # List of dicts
-        
-        start_time = threading.Timer(timeout, lambda: None)
-        # We just listen for 'timeout' seconds
-        import time
-        end_time = time.time() + timeout
-        
-        while time.time() < end_time:
+    def start_discovery(self, on_change=None):
+        """Starts (once) the background LAN listener; on_change gets incremental updates."""
+        if on_change:
+            self.discovery.on_change = on_change
+        self.discovery.start()
+
+    def find_servers(self):
+        """Lobbies seen on the LAN so far (never blocks). Returns list of dicts."""
+        self.discovery.start()
+        return self.discovery.snapshot()
+
+    def redirect(self, port):
+        """Moves to another server shard (same host) without reporting a disconnect."""
+        old_sock = self.sock
+        self.sock = None
+        if old_sock:
             try:
-                data, addr = sock.recvfrom(1024)
-                msg = data.decode()
-                if msg.startswith("IMPOSTOR_GAME:"):
-                    code = msg.split(":")[1]
-                    server_info = {"ip": addr[0], "code": code}
-                    if server_info not in found_servers:
-                        found_servers.append(server_info)
-            except socket.timeout:
-                break
-            except Exception:
+                old_sock.shutdown(socket.SHUT_RDWR)
+                old_sock.close()
+            except:
                 pass
-        
-        sock.close()
-        return found_servers
+        return self.connect(self.server_ip, port, self.nickname, self.bind)
+
+    def spectate(self, code):
+        """Watches a lobby instead of joining it: public events only, no seat."""
+        self.send({"type": MSG_SPECTATE, "code": code})
 
+    def leave(self):
+        """Leaves the lobby on purpose (the server frees our seat at once) and disconnects."""
+        if (self.resume_info or self.spectating) and self.running:
+            self.send({"type": MSG_LEAVE})
+        self.disconnect()
 
     def disconnect(self):
         self.running = False
+        self.resume_info = None
+        self.reconnecting = False
         if self.sock:
+            try:
+                # close() alone doesn't end a recv() blocked in listen_loop, so
+                # the server would never see us leave
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
             try:
                 self.sock.close()
             except:
@@ -145,29 +135,112 @@ class NetworkClient:
             self.on_disconnect_callback()
 
     def send(self, data: dict):
+        with self.send_lock:
+            if self.key_exchange:
+                # Still waiting for LOGIN_SUCCESS; goes out under the session key
+                self.pending.append(data)
+                return
+            self.send_now(data)
+
+    def send_now(self, data: dict):
         if not self.sock:
             return
         try:
-            json_data = json.dumps(data).encode('utf-8')
-            encrypted = self.cipher.encrypt(json_data)
-            self.sock.sendall(encrypted)
+            self.sock.sendall(pack_message(data, self.cipher, self.codec))
         except Exception as e:
             print(f"Send Error: {e}")
 
-    def listen_loop(self):
-        while self.running:
+    def on_login_success(self, message):
+        """Switches codec and cipher as the server answered, then flushes what was queued."""
+        with self.send_lock:
+            if message.get("codec") in CODECS:
+                self.codec = CODECS[message["codec"]]
+            if self.key_exchange:
+                session_cipher = complete_session(self.key_exchange, message, self.bind)
+                if session_cipher:
+                    self.cipher = session_cipher
+                self.key_exchange = None
+            pending, self.pending = self.pending, []
+            for data in pending:
+                self.send_now(data)
+
+    def listen_loop(self, sock):
+        decoder = FrameDecoder()
+        while self.running and sock is self.sock:
             try:
-                data = self.sock.recv(BUFFER_SIZE)
+                data = sock.recv(BUFFER_SIZE)
                 if not data:
+                    if self.running and sock is self.sock:
+                        self.connection_lost() # the server hung up
                     break
                 
-                decrypted_data = self.cipher.decrypt(data)
-                message = json.loads(decrypted_data.decode('utf-8'))
-                
-                if self.on_message_callback:
-                    self.on_message_callback(message)
+                # One read may carry several messages, or only part of one
+                for frame in decoder.feed(data):
+                    # Spectator events come sealed under the lobby's shared feed key
+                    cipher = self.feed_cipher if self.feed_cipher and is_feed_frame(frame) else self.cipher
+                    message = decrypt_message(frame, cipher)
+                    if message.get("type") == "LOGIN_SUCCESS":
+                        self.on_login_success(message)
+                    elif message.get("type") == MSG_SPECTATE:
+                        self.spectating = True
+                        self.feed_cipher = open_feed(message.get("feed"))
+                    self.track_session(message)
+                    if self.on_message_callback:
+                        self.on_message_callback(message)
                     
             except Exception as e:
+                if sock is not self.sock or not self.running:
+                    break # Socket was replaced by redirect() or we closed it ourselves
                 print(f"Listen Error: {e}")
-                self.disconnect()
+                self.connection_lost()
                 break
+
+    def track_session(self, message):
+        """Remembers how to resume our seat, and gives up if the server won't have us back."""
+        m_type = message.get("type")
+        if m_type in ("JOIN_SUCCESS", MSG_RESUME_SUCCESS) and message.get("resume_token"):
+            self.resume_info = (message.get("code"), message.get("nickname"), message["resume_token"])
+            self.resume_pending = False
+        elif m_type == MSG_ERROR and self.resume_pending and message.get("message") == ERR_SESSION_EXPIRED:
+            self.resume_pending = False
+            self.resume_info = None
+
+    def send_resume(self):
+        code, nickname, token = self.resume_info
+        self.resume_pending = True
+        self.send({"type": MSG_RESUME, "code": code, "nickname": nickname, "token": token})
+
+    def connection_lost(self):
+        """The connection died under us: try to get our seat back, or report the disconnect."""
+        if not self.resume_info:
+            self.disconnect()
+            return
+        if not self.reconnecting:
+            self.reconnecting = True
+            threading.Thread(target=self.reconnect_loop, daemon=True).start()
+
+    def reconnect_loop(self):
+        code, nickname, token = self.resume_info
+        old_sock, self.sock = self.sock, None
+        if old_sock:
+            try:
+                old_sock.close()
+            except OSError:
+                pass
+        deadline = time.monotonic() + RECONNECT_WINDOW
+        attempt = 0
+        while self.reconnecting and time.monotonic() < deadline:
+            time.sleep(random.uniform(0, min(RECONNECT_CAP, RECONNECT_BASE * 2 ** attempt)))
+            attempt += 1
+            if not self.reconnecting:
+                return # disconnect() was called meanwhile
+            if self.on_reconnecting_callback:
+                self.on_reconnecting_callback(attempt)
+            success, err = self.connect(self.server_ip, self.server_port, nickname, bind=code)
+            if success:
+                # The server answers RESUME_SUCCESS or SESSION_EXPIRED from here on
+                self.reconnecting = False
+                self.send_resume()
+                return
+        if self.reconnecting:
+            self.disconnect()
@@ -99,11 +99,13 @@ class GameFrame(ctk.CTkFrame):
         lbl_text = ctk.CTkLabel(bubble, text=text, font=("Arial", 16), text_color="white", wraplength=350)
         lbl_text.pack(padx=15, pady=5)
 
-    def set_turn(self, current_player, is_me):
+    def set_turn(self, current_player, is_me, time_limit=None):
         self.my_turn = is_me
         self.vote_frame.pack_forget() # Ensure voting is hidden during clues
         if is_me:
-            self.set_status("It's YOUR turn! Give a clue.")
+            # The server skips the turn when the time limit runs out
+            self.set_status(f"It's YOUR turn! Give a clue within {time_limit}s." if time_limit
+                            else "It's YOUR turn! Give a clue.")
             self.entry_clue.configure(state="normal")
             self.btn_send.configure(state="normal")
         else:
@@ -111,8 +113,9 @@ class GameFrame(ctk.CTkFrame):
             self.entry_clue.configure(state="disabled")
             self.btn_send.configure(state="disabled")
 
-    def setup_voting(self, candidates):
-        self.set_status("VOTING PHASE - Choose the Imposter!")
+    def setup_voting(self, candidates, time_limit=None):
+        self.set_status(f"VOTING PHASE - Choose the Imposter! ({time_limit}s)" if time_limit
+                        else "VOTING PHASE - Choose the Imposter!")
         self.entry_clue.configure(state="disabled")
         self.btn_send.configure(state="disabled")
         
@@ -23,6 +23,10 @@ class LobbyFrame(ctk.CTkFrame):
         self.btn_leave = ctk.CTkButton(self, text="Leave Game", command=self.on_leave, fg_color="red")
         self.btn_leave.pack(pady=10)
 
+        self.current_player_list = []
+        self.current_host_name = None
+        self.player_labels = {} # nickname -> label, so deltas touch only one row
+
     def set_code(self, code):
         self.label_code.configure(text=f"Code: {code}")
         self.label_status.configure(text="")
@@ -31,29 +35,45 @@ class LobbyFrame(ctk.CTkFrame):
         self.label_status.configure(text=text)
 
     def update_players(self, player_list, host_name=None):
-        self.current_player_list = player_list
+        self.current_player_list = list(player_list)
         self.current_host_name = host_name
         self.refresh_player_list_ui()
         self.refresh_host_controls()
 
+    def apply_delta(self, joined=None, left=None, host=None):
+        """Patches the list from a LOBBY_DELTA instead of rebuilding it."""
+        if left in self.player_labels:
+            self.player_labels.pop(left).destroy()
+            self.current_player_list.remove(left)
+        if joined and joined not in self.player_labels:
+            self.current_player_list.append(joined)
+            self.player_labels[joined] = self.make_player_label(joined)
+        if host and host != self.current_host_name:
+            old_host, self.current_host_name = self.current_host_name, host
+            for name in (old_host, host):
+                if name in self.player_labels:
+                    self.player_labels[name].configure(text=self.player_text(name))
+        self.refresh_host_controls()
+
+    def player_text(self, name):
+        return name + " 👑" if name == self.current_host_name else name
+
+    def make_player_label(self, name):
+        lbl = ctk.CTkLabel(self.players_frame, text=self.player_text(name), font=("Arial", 16))
+        lbl.pack()
+        return lbl
+
     def refresh_player_list_ui(self):
         for widget in self.players_frame.winfo_children():
             widget.destroy()
-            
-        host = self.current_host_name
-        for p in self.current_player_list:
-            display_text = p
-            if p == host:
-                display_text += " 👑"
-            
-            lbl = ctk.CTkLabel(self.players_frame, text=display_text, font=("Arial", 16))
-            lbl.pack()
+
+        self.player_labels = {p: self.make_player_label(p) for p in self.current_player_list}
 
     def refresh_host_controls(self):
         # Called when player list updates OR when my nickname updates
         my_nick = self.controller.my_nickname
-        host = getattr(self, 'current_host_name', None)
-        players = getattr(self, 'current_player_list', [])
+        host = self.current_host_name
+        players = self.current_player_list
         
         is_me_host = (my_nick == host)
         
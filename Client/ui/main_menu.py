@@ -17,13 +17,13 @@ class MainMenu(ctk.CTkFrame):
         self.btn_create.pack(pady=10)
         
         # Auto-scan label instead of button
-        self.lbl_scan = ctk.CTkLabel(self, text="Scanning for games...", text_color="gray")
+        self.lbl_scan = ctk.CTkLabel(self, text="Listening for games on the LAN...", text_color="gray")
         self.lbl_scan.pack(pady=5)
         
         self.lbl_status = ctk.CTkLabel(self, text="", text_color="orange")
         self.lbl_status.pack(pady=5)
         
-        # Start auto-scan
+        # Start auto-scan (server_list_frame exists by the time this runs)
         self.after(1000, self.start_auto_scan)
         
         self.conn_frame = ctk.CTkFrame(self)
@@ -31,6 +31,7 @@ class MainMenu(ctk.CTkFrame):
         
         self.server_list_frame = ctk.CTkScrollableFrame(self.conn_frame, label_text="Found Games", height=150)
         self.server_list_frame.pack(fill="x")
+        self.server_buttons = {} # (ip, code) -> button
         
         self.entry_code = ctk.CTkEntry(self, placeholder_text="Manual Game Code")
         self.entry_code.pack(pady=5)
@@ -84,18 +85,18 @@ class MainMenu(ctk.CTkFrame):
         dialog.grab_set()      # Modal
 
     def start_auto_scan(self):
-        self.controller.scan_servers()
-        # Schedule next scan in 5 seconds
-        self.after(5000, self.start_auto_scan)
+        # One background listener for the whole session; it pushes changes as they arrive
+        self.controller.start_discovery()
 
-    def update_server_list(self, servers):
-        # Clear existing
-        for widget in self.server_list_frame.winfo_children():
-            widget.destroy()
-            
-        for srv in servers:
+    def apply_server_changes(self, updated, removed):
+        """Adds, relabels or removes only the buttons for lobbies that changed."""
+        for key in removed:
+            btn = self.server_buttons.pop(key, None)
+            if btn:
+                btn.destroy()
+
+        for srv in updated:
             code = srv['code']
-            ip = srv['ip']
             host = srv.get('host', 'Unknown')
             
             # Only show actual lobbies
@@ -103,11 +104,20 @@ class MainMenu(ctk.CTkFrame):
                 continue
                 
             text = f"{host}'s Game ({code})"
-            fg_color = None
-                
-            btn = ctk.CTkButton(self.server_list_frame, text=text, fg_color=fg_color,
-                                command=lambda s=srv: self.on_server_click(s))
-            btn.pack(pady=2, fill="x")
+            if "players" in srv:
+                text += f"  {srv['players']}/{srv['capacity']}"
+                if srv.get("state") != "WAITING":
+                    text += " - in game"
+
+            key = (srv['ip'], code)
+            btn = self.server_buttons.get(key)
+            if btn:
+                btn.configure(text=text, command=lambda s=srv: self.on_server_click(s))
+            else:
+                btn = ctk.CTkButton(self.server_list_frame, text=text,
+                                    command=lambda s=srv: self.on_server_click(s))
+                btn.pack(pady=2, fill="x")
+                self.server_buttons[key] = btn
 
     def on_server_click(self, server_info):
         code = server_info['code']
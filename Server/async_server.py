@@ -0,0 +1,121 @@
+import asyncio
+from protocol import *
+from logger import logger, log_event
+from client_handler import SessionHandler
+from metrics import metrics
+from spectators import fanout
+from timers import scheduler
+
+try:
+    import resource # Not available on Windows
+except ImportError:
+    resource = None
+
+# Accept backlog for the event loop engine. Large so connect storms don't get refused.
+ASYNC_BACKLOG = 4096
+
+class AsyncClientHandler(SessionHandler):
+    """Event-loop engine: one coroutine per connection instead of one thread.
+
+    Lobby methods queue outgoing messages synchronously; a writer task per
+    connection drains the queue and waits on that client's TCP window only.
+    """
+    def __init__(self, reader, writer, cipher):
+        SessionHandler.__init__(self, writer.get_extra_info("peername"), cipher)
+        self.reader = reader
+        self.writer = writer
+        self.wakeup = asyncio.Event()
+        self.writer_task = None
+
+    async def run(self):
+        log_event("connection_opened", "Connection from %(addr)s", addr=str(self.addr))
+        self.writer_task = asyncio.ensure_future(self.write_loop())
+        try:
+            while self.running:
+                data = await self.reader.read(BUFFER_SIZE)
+                if not data:
+                    break
+
+                if not self.process_data(data):
+                    break
+
+        except ConnectionResetError:
+            log_event("connection_reset", "Connection reset by %(addr)s", addr=str(self.addr))
+        except Exception as e:
+            logger.error(f"Error in client loop: {e}")
+        finally:
+            self.cleanup()
+
+    async def write_loop(self):
+        try:
+            while True:
+                await self.wakeup.wait()
+                self.wakeup.clear()
+                data = self.outbound.take_nowait()
+                if data:
+                    self.writer.write(data)
+                    metrics.inc("bytes_out", len(data))
+                    # Honour TCP backpressure for this client only
+                    await self.writer.drain()
+                if self.outbound.closed and not self.outbound.size:
+                    break
+        except (ConnectionError, OSError) as e:
+            log_event("send_failed", "Send to %(addr)s failed: %(error)s", addr=str(self.addr), error=str(e))
+            self.drop_connection()
+        finally:
+            self.writer.close()
+
+    def notify_writer(self):
+        self.wakeup.set()
+
+    def drop_connection(self):
+        self.running = False
+        self.writer.transport.abort()
+
+    def close_connection(self):
+        # The writer task flushes what's queued and then closes the stream
+        self.wakeup.set()
+        if self.writer_task is None or self.writer_task.done():
+            self.writer.close()
+
+
+def raise_fd_limit():
+    """Lifts the soft open-files limit to the hard limit so we can hold ~10k sockets."""
+    if resource is None:
+        return
+    try:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if hard == resource.RLIM_INFINITY or hard > soft:
+            target = hard if hard != resource.RLIM_INFINITY else 65536
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+            logger.info(f"Raised open-files limit from {soft} to {target}")
+    except (ValueError, OSError) as e:
+        logger.warning(f"Could not raise open-files limit: {e}")
+
+
+async def serve(cipher, port, extra_ports=(), reuse_port=False):
+    async def on_connect(reader, writer):
+        await AsyncClientHandler(reader, writer, cipher).run()
+
+    # Timeouts and spectator fan-out run on the loop like everything else
+    # that touches lobbies (and writers)
+    loop = asyncio.get_running_loop()
+    scheduler.dispatch = loop.call_soon_threadsafe
+    fanout.dispatch = loop.call_soon_threadsafe
+
+    servers = []
+    for listen_port, shared in [(port, reuse_port)] + [(p, False) for p in extra_ports]:
+        servers.append(await asyncio.start_server(on_connect, host="", port=listen_port,
+                                                  reuse_address=True, reuse_port=shared or None,
+                                                  backlog=ASYNC_BACKLOG))
+        logger.info(f"Server listening on port {listen_port} (asyncio engine)")
+    await asyncio.gather(*(server.serve_forever() for server in servers))
+
+
+def run_async_server(cipher, port=DEFAULT_PORT, extra_ports=(), reuse_port=False):
+    """Runs the asyncio engine until interrupted."""
+    raise_fd_limit()
+    try:
+        asyncio.run(serve(cipher, port, extra_ports, reuse_port))
+    except Exception as e:
+        logger.error(f"Server crashed: {e}")
@@ -0,0 +1,235 @@
+import os
+import struct
+import time
+from code_allocator import code_to_int, int_to_code
+
+# LAN discovery beacon. Instead of one datagram per lobby, every lobby is
+# packed into as few MTU-sized datagrams as possible:
+#   - a FULL snapshot every `full_every` ticks, split into numbered parts;
+#     when nothing changed since the last one the cached bytes are resent
+#     as is (no walk over the lobbies, no encoding). Entries are cached per
+#     lobby, so only lobbies that changed are ever encoded again.
+#   - in between, a DELTA with only the lobbies that changed, or nothing at
+#     all if none did
+# Receivers (BeaconView) apply a delta only on top of the snapshot it was
+# built against and in order; anything missed is repaired by the next FULL.
+#
+# Datagram: header, then entries.
+#   header: magic "IG", version, kind, server id, snapshot id, seq, parts, TCP port
+#           (seq is the part index for FULL, the delta number for DELTA)
+#   entry:  code (base 36 as uint32), players, capacity, state, host length, host
+
+BEACON_MAGIC = b"IG"
+BEACON_VERSION = 1
+KIND_FULL = 0
+KIND_DELTA = 1
+
+HEADER = struct.Struct("!2sBBIIHHH")
+ENTRY = struct.Struct("!IBBBB")
+# IPv4 + UDP headers off a 1500 byte Ethernet MTU: never fragment
+MAX_DATAGRAM = 1472
+MAX_HOST_BYTES = 32
+
+LOBBY_STATES = ("WAITING", "PLAYING", "VOTING", "GAME_OVER")
+STATE_TAGS = {state: tag for tag, state in enumerate(LOBBY_STATES)}
+STATE_REMOVED = 0xFF
+
+
+def encode_entry(code, players, capacity, state, host):
+    host_raw = host.encode("utf-8")[:MAX_HOST_BYTES]
+    return ENTRY.pack(code_to_int(code), min(players, 0xFF), min(capacity, 0xFF),
+                      STATE_TAGS.get(state, 0), len(host_raw)) + host_raw
+
+def encode_removed(code):
+    return ENTRY.pack(code_to_int(code), 0, 0, STATE_REMOVED, 0)
+
+def lobby_entry(code, lobby):
+    """Encoded entry for a live lobby, or a removal marker for a gone one."""
+    if lobby is None:
+        return encode_removed(code)
+    return encode_entry(code, len(lobby.players), lobby.settings["max_players"],
+                        lobby.state, lobby.get_host_name())
+
+
+class BeaconEncoder:
+    """Turns the lobby table into datagrams, one tick at a time."""
+    def __init__(self, tcp_port, full_every=3, server_id=None):
+        self.tcp_port = tcp_port
+        self.full_every = max(1, full_every)
+        # Tells apart several servers (or shards, or restarts) behind one address
+        self.server_id = server_id if server_id is not None else struct.unpack("!I", os.urandom(4))[0]
+        self.ticks = 0
+        self.snapshot_id = 0
+        self.delta_seq = 0
+        self.full_cache = None # datagrams of the current snapshot
+        self.stale = True # something changed since full_cache was built
+        self.entries = None # code -> encoded entry, kept current from the change set
+
+    def tick(self, lobbies, changed_codes):
+        """Returns the datagrams to send this interval (maybe none).
+
+        'lobbies' is code -> Lobby; 'changed_codes' the codes added, changed
+        or removed since the previous tick.
+        """
+        changed_entries = self.update_entries(lobbies, changed_codes)
+        full_due = self.ticks % self.full_every == 0
+        self.ticks += 1
+        if full_due:
+            if self.stale or self.full_cache is None:
+                self.snapshot_id = (self.snapshot_id + 1) & 0xFFFFFFFF
+                self.delta_seq = 0
+                self.full_cache = self.pack(KIND_FULL, list(self.entries.values()))
+                self.stale = False
+            return self.full_cache
+        if not changed_entries:
+            return []
+        return self.pack(KIND_DELTA, changed_entries)
+
+    def update_entries(self, lobbies, changed_codes):
+        """Re-encodes only the changed lobbies; returns their entries (removals included)."""
+        if self.entries is None:
+            self.entries = {code: lobby_entry(code, lobby) for code, lobby in list(lobbies.items())}
+            self.stale = True
+        changed_entries = []
+        for code in changed_codes:
+            entry = lobby_entry(code, lobbies.get(code))
+            if code in lobbies:
+                self.entries[code] = entry
+            else:
+                self.entries.pop(code, None)
+            changed_entries.append(entry)
+        if changed_entries:
+            self.stale = True
+        return changed_entries
+
+    def pack(self, kind, entries):
+        # Greedy fill: as many entries per datagram as fit under the MTU
+        bodies = []
+        body = []
+        size = HEADER.size
+        for entry in entries:
+            if body and size + len(entry) > MAX_DATAGRAM:
+                bodies.append(body)
+                body = []
+                size = HEADER.size
+            body.append(entry)
+            size += len(entry)
+        if body or not bodies:
+            bodies.append(body) # an empty FULL still says "no lobbies"
+        datagrams = []
+        for index, body in enumerate(bodies):
+            if kind == KIND_FULL:
+                seq, parts = index, len(bodies)
+            else:
+                self.delta_seq = (self.delta_seq + 1) & 0xFFFF
+                seq, parts = self.delta_seq, 0
+            header = HEADER.pack(BEACON_MAGIC, BEACON_VERSION, kind, self.server_id,
+                                 self.snapshot_id, seq, parts, self.tcp_port)
+            datagrams.append(header + b"".join(body))
+        return datagrams
+
+
+def decode_datagram(data):
+    """Returns (kind, server_id, snapshot_id, seq, parts, tcp_port, entries) or None.
+
+    entries: list of (code, players, capacity, state, host); state is None
+    for a removed lobby.
+    """
+    if len(data) < HEADER.size or data[:2] != BEACON_MAGIC:
+        return None
+    magic, version, kind, server_id, snapshot_id, seq, parts, tcp_port = HEADER.unpack_from(data)
+    if version != BEACON_VERSION:
+        return None
+    entries = []
+    pos = HEADER.size
+    try:
+        while pos < len(data):
+            code, players, capacity, state, host_len = ENTRY.unpack_from(data, pos)
+            pos += ENTRY.size
+            host = data[pos:pos + host_len].decode("utf-8", "ignore")
+            pos += host_len
+            state = None if state == STATE_REMOVED else LOBBY_STATES[state] if state < len(LOBBY_STATES) else "UNKNOWN"
+            entries.append((int_to_code(code), players, capacity, state, host))
+    except struct.error:
+        return None
+    return kind, server_id, snapshot_id, seq, parts, tcp_port, entries
+
+
+class BeaconView:
+    """Receiver side: rebuilds every server's lobby table from its datagrams."""
+    def __init__(self):
+        self.servers = {} # (ip, server_id) -> {"snapshot", "delta", "port", "lobbies"}
+        self.assembling = {} # (ip, server_id) -> (snapshot_id, parts, {index: entries})
+        self.last_seen = {} # (ip, server_id) -> time of its last datagram
+
+    def feed(self, ip, data, now=None):
+        """Applies one datagram.
+
+        Returns the resulting changes as (code, lobby dict) pairs, None for a
+        lobby that went away; empty if nothing visible changed.
+        """
+        decoded = decode_datagram(data)
+        if decoded is None:
+            return []
+        kind, server_id, snapshot_id, seq, parts, tcp_port, entries = decoded
+        key = (ip, server_id)
+        self.last_seen[key] = time.monotonic() if now is None else now
+        current = self.servers.get(key)
+        if kind == KIND_FULL:
+            if current and current["snapshot"] == snapshot_id:
+                return [] # keepalive resend of what we already have
+            snapshot, total, received = self.assembling.get(key, (None, 0, None))
+            if snapshot != snapshot_id:
+                received = {}
+                self.assembling[key] = (snapshot_id, parts, received)
+            received[seq] = entries
+            if len(received) < parts:
+                return []
+            del self.assembling[key]
+            lobbies = {}
+            for part in received.values():
+                for entry in part:
+                    if entry[3] is not None:
+                        lobbies[entry[0]] = entry
+            old = current["lobbies"] if current else {}
+            self.servers[key] = {"snapshot": snapshot_id, "delta": 0, "port": tcp_port, "lobbies": lobbies}
+            changes = [(code, lobby_info(ip, server_id, tcp_port, entry))
+                       for code, entry in lobbies.items() if old.get(code) != entry]
+            changes.extend((code, None) for code in old if code not in lobbies)
+            return changes
+        if not current or current["snapshot"] != snapshot_id or seq != current["delta"] + 1:
+            return [] # built on a snapshot we don't have, or we missed one; wait for the next FULL
+        current["delta"] = seq
+        lobbies = current["lobbies"]
+        changes = []
+        for entry in entries:
+            code = entry[0]
+            if entry[3] is None:
+                if lobbies.pop(code, None) is not None:
+                    changes.append((code, None))
+            elif lobbies.get(code) != entry:
+                lobbies[code] = entry
+                changes.append((code, lobby_info(ip, server_id, current["port"], entry)))
+        return changes
+
+    def expire(self, max_age, now=None):
+        """Forgets servers silent for more than max_age seconds. Returns True if any were."""
+        now = time.monotonic() if now is None else now
+        gone = [key for key, seen in self.last_seen.items() if now - seen > max_age]
+        for key in gone:
+            del self.last_seen[key]
+            self.servers.pop(key, None)
+            self.assembling.pop(key, None)
+        return bool(gone)
+
+    def lobbies(self):
+        """Flat list of lobby dicts, as shown in the server browser."""
+        return [lobby_info(ip, server_id, server["port"], entry)
+                for (ip, server_id), server in self.servers.items()
+                for entry in server["lobbies"].values()]
+
+
+def lobby_info(ip, server_id, port, entry):
+    code, players, capacity, state, host = entry
+    return {"ip": ip, "server_id": server_id, "port": port, "code": code, "host": host,
+            "players": players, "capacity": capacity, "state": state}
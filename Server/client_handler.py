@@ -1,61 +1,98 @@
+import os
 import threading
 import socket
 import json
+import logging
+import time
 from protocol import *
-from logger import logger
-from game_manager import game_manager
+from logger import logger, log_event, queue_handler
+from game_manager import game_manager, LobbySettingsError
+from history import history
+from leaderboard import leaderboard, BOARDS, BOARD_GAMES
+from lobby_directory import DirectoryError
+from metrics import metrics
+from outbound import OutboundQueue, coalesce_key_for, DEFAULT_QUEUE_SIZE, POLICY_DROP, POLICY_COALESCE
 
-class ClientHandler(threading.Thread):
-    def __init__(self, conn, addr, cipher):
-        super().__init__()
-        self.conn = conn
+# How long a closing connection may spend flushing its queued messages
+WRITER_FLUSH_TIMEOUT = 2.0
+
+# Counter names per incoming message type, built once (unknown types share one
+# counter so clients can't blow up the registry)
+MESSAGE_COUNTERS = {t: f"messages_in.{t}" for t in (
+    MSG_LOGIN, MSG_CREATE_GAME, MSG_JOIN_GAME, MSG_GAME_START, MSG_CLUE, MSG_VOTE, MSG_STATS, MSG_SYNC,
+    MSG_RESUME, MSG_LEAVE, MSG_LEADERBOARD, MSG_QUICK_PLAY, MSG_LIST_LOBBIES, MSG_SPECTATE)}
+UNKNOWN_MESSAGE_COUNTER = "messages_in.UNKNOWN"
+
+# Lobbies a QUICK_PLAY tries (a seat can go between picking and joining)
+# before it gives up on the open ones and creates a lobby
+QUICK_PLAY_ATTEMPTS = 3
+
+# Admin requests are only answered on loopback
+LOCAL_ADDRESSES = ("127.0.0.1", "::1", "localhost")
+
+metrics.register_gauge("connections_active",
+                       lambda c: c.get("connections_opened", 0) - c.get("connections_closed", 0))
+metrics.register_gauge("lobbies_by_state", lambda c: game_manager.lobby_state_counts())
+metrics.register_gauge("log_records_dropped", lambda c: queue_handler.dropped)
+metrics.register_gauge("history", lambda c: {"written": history.written, "queued": history.queue.qsize(),
+                                            "dropped": history.dropped})
+
+class SessionHandler:
+    """Transport-agnostic message handling shared by every server engine.
+
+    Outgoing messages go through a bounded OutboundQueue; engines provide
+    the writer that drains it and override drop_connection() and
+    close_connection() for their transport (the defaults have none).
+    """
+    def __init__(self, addr, cipher):
         self.addr = addr
         self.cipher = cipher
+        self.codec = JSON_CODEC # until the client negotiates another at LOGIN
+        self.bound_code = None # lobby the session key was bound to, if any
+        self.lobby_deltas = False # LOBBY_DELTA instead of full player lists (negotiated at LOGIN)
         self.nickname = None
         self.lobby = None # Reference to current lobby
+        self.watching = None # lobby we're spectating (never at the same time as self.lobby)
+        # watching and the outbound policy change together, from lobby commands too
+        self.watch_lock = threading.Lock()
         self.running = True
-
-    def run(self):
-        logger.info(f"Connection from {self.addr}")
-        try:
-            while self.running:
-                # Read length prefix (4 bytes generic) or just Read chunks
-                # For simplicity with Python sockets, we'll try to read a reasonable buffer
-                # In a robust system we'd use length-prefixing or delimiters.
-                # Here we assume small JSON payloads < 4096 bytes for this simple game.
-                data = self.conn.recv(BUFFER_SIZE)
-                if not data:
-                    break
-                
-                try:
-                    # Attempt to decrypt
-                    message = decrypt_message(data, self.cipher)
-                    self.handle_message(message)
-                except Exception as e:
-                    logger.warning(f"Failed to decrypt or parse message from {self.addr}: {e}")
-                    # If we can't decrypt, they probably have the wrong code.
-                    # We might want to disconnect them immediately if it's the first message.
-                    if not self.nickname:
-                         self.send_error("Invalid Game Code or Encryption Error")
-                         break
-        
-        except ConnectionResetError:
-            logger.info(f"Connection reset by {self.addr}")
-        except Exception as e:
-            logger.error(f"Error in client loop: {e}")
-        finally:
-            self.cleanup()
+        self.decoder = FrameDecoder()
+        self.outbound = OutboundQueue(
+            game_manager.settings.get("outbound_queue_size", DEFAULT_QUEUE_SIZE),
+            game_manager.settings.get("outbound_overflow_policy", POLICY_DROP))
+        metrics.inc("connections_opened")
 
     def handle_message(self, message):
         msg_type = message.get("type")
+        metrics.inc(MESSAGE_COUNTERS.get(msg_type, UNKNOWN_MESSAGE_COUNTER))
         
         if msg_type == MSG_LOGIN:
             # Just handshake / set nickname on connection?
             # User flow: Connect -> Send Login -> Server Says OK -> User sends JOIN/CREATE
             nick = message.get("nickname")
             if nick:
+                reply = {"type": "LOGIN_SUCCESS", "nickname": nick}
+                session_fields, session_cipher = accept_session(message)
+                if session_fields:
+                    reply.update(session_fields)
+                    self.bound_code = message.get("bind")
+                elif not game_manager.settings.get("allow_legacy_crypto", True):
+                    self.send_error("This server requires a session key. Please update the game.")
+                    return
                 self.nickname = nick
-                self.send_message({"type": "LOGIN_SUCCESS", "nickname": nick})
+                # Old clients don't offer codecs and keep getting JSON
+                codec = choose_codec(message["codecs"]) if "codecs" in message else JSON_CODEC
+                if "codecs" in message:
+                    reply["codec"] = codec.name
+                if "features" in message:
+                    features = [f for f in SUPPORTED_FEATURES if f in message["features"]]
+                    self.lobby_deltas = FEATURE_LOBBY_DELTAS in features
+                    reply["features"] = features
+                # The reply still goes out under the old codec and cipher
+                self.send_message(reply)
+                self.codec = codec
+                if session_cipher:
+                    self.cipher = session_cipher
             else:
                 self.send_error("Invalid Nickname")
 
@@ -63,81 +100,430 @@ class ClientHandler(threading.Thread):
             if not self.nickname:
                 self.send_error("Login first")
                 return
+            if self.bound_code:
+                self.send_error("Session is bound to another lobby")
+                return
             
             # Create Lobby
             settings_override = message.get("settings", {})
-            code = game_manager.create_lobby(settings_override)
+            try:
+                code = game_manager.create_lobby(settings_override)
+            except LobbySettingsError as e:
+                self.send_error(str(e))
+                return
             lobby = game_manager.get_lobby(code)
             
             # Auto-join
-            success, result_data = lobby.add_player(self.nickname, self)
-            if success:
-                self.lobby = lobby
-                self.nickname = result_data # Update nickname in case of duplicate
-                # Tell client the code
-                self.send_message({
-                    "type": "JOIN_SUCCESS", 
-                    "code": code,
-                    "nickname": self.nickname,
-                    "lobby_state": "WAITING"
-                })
-            else:
-                self.send_error(result_data)
+            self.enter_lobby(lobby, {"lobby_state": "WAITING"})
+
+        elif msg_type == MSG_QUICK_PLAY:
+            if not self.nickname:
+                self.send_error("Login first")
+                return
+            if self.bound_code:
+                self.send_error("Session is bound to another lobby")
+                return
+            if self.lobby:
+                self.send_error("Already in a lobby")
+                return
+            self.quick_play(QUICK_PLAY_ATTEMPTS)
 
         elif msg_type == "JOIN_GAME": # String literal or constant? Use Protocol constant if exists or string
             code = message.get("code")
             if not code:
                 self.send_error("Missing Code")
                 return
+            if self.bound_code and code != self.bound_code:
+                self.send_error("Session is bound to another lobby")
+                return
+
+            redirect_port = game_manager.redirect_port_for(code)
+            if redirect_port is not None:
+                # Another shard owns this lobby
+                self.send_message({"type": MSG_REDIRECT, "code": code, "port": redirect_port})
+                return
             
             lobby = game_manager.get_lobby(code)
             if not lobby:
                 self.send_error("Lobby not found")
                 return
             
-            success, result_data = lobby.add_player(self.nickname, self)
-            if success:
-                self.lobby = lobby
-                self.nickname = result_data # Update nickname
-                self.send_message({
-                    "type": "JOIN_SUCCESS", 
-                    "code": code,
-                    "nickname": self.nickname
-                })
-            else:
-                self.send_error(result_data)
+            self.enter_lobby(lobby)
+
+        elif msg_type == MSG_RESUME:
+            # Reconnected after a drop: take the old seat back instead of joining
+            code = message.get("code")
+            if not self.nickname or not code:
+                self.send_error(ERR_SESSION_EXPIRED)
+                return
+            if self.bound_code and code != self.bound_code:
+                self.send_error("Session is bound to another lobby")
+                return
+            if self.lobby:
+                # Our seat there would never be released
+                self.send_error("Already in a lobby")
+                return
+
+            redirect_port = game_manager.redirect_port_for(code)
+            if redirect_port is not None:
+                self.send_message({"type": MSG_REDIRECT, "code": code, "port": redirect_port})
+                return
+
+            lobby = game_manager.get_lobby(code)
+            if not lobby:
+                self.send_error(ERR_SESSION_EXPIRED)
+                return
+            self.stop_watching()
+            self.lobby = lobby
+            lobby.submit(self.resume_command, lobby, message.get("nickname"), message.get("token"))
+
+        elif msg_type == MSG_SPECTATE:
+            code = message.get("code")
+            if not self.nickname:
+                self.send_error("Login first")
+                return
+            if not code:
+                self.send_error("Missing Code")
+                return
+            if self.bound_code and code != self.bound_code:
+                self.send_error("Session is bound to another lobby")
+                return
+            if self.lobby:
+                self.send_error("Already in a lobby")
+                return
+
+            redirect_port = game_manager.redirect_port_for(code)
+            if redirect_port is not None:
+                self.send_message({"type": MSG_REDIRECT, "code": code, "port": redirect_port})
+                return
 
+            lobby = game_manager.get_lobby(code)
+            if not lobby:
+                self.send_error("Lobby not found")
+                return
+            self.stop_watching()
+            lobby.submit(self.spectate_command, lobby)
+
+        elif msg_type == MSG_LEAVE:
+            self.stop_watching()
+            if self.lobby:
+                lobby, self.lobby = self.lobby, None
+                lobby.submit(self.leave_lobby, lobby, True)
+
+        # Everything that touches a lobby runs through its command queue, so
+        # one lobby's state machine never runs on two threads at once. The
+        # commands read self.nickname when they run (a join may rename us).
         elif msg_type == MSG_GAME_START:
             if self.lobby:
-                success, err = self.lobby.start_game(self.nickname)
-                if not success: self.send_error(err)
+                self.lobby.submit(self.start_game, self.lobby)
 
         elif msg_type == MSG_CLUE:
             if self.lobby:
-                self.lobby.handle_clue(self.nickname, message.get("clue"))
+                self.lobby.submit(self.give_clue, self.lobby, message.get("clue"))
 
         elif msg_type == MSG_VOTE:
             if self.lobby:
-                self.lobby.handle_vote(self.nickname, message.get("suspect"))
+                self.lobby.submit(self.cast_vote, self.lobby, message.get("suspect"))
+
+        elif msg_type == MSG_SYNC:
+            if self.lobby:
+                self.lobby.submit(self.send_snapshot, self.lobby)
+
+        elif msg_type == MSG_LEADERBOARD:
+            # Served from the in-memory boards, no database query
+            board = message.get("board") or BOARD_GAMES
+            if board not in BOARDS:
+                self.send_error(f"Unknown leaderboard: {board}")
+                return
+            limit = message.get("limit")
+            self.send_message({
+                "type": MSG_LEADERBOARD,
+                "board": board,
+                "entries": leaderboard.top(board, limit if isinstance(limit, int) else None),
+                "min_games": leaderboard.min_games,
+                "you": leaderboard.player(self.nickname, board) if self.nickname else None
+            })
+
+        elif msg_type == MSG_LIST_LOBBIES:
+            # Pages are cached already serialized; only the encryption is ours
+            try:
+                payload = game_manager.directory.payload(message, self.codec)
+            except DirectoryError as e:
+                self.send_error(str(e))
+                return
+            start = time.perf_counter()
+            packet = seal_payload(payload, self.cipher)
+            metrics.observe("encrypt_seconds", time.perf_counter() - start)
+            self.send_packet(packet)
+
+        elif msg_type == MSG_STATS:
+            # Admin: metrics snapshot, optionally also written to disk
+            if not self.addr or self.addr[0] not in LOCAL_ADDRESSES:
+                self.send_error("Stats are only available locally")
+                return
+            if message.get("dump"):
+                path = game_manager.settings.get("metrics_dump_file", "metrics_snapshot.json")
+                if not os.path.isabs(path):
+                    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+                snapshot = metrics.dump(path)
+                logger.info(f"Metrics snapshot written to {path}")
+            else:
+                snapshot = metrics.snapshot()
+            self.send_message({"type": MSG_STATS, "metrics": snapshot})
+
+    def enter_lobby(self, lobby, extra=None):
+        # Set right away so pipelined CLUE/VOTE/GAME_START queue up behind the join
+        self.stop_watching()
+        self.lobby = lobby
+        lobby.submit(self.join_command, lobby, extra or {})
+
+    def quick_play(self, attempts):
+        # The last attempt goes to a fresh lobby, which can't be full
+        lobby = game_manager.quick_play_lobby(fresh=attempts <= 1)
+        self.stop_watching()
+        self.lobby = lobby
+        lobby.submit(self.join_command, lobby, {"lobby_state": "WAITING", "quick_play": True}, attempts - 1)
+
+    def join_command(self, lobby, extra, retries=0):
+        success, result_data = lobby.add_player(self.nickname, self)
+        if success:
+            self.nickname = result_data # Update nickname in case of duplicate
+            self.send_message({
+                "type": "JOIN_SUCCESS", 
+                "code": lobby.code,
+                "nickname": self.nickname,
+                "resume_token": lobby.issue_resume_token(self.nickname),
+                **extra
+            })
+        else:
+            if self.lobby is lobby:
+                self.lobby = None
+            if retries > 0 and self.running:
+                # QUICK_PLAY: the lobby filled up or started meanwhile, try another
+                self.quick_play(retries)
+                return
+            self.send_error(result_data)
+
+    def resume_command(self, lobby, nickname, token):
+        success, result = lobby.resume_player(nickname, token, self)
+        if not success:
+            if self.lobby is lobby:
+                self.lobby = None
+            self.send_error(result)
+            return
+        self.nickname = nickname
+        self.send_message(lobby.resume_snapshot(nickname))
+
+    def spectate_command(self, lobby):
+        if self.lobby or self.outbound.closed:
+            return # joined somewhere (or hung up) meanwhile
+        success, result = lobby.add_spectator(self)
+        if not success:
+            self.send_error(result)
+            return
+        with self.watch_lock:
+            self.watching = lobby
+            # Spectators never stall anyone: behind on state updates, they only get the newest
+            self.outbound.policy = POLICY_COALESCE
+        message = lobby.spectator_snapshot()
+        if result:
+            message["feed"] = result
+        self.send_message(message)
+
+    def stop_watching(self):
+        with self.watch_lock:
+            lobby, self.watching = self.watching, None
+            if lobby is not None:
+                self.outbound.policy = game_manager.settings.get("outbound_overflow_policy", POLICY_DROP)
+        if lobby is not None:
+            lobby.spectators.remove(self)
+
+    def stopped_watching(self, feed):
+        """The feed let us go (its lobby closed).
+
+        Called on the fan-out worker, so the reset is queued on the lobby
+        like spectate_command rather than done here.
+        """
+        lobby = self.watching
+        if lobby is not None and lobby.spectators is feed:
+            lobby.submit(self.unwatch_command, lobby)
+
+    def unwatch_command(self, lobby):
+        with self.watch_lock:
+            if self.watching is not lobby:
+                return # stopped or moved on to another lobby meanwhile
+            self.watching = None
+            self.outbound.policy = game_manager.settings.get("outbound_overflow_policy", POLICY_DROP)
+
+    def start_game(self, lobby):
+        if self.lobby is lobby:
+            success, err = lobby.start_game(self.nickname)
+            if not success: self.send_error(err)
+
+    def give_clue(self, lobby, clue):
+        if self.lobby is lobby:
+            lobby.handle_clue(self.nickname, clue)
+
+    def cast_vote(self, lobby, suspect):
+        if self.lobby is lobby:
+            lobby.handle_vote(self.nickname, suspect)
+
+    def send_snapshot(self, lobby):
+        if self.lobby is lobby:
+            self.send_message(lobby.lobby_snapshot())
+
+    def leave_lobby(self, lobby, on_purpose=False):
+        if lobby.players.get(self.nickname) is self: # our join may have failed meanwhile
+            # A dropped connection mid-game keeps its seat for a while (see RESUME)
+            if on_purpose or not lobby.hold_seat(self.nickname):
+                lobby.remove_player(self.nickname)
+        # Check if lobby is empty
+        if not lobby.players:
+            game_manager.remove_lobby(lobby.code)
+
+    def process_data(self, data):
+        """Handles every complete frame in a chunk read from the socket.
+
+        Returns False when the connection should be closed.
+        """
+        metrics.inc("bytes_in", len(data))
+        try:
+            frames = self.decoder.feed(data)
+        except FrameError as e:
+            log_event("bad_frame", "Bad frame from %(addr)s: %(error)s", logging.WARNING, addr=str(self.addr), error=str(e))
+            return False
+
+        for frame in frames:
+            try:
+                # Attempt to decrypt
+                start = time.perf_counter()
+                message = decrypt_message(frame, self.cipher)
+                decrypted = time.perf_counter()
+                metrics.observe("decrypt_seconds", decrypted - start)
+                self.handle_message(message)
+                metrics.observe("handler_seconds", time.perf_counter() - decrypted)
+            except Exception as e:
+                log_event("bad_message", "Failed to decrypt or parse message from %(addr)s: %(error)s", logging.WARNING,
+                          addr=str(self.addr), error=str(e))
+                # If we can't decrypt, they probably have the wrong code.
+                # We might want to disconnect them immediately if it's the first message.
+                if not self.nickname:
+                    self.send_error("Invalid Game Code or Encryption Error")
+                    return False
+                if isinstance(e, SessionError):
+                    return False # tampered or replayed frame on a session key
+        return True
 
     def send_message(self, message_dict):
         try:
-            encrypted = encrypt_message(message_dict, self.cipher)
-            self.conn.sendall(encrypted)
+            start = time.perf_counter()
+            packet = pack_message(message_dict, self.cipher, self.codec)
+            metrics.observe("encrypt_seconds", time.perf_counter() - start)
         except Exception as e:
             logger.error(f"Failed to send to {self.nickname}: {e}")
+            return
+        self.send_packet(packet, coalesce_key_for(message_dict))
+
+    def send_packet(self, packet, coalesce_key=None):
+        """Queues an already encrypted and framed message (shared by broadcasts).
+
+        Never blocks: a client that can't keep up is dropped (or has its state
+        updates coalesced, depending on outbound_overflow_policy).
+        """
+        if not self.outbound.put(packet, coalesce_key):
+            log_event("outbound_overflow", "Outbound queue full for %(nickname)s (%(addr)s). Dropping client.",
+                      logging.WARNING, nickname=self.nickname, addr=str(self.addr))
+            metrics.inc("outbound_overflows")
+            self.drop_connection()
+            return
+        metrics.inc("messages_out")
+        self.notify_writer()
+
+    def notify_writer(self):
+        """Wakes the writer after a put (the threaded queue wakes it by itself)."""
+        pass
+
+    def drop_connection(self):
+        """Aborts the connection; the read loop then runs the normal cleanup."""
+        self.running = False
+
+    def close_connection(self):
+        """Closes the transport once the queue is flushed (nothing to close here)."""
+        pass
 
     def send_error(self, error_msg):
         self.send_message({"type": MSG_ERROR, "message": error_msg})
 
+    def hang_up(self, error_msg):
+        """Sends a last error and closes the connection once it's flushed."""
+        self.send_error(error_msg)
+        self.outbound.close()
+        self.notify_writer()
+
     def cleanup(self):
         if self.lobby and self.nickname:
-            self.lobby.remove_player(self.nickname)
-            # Check if lobby is empty
-            if not self.lobby.players:
-                game_manager.remove_lobby(self.lobby.code)
+            self.lobby.submit(self.leave_lobby, self.lobby)
+        self.stop_watching()
+        self.outbound.close()
+        metrics.inc("connections_closed")
         try:
-            self.conn.close()
+            self.close_connection()
         except:
             pass
-        logger.info(f"Connection closed for {self.addr}")
+        log_event("connection_closed", "Connection closed for %(addr)s", addr=str(self.addr))
+
+
+class ClientHandler(SessionHandler, threading.Thread):
+    """Thread-per-connection engine: one blocking recv loop per socket."""
+    def __init__(self, conn, addr, cipher):
+        threading.Thread.__init__(self)
+        SessionHandler.__init__(self, addr, cipher)
+        self.conn = conn
+        self.writer_thread = threading.Thread(target=self.write_loop, daemon=True)
+
+    def run(self):
+        log_event("connection_opened", "Connection from %(addr)s", addr=str(self.addr))
+        self.writer_thread.start()
+        try:
+            while self.running:
+                data = self.conn.recv(BUFFER_SIZE)
+                if not data:
+                    break
+                if not self.process_data(data):
+                    break
+
+        except ConnectionResetError:
+            log_event("connection_reset", "Connection reset by %(addr)s", addr=str(self.addr))
+        except Exception as e:
+            logger.error(f"Error in client loop: {e}")
+        finally:
+            self.cleanup()
+
+    def write_loop(self):
+        """Drains the outbound queue; the only place that blocks on this socket."""
+        try:
+            while True:
+                data = self.outbound.take()
+                if data is None:
+                    # Closed and flushed (cleanup() or hang_up()): stop the read loop too
+                    self.drop_connection()
+                    break
+                self.conn.sendall(data)
+                metrics.inc("bytes_out", len(data))
+        except OSError as e:
+            log_event("send_failed", "Send to %(addr)s failed: %(error)s", addr=str(self.addr), error=str(e))
+            self.drop_connection()
+
+    def drop_connection(self):
+        self.running = False
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def close_connection(self):
+        # Give the writer a moment to flush what's queued (e.g. a final error)
+        if self.writer_thread.is_alive() and self.writer_thread is not threading.current_thread():
+            self.writer_thread.join(WRITER_FLUSH_TIMEOUT)
+        self.conn.close()
+
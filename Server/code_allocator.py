@@ -0,0 +1,98 @@
+import math
+import random
+import threading
+import time
+from collections import deque
+
+# Lobby codes are 6 characters of 0-9A-Z, i.e. base 36 numbers below 36^6.
+CODE_LENGTH = 6
+CODE_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+CODE_SPACE = 36 ** CODE_LENGTH
+
+# Released codes wait this long before they can be handed out again, so a
+# stale beacon entry or a bookmarked code never lands in somebody else's lobby
+DEFAULT_QUARANTINE = 300.0
+
+
+def code_to_int(code):
+    return int(code, 36)
+
+# Every two character chunk, so formatting a code is three lookups
+_PAIRS = tuple(a + b for a in CODE_ALPHABET for b in CODE_ALPHABET)
+
+def int_to_code(value):
+    high, low = divmod(value, 1296)
+    high, mid = divmod(high, 1296)
+    return _PAIRS[high] + _PAIRS[mid] + _PAIRS[low]
+
+
+class CodeSpaceExhausted(RuntimeError):
+    """Every code this allocator owns is in use or still in quarantine."""
+
+
+class CodeAllocator:
+    """Hands out unique lobby codes in O(1), no retries, no lookups.
+
+    Released codes are reused first, oldest first, once their quarantine is
+    over (so the free list stays as small as churn x quarantine). Otherwise a
+    counter walks a keyed pseudo-random permutation of this shard's slice of
+    the code space (codes whose base 36 value % shard_count == shard_index):
+    consecutive codes look random but can never collide. The permutation is a
+    4 round Feistel network like WordSampler's, but with mixed radix halves
+    (a x b just above the domain size, rounds add modulo the half size) so the
+    cycle walk back into range almost never takes a second step.
+    """
+    ROUNDS = 4
+
+    def __init__(self, shard_index=0, shard_count=1, seed=None, quarantine=DEFAULT_QUARANTINE):
+        self.shard_index = shard_index
+        self.shard_count = max(1, shard_count)
+        # How many codes belong to this shard
+        self.domain = (CODE_SPACE - shard_index + self.shard_count - 1) // self.shard_count
+        self.radix_a = max(2, math.isqrt(self.domain - 1) + 1)
+        self.radix_b = -(-self.domain // self.radix_a)
+        rng = random.Random(seed) if seed is not None else random.SystemRandom()
+        self.keys = tuple(rng.getrandbits(32) for _ in range(self.ROUNDS))
+        self.quarantine = quarantine
+        self.cursor = 0
+        self.released = deque() # (release time, code) in release order
+        self.lock = threading.Lock()
+
+    def _permute(self, i):
+        # i = left * b + right with left < a, right < b; the halves swap sizes
+        # every round and an even number of rounds brings them back
+        # (round function inlined: this is the whole cost of an allocation)
+        a, b = self.radix_a, self.radix_b
+        left, right = divmod(i, b)
+        for key in self.keys:
+            x = right ^ key
+            x = ((x ^ (x >> 16)) * 0x45D9F3B) & 0xFFFFFFFF
+            x = ((x ^ (x >> 16)) * 0x45D9F3B) & 0xFFFFFFFF
+            left, right = right, (left + (x ^ (x >> 16))) % a
+            a, b = b, a
+        return left * b + right
+
+    def _index_to_code(self, index):
+        # Cycle walking keeps the permutation inside [0, domain)
+        value = self._permute(index)
+        while value >= self.domain:
+            value = self._permute(value)
+        return int_to_code(value * self.shard_count + self.shard_index)
+
+    def allocate(self):
+        with self.lock:
+            if self.released and time.monotonic() - self.released[0][0] >= self.quarantine:
+                return self.released.popleft()[1]
+            if self.cursor >= self.domain:
+                raise CodeSpaceExhausted(f"No free lobby codes on shard {self.shard_index}")
+            index = self.cursor
+            self.cursor += 1
+        return self._index_to_code(index)
+
+    def release(self, code):
+        """Gives a code back once its lobby is gone."""
+        with self.lock:
+            self.released.append((time.monotonic(), code))
+
+    def owns(self, code):
+        return code_to_int(code) % self.shard_count == self.shard_index
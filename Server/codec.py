@@ -0,0 +1,265 @@
+import json
+import struct
+
+# Payload codecs (what goes inside the encryption). "json" is the original
+# format; "bin1" is a compact tagged binary layout. Clients offer codecs at
+# LOGIN and the server answers with the one it picked in LOGIN_SUCCESS.
+# Decoding needs no negotiation state: a JSON payload always starts with "{",
+# a bin1 payload always starts with BIN1_MAGIC.
+
+BIN1_MAGIC = 0xB1
+
+# Integer tags for message types. 0 means "type spelled out as a string".
+MESSAGE_TYPES = (
+    None, "LOGIN", "LOGIN_SUCCESS", "CREATE_GAME", "JOIN_GAME", "JOIN_SUCCESS",
+    "GAME_START", "CLUE", "VOTE", "STATE_UPDATE", "GAME_OVER", "ERROR",
+    "REDIRECT", "STATS",
+    # New tags only ever go at the end: existing numbers are on the wire
+    "LOBBY_DELTA", "SYNC",
+    "RESUME", "RESUME_SUCCESS", "LEAVE",
+    "LEADERBOARD",
+    "QUICK_PLAY",
+    "LIST_LOBBIES",
+    "SPECTATE",
+)
+# Integer tags for common field names. 0 means "key spelled out as a string".
+FIELD_NAMES = (
+    None, "nickname", "code", "settings", "role", "word", "turn_order", "sender",
+    "clue", "suspect", "phase", "players", "host", "info", "current_turn",
+    "candidates", "winner", "reason", "imposter", "message", "port",
+    "lobby_state", "metrics", "dump", "codecs", "codec",
+    # New tags only ever go at the end: existing numbers are on the wire
+    "kx", "aeads", "aead", "bind",
+    "time_limit", "skipped",
+    "features", "version", "joined", "left",
+    "resume_token", "token", "state", "clues", "voted",
+    "board", "limit", "entries", "min_games", "you",
+    "quick_play",
+    "lobbies", "next_cursor", "total", "cursor", "min_free",
+    "spectators", "feed",
+)
+# Frequent string values (phases, roles, winners) get a one-byte reference
+COMMON_STRINGS = (
+    "LOBBY", "CLUE_PHASE", "VOTING", "WAITING", "PLAYING", "GAME_OVER",
+    "IMPOSTER", "CITIZEN", "CITIZENS", "SECRET",
+    # Appended only, like the tags above
+    "SPECTATOR",
+)
+
+TYPE_TAGS = {name: tag for tag, name in enumerate(MESSAGE_TYPES) if name}
+FIELD_TAGS = {name: tag for tag, name in enumerate(FIELD_NAMES) if name}
+STRING_TAGS = {value: tag for tag, value in enumerate(COMMON_STRINGS)}
+
+# Value markers
+V_NONE, V_FALSE, V_TRUE, V_INT, V_FLOAT, V_STR, V_LIST, V_DICT, V_COMMON, V_STR_LIST = range(10)
+# Small non-negative ints are stored in the marker byte itself
+V_SMALL_INT = 0x40
+SMALL_INT_MAX = 0xFF - V_SMALL_INT
+
+DOUBLE = struct.Struct("!d")
+
+
+class CodecError(ValueError):
+    """Raised for payloads that don't decode."""
+
+
+def _write_varint(out, n):
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+def _read_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+def _write_value(out, value):
+    if value is None:
+        out.append(V_NONE)
+    elif value is True:
+        out.append(V_TRUE)
+    elif value is False:
+        out.append(V_FALSE)
+    elif isinstance(value, str):
+        tag = STRING_TAGS.get(value)
+        if tag is not None:
+            out.append(V_COMMON)
+            out.append(tag)
+        else:
+            raw = value.encode("utf-8")
+            out.append(V_STR)
+            _write_varint(out, len(raw))
+            out += raw
+    elif isinstance(value, int):
+        if 0 <= value <= SMALL_INT_MAX:
+            out.append(V_SMALL_INT + value)
+        else:
+            if not -(1 << 63) <= value < (1 << 63):
+                raise CodecError(f"Integer {value} out of range")
+            out.append(V_INT)
+            _write_varint(out, (value << 1) ^ (value >> 63)) # zigzag
+    elif isinstance(value, float):
+        out.append(V_FLOAT)
+        out += DOUBLE.pack(value)
+    elif isinstance(value, (list, tuple)):
+        if value and all(type(item) is str for item in value):
+            # Player lists: length-prefixed UTF-8 strings back to back
+            out.append(V_STR_LIST)
+            _write_varint(out, len(value))
+            for item in value:
+                raw = item.encode("utf-8")
+                _write_varint(out, len(raw))
+                out += raw
+            return
+        out.append(V_LIST)
+        _write_varint(out, len(value))
+        for item in value:
+            _write_value(out, item)
+    elif isinstance(value, dict):
+        out.append(V_DICT)
+        _write_varint(out, len(value))
+        for key, item in value.items():
+            _write_value(out, str(key))
+            _write_value(out, item)
+    else:
+        raise CodecError(f"Cannot encode {type(value).__name__}")
+
+def _read_value(data, pos):
+    marker = data[pos]
+    pos += 1
+    if marker >= V_SMALL_INT:
+        return marker - V_SMALL_INT, pos
+    if marker == V_STR:
+        length = data[pos]
+        if length < 0x80:
+            pos += 1
+        else:
+            length, pos = _read_varint(data, pos)
+        end = pos + length
+        return str(data[pos:end], "utf-8"), end
+    if marker == V_COMMON:
+        return COMMON_STRINGS[data[pos]], pos + 1
+    if marker == V_STR_LIST:
+        count, pos = _read_varint(data, pos)
+        items = []
+        for _ in range(count):
+            length = data[pos]
+            if length < 0x80:
+                pos += 1
+            else:
+                length, pos = _read_varint(data, pos)
+            end = pos + length
+            items.append(str(data[pos:end], "utf-8"))
+            pos = end
+        return items, pos
+    if marker == V_LIST:
+        count, pos = _read_varint(data, pos)
+        items = []
+        for _ in range(count):
+            item, pos = _read_value(data, pos)
+            items.append(item)
+        return items, pos
+    if marker == V_DICT:
+        count, pos = _read_varint(data, pos)
+        result = {}
+        for _ in range(count):
+            key, pos = _read_value(data, pos)
+            result[key], pos = _read_value(data, pos)
+        return result, pos
+    if marker == V_NONE:
+        return None, pos
+    if marker == V_TRUE:
+        return True, pos
+    if marker == V_FALSE:
+        return False, pos
+    if marker == V_INT:
+        raw, pos = _read_varint(data, pos)
+        return (raw >> 1) ^ -(raw & 1), pos
+    if marker == V_FLOAT:
+        return DOUBLE.unpack_from(data, pos)[0], pos + DOUBLE.size
+    raise CodecError(f"Unknown value marker {marker}")
+
+
+class JsonCodec:
+    name = "json"
+
+    def encode(self, message: dict) -> bytes:
+        return json.dumps(message).encode("utf-8")
+
+    def decode(self, payload: bytes) -> dict:
+        return json.loads(payload.decode("utf-8"))
+
+
+class BinaryCodec:
+    """bin1 layout: magic, type tag [, type string], field count, then per field
+    a field tag [, key string] and a tagged value."""
+    name = "bin1"
+
+    def encode(self, message: dict) -> bytes:
+        out = bytearray((BIN1_MAGIC,))
+        msg_type = message.get("type")
+        tag = TYPE_TAGS.get(msg_type, 0)
+        out.append(tag)
+        if not tag:
+            _write_value(out, msg_type)
+        _write_varint(out, len(message) - ("type" in message))
+        for key, value in message.items():
+            if key == "type":
+                continue
+            field = FIELD_TAGS.get(key, 0)
+            out.append(field)
+            if not field:
+                _write_value(out, key)
+            _write_value(out, value)
+        return bytes(out)
+
+    def decode(self, payload: bytes) -> dict:
+        try:
+            if payload[0] != BIN1_MAGIC:
+                raise CodecError("Not a bin1 payload")
+            tag = payload[1]
+            pos = 2
+            if tag:
+                msg_type = MESSAGE_TYPES[tag]
+            else:
+                msg_type, pos = _read_value(payload, pos)
+            message = {"type": msg_type}
+            count, pos = _read_varint(payload, pos)
+            for _ in range(count):
+                field = payload[pos]
+                pos += 1
+                if field:
+                    key = FIELD_NAMES[field]
+                else:
+                    key, pos = _read_value(payload, pos)
+                message[key], pos = _read_value(payload, pos)
+            return message
+        except (IndexError, UnicodeDecodeError) as e:
+            raise CodecError(f"Truncated or corrupt bin1 payload: {e}")
+
+
+JSON_CODEC = JsonCodec()
+BINARY_CODEC = BinaryCodec()
+CODECS = {JSON_CODEC.name: JSON_CODEC, BINARY_CODEC.name: BINARY_CODEC}
+# What a client offers at LOGIN, best first
+PREFERRED_CODECS = [BINARY_CODEC.name, JSON_CODEC.name]
+
+def choose_codec(offered):
+    """Server side of the negotiation: first offered codec we support, else json."""
+    for name in offered or ():
+        if name in CODECS:
+            return CODECS[name]
+    return JSON_CODEC
+
+def decode_payload(payload: bytes) -> dict:
+    """Decodes a payload in whichever codec it was written."""
+    if payload[:1] == b"{":
+        return JSON_CODEC.decode(payload)
+    return BINARY_CODEC.decode(payload)
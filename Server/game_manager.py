@@ -1,18 +1,63 @@
 import json
 import os
-import random
-import string
-from logger import logger
+import threading
+import time
+from logger import logger, log_event, configure_logging
 from lobby_logic import Lobby
+from word_bank import WordBank
+from protocol import DEFAULT_PORT, MSG_ERROR
+from sharding import shard_for_code, shard_port
+from code_allocator import CodeAllocator
+from lobby_registry import LobbyRegistry
+from matchmaking import OpenLobbyIndex
+from lobby_directory import LobbyDirectory
+from timers import scheduler
+
+# Most seats a client may ask for in a lobby
+MAX_LOBBY_PLAYERS = 100
+# Longest clue/vote time limit a client may ask for (0 turns the limit off)
+MAX_TIME_LIMIT = 3600
+
+# Lobby settings a CREATE_GAME may override, as (type, lowest, highest);
+# everything else (seeds, server limits, crypto policy...) stays as the server has it
+LOBBY_OVERRIDES = {
+    "max_players": (int, 2, MAX_LOBBY_PLAYERS),
+    "min_players": (int, 2, MAX_LOBBY_PLAYERS),
+    "rounds_before_vote": (int, 1, 20),
+    "word_pack": (str, None, None),
+    "clue_timeout_seconds": (int, 0, MAX_TIME_LIMIT),
+    "vote_timeout_seconds": (int, 0, MAX_TIME_LIMIT),
+    "auto_start": (bool, None, None),
+    "quick_play": (bool, None, None), # strangers may be matched in (QUICK_PLAY creates these)
+}
+
+
+class LobbySettingsError(ValueError):
+    """A CREATE_GAME setting of the wrong type or out of range."""
+
 
 class GameManager:
     def __init__(self):
-        self.lobbies = {} # code -> Lobby
+        self.lobbies = LobbyRegistry() # code -> Lobby, striped locks
+        # WAITING matchmaking lobbies by free seats, for QUICK_PLAY (private
+        # CREATE_GAME lobbies are never in it unless the host opts in)
+        self.open_lobbies = OpenLobbyIndex()
+        # Codes added, changed or removed since the beacon last looked
+        self.changed_lobbies = set()
+        self.changes_lock = threading.Lock()
+        # Single process unless configure_shard() says otherwise
+        self.shard_index = 0
+        self.shard_count = 1
+        self.base_port = DEFAULT_PORT
         self.settings = self.load_settings()
+        # Public entry per lobby for LIST_LOBBIES
+        self.directory = LobbyDirectory()
+        self.code_allocator = self.make_code_allocator()
+        # One shared corpus for every lobby, loaded lazily per pack
+        self.word_bank = WordBank.from_settings(self.settings, os.path.dirname(os.path.abspath(__file__)))
         
-        # Apply debug setting
-        from logger import set_debug_mode
-        set_debug_mode(self.settings.get("debug_mode", False))
+        # Log file, rotation, sampling and debug setting
+        configure_logging(self.settings)
 
     def load_settings(self):
         default_settings = {
@@ -21,7 +66,38 @@ class GameManager:
             "min_players": 3,
             "rounds_before_vote": 2,
             "anti_cheat_enabled": True,
-            "debug_mode": False
+            "word_list_file": "words.txt",
+            "word_language": "it",
+            "word_packs": [],
+            "debug_mode": False,
+            "server_engine": "threaded",
+            "shards": 1,
+            "metrics_dump_file": "metrics_snapshot.json",
+            "outbound_queue_size": 256,
+            "outbound_overflow_policy": "drop",
+            "allow_legacy_crypto": True,
+            "beacon_interval": 2.0,
+            "beacon_full_every": 3,
+            "code_quarantine_seconds": 300,
+            "clue_timeout_seconds": 60,
+            "vote_timeout_seconds": 60,
+            "idle_lobby_seconds": 1800,
+            "reaper_interval": 30,
+            "resume_grace_seconds": 30,
+            "log_file": "server_log.jsonl",
+            "log_max_bytes": 10485760,
+            "log_backup_count": 5,
+            "log_rotate_seconds": 86400,
+            "log_sampling": {},
+            "history_db": "game_history.db",
+            "history_batch_size": 200,
+            "history_flush_interval": 0.5,
+            "history_refresh_seconds": 5.0,
+            "leaderboard_checkpoint": "leaderboard.json",
+            "leaderboard_checkpoint_seconds": 60,
+            "leaderboard_min_games": 5,
+            "quick_play_auto_start": True,
+            "max_spectators": 10000
         }
         try:
             path = os.path.join(os.path.dirname(__file__), 'settings.json')
@@ -32,37 +108,155 @@ class GameManager:
             logger.error(f"Failed to load settings: {e}")
         return default_settings
 
-    def create_lobby(self, settings_override=None):
-        """Creates a new lobby with a unique 6-character code."""
-        # Merge defaults with overrides
+    def create_lobby(self, settings_override=None, game_seed=None, word_seed=None):
+        """Creates a new lobby with a unique 6-character code.
+
+        The seeds are for the simulation; they never come from a client.
+        Raises LobbySettingsError (and creates nothing) on a bad override.
+        """
+        # Merge defaults with the overrides clients are allowed
         lobby_settings = self.settings.copy()
-        if settings_override:
-            lobby_settings.update(settings_override)
-            
-        while True:
-            # Uppercase + Digits
-            chars = string.ascii_uppercase + string.digits
-            code = ''.join(random.choices(chars, k=6))
-            if code not in self.lobbies:
-                break
+        if isinstance(settings_override, dict):
+            lobby_settings.update((key, self.check_override(key, value)) for key, value in settings_override.items()
+                                  if key in LOBBY_OVERRIDES)
+            if lobby_settings["min_players"] > lobby_settings["max_players"]:
+                raise LobbySettingsError("min_players can't be more than max_players")
+            # Matchmaking lobbies fill up with strangers, nobody's there to press start
+            if lobby_settings.get("quick_play") and "auto_start" not in settings_override:
+                lobby_settings["auto_start"] = self.settings.get("quick_play_auto_start", True)
+
+        # Unique by construction (and within this shard's slice), no retries
+        code = self.code_allocator.allocate()
         
-        new_lobby = Lobby(code, lobby_settings)
-        self.lobbies[code] = new_lobby
-        logger.info(f"Created new Lobby: {code}")
+        new_lobby = Lobby(code, lobby_settings, self.word_bank, game_seed, word_seed)
+        new_lobby.on_change = self.lobby_changed
+        self.lobbies.add(code, new_lobby)
+        self.lobby_changed(new_lobby)
+        log_event("lobby_created", "Created new Lobby: %(code)s", code=code)
         return code
 
+    def check_override(self, key, value):
+        """The value a lobby stores for a client's setting (whole floats become ints)."""
+        kind, lowest, highest = LOBBY_OVERRIDES[key]
+        if kind is int:
+            if isinstance(value, float) and value.is_integer():
+                value = int(value)
+            if type(value) is not int or not lowest <= value <= highest:
+                raise LobbySettingsError(f"{key} must be a whole number from {lowest} to {highest}")
+        elif kind is bool:
+            if not isinstance(value, bool):
+                raise LobbySettingsError(f"{key} must be true or false")
+        elif not isinstance(value, str) or value not in self.word_bank.packs:
+            raise LobbySettingsError(f"Unknown {key}: {value}")
+        return value
+
+    def configure_shard(self, index, count, base_port):
+        self.shard_index = index
+        self.shard_count = count
+        self.base_port = base_port
+        self.code_allocator = self.make_code_allocator()
+
+    def make_code_allocator(self):
+        return CodeAllocator(self.shard_index, self.shard_count,
+                             quarantine=self.settings.get("code_quarantine_seconds", 300))
+
+    def owns_code(self, code):
+        return shard_for_code(code, self.shard_count) == self.shard_index
+
+    def redirect_port_for(self, code):
+        """Private port of the shard owning this code, or None if it's ours."""
+        if self.owns_code(code):
+            return None
+        return shard_port(self.base_port, shard_for_code(code, self.shard_count))
+
     def get_lobby(self, code):
         return self.lobbies.get(code)
 
+    def lobby_state_counts(self):
+        """state -> number of lobbies (for metrics; walks every lobby)."""
+        counts = {}
+        for lobby in self.lobbies.values():
+            counts[lobby.state] = counts.get(lobby.state, 0) + 1
+        return counts
+
     def remove_lobby(self, code):
-        if code in self.lobbies:
-            del self.lobbies[code]
-            logger.info(f"Lobby {code} removed (empty).")
+        # pop() so two threads removing the same lobby can't release its code twice
+        lobby = self.lobbies.pop(code)
+        if lobby is not None:
+            lobby.closed = True
+            lobby.cancel_deadline()
+            self.code_allocator.release(code)
+            self.open_lobbies.discard(code)
+            self.directory.remove(code)
+            self.mark_lobby_changed(code)
+            lobby.spectators.close({"type": MSG_ERROR, "message": "Lobby closed"})
+            log_event("lobby_removed", "Lobby %(code)s removed (empty).", code=code)
+
+    def lobby_changed(self, lobby):
+        if lobby.settings.get("quick_play"):
+            self.open_lobbies.update(lobby.code, lobby.open_seats())
+        self.directory.update(lobby)
+        self.mark_lobby_changed(lobby.code)
+
+    def quick_play_lobby(self, fresh=False):
+        """The fullest matchmaking lobby with a free seat (one seat counted as taken), or a new one."""
+        code = None if fresh else self.open_lobbies.take()
+        lobby = self.get_lobby(code) if code else None
+        if lobby is None:
+            lobby = self.get_lobby(self.create_lobby({"quick_play": True}))
+        return lobby
+
+    def mark_lobby_changed(self, code):
+        with self.changes_lock:
+            self.changed_lobbies.add(code)
+
+    def drain_lobby_changes(self):
+        """Returns the codes changed since the last call and starts over."""
+        with self.changes_lock:
+            changed, self.changed_lobbies = self.changed_lobbies, set()
+        return changed
+
+    def start_reaper(self):
+        """Runs cleanup_empty_lobbies() every reaper_interval seconds from now on."""
+        interval = self.settings.get("reaper_interval", 30)
+        if interval and interval > 0:
+            scheduler.call_later(interval, self.cleanup_empty_lobbies)
 
     def cleanup_empty_lobbies(self):
-        # Optional: remove lobbies with 0 players if old enough
-        # Now handled by event-driven removal in client_handler
-        pass
+        """Closes lobbies left empty or untouched for idle_lobby_seconds.
+
+        Lobbies normally go away when their last player leaves (see
+        client_handler); this catches the ones that never got a player and
+        the ones whose players wandered off. The actual check runs as a lobby
+        command so it can't interleave with a join.
+        """
+        try:
+            now = time.monotonic()
+            grace = self.settings.get("reaper_interval", 30)
+            idle_limit = self.settings.get("idle_lobby_seconds", 1800)
+            for lobby in self.lobbies.values():
+                idle = now - lobby.last_activity
+                if (not lobby.players and idle > grace) or (idle_limit and idle > idle_limit):
+                    lobby.submit(self.reap_lobby, lobby, grace, idle_limit)
+        finally:
+            self.start_reaper()
+
+    def reap_lobby(self, lobby, grace, idle_limit):
+        if lobby.closed:
+            return
+        idle = time.monotonic() - lobby.last_activity
+        if lobby.players:
+            if not idle_limit or idle <= idle_limit:
+                return # somebody came back
+            log_event("lobby_reaped", "Lobby %(code)s closed after %(idle)ss without activity.",
+                      code=lobby.code, idle=round(idle))
+            for handler in list(lobby.players.values()):
+                handler.lobby = None
+                handler.hang_up("Lobby closed for inactivity")
+            lobby.players.clear()
+        elif idle <= grace:
+            return # its creator's join is probably still queued
+        self.remove_lobby(lobby.code)
 
 # Global instance
 game_manager = GameManager()
@@ -0,0 +1,183 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from logger import logger, log_event
+
+# Finished games waiting for the writer; past this they are dropped, not waited on
+QUEUE_SIZE = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    lobby TEXT NOT NULL,
+    started_at REAL,
+    ended_at REAL NOT NULL,
+    word TEXT NOT NULL,
+    imposter TEXT NOT NULL,
+    winner TEXT NOT NULL,
+    reason TEXT,
+    clues TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS game_players (
+    game_id INTEGER NOT NULL REFERENCES games(id),
+    nickname TEXT NOT NULL,
+    imposter INTEGER NOT NULL,
+    won INTEGER NOT NULL,
+    vote TEXT
+);
+CREATE INDEX IF NOT EXISTS game_players_nickname ON game_players(nickname);
+CREATE INDEX IF NOT EXISTS game_players_game ON game_players(game_id);
+CREATE INDEX IF NOT EXISTS games_word ON games(word);
+"""
+
+
+class GameHistory:
+    """Append-only record of finished games in SQLite (WAL mode).
+
+    record() only puts the result on a queue. A writer thread takes
+    whatever has piled up, up to batch_size games, and inserts it in one
+    transaction, so a game never waits on the disk and a burst of game
+    overs costs one fsync instead of one each. Until start() is called
+    (simulations, benchmarks) record() does nothing.
+
+    Reads use their own connection per thread; WAL lets them run while the
+    writer commits, and shard processes can share one file.
+
+    on_written(connection), if set, runs on the writer thread after every
+    batch and every refresh_interval seconds without one (other shards may
+    have written meanwhile); the leaderboard follows the history that way.
+    """
+    def __init__(self):
+        self.path = None
+        self.queue = queue.Queue(QUEUE_SIZE)
+        self.batch_size = 200
+        self.flush_interval = 0.5
+        self.refresh_interval = 5.0
+        self.on_written = None
+        self.thread = None
+        self.readers = threading.local()
+        self.written = 0
+        self.dropped = 0
+
+    def start(self, settings):
+        """Opens the database named by history_db (empty turns history off)."""
+        path = settings.get("history_db")
+        if not path or self.thread is not None:
+            return
+        if not os.path.isabs(path):
+            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+        self.path = path
+        self.batch_size = max(1, settings.get("history_batch_size", 200))
+        self.flush_interval = settings.get("history_flush_interval", 0.5)
+        self.refresh_interval = settings.get("history_refresh_seconds", 5.0)
+        connection = self.connect()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+        self.thread = threading.Thread(target=self.write_loop, args=(connection,), name="history", daemon=True)
+        self.thread.start()
+        atexit.register(self.flush) # the last batch is still waiting out flush_interval
+        logger.info(f"Game history: {path}")
+
+    def connect(self):
+        connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        # WAL only needs a sync at checkpoints; a crash can lose the last batch, not corrupt the file
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def record(self, lobby_code, started_at, word, imposter, winner, reason, players, votes, clues):
+        """Queues one finished game. players: everyone dealt in; votes: voter -> suspect."""
+        if self.thread is None:
+            return
+        try:
+            self.queue.put_nowait((lobby_code, started_at, time.time(), word, imposter, winner, reason,
+                                   list(players), dict(votes), [list(clue) for clue in clues]))
+        except queue.Full:
+            self.dropped += 1
+
+    def write_loop(self, connection):
+        while True:
+            try:
+                batch = [self.queue.get(timeout=self.refresh_interval)]
+            except queue.Empty:
+                batch = []
+            # Give a burst a moment to pile up, then write all of it at once
+            deadline = time.monotonic() + self.flush_interval
+            while batch and len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    self.write(connection, batch)
+                except Exception as e:
+                    logger.error(f"Game history write of {len(batch)} games failed: {e}")
+            if self.on_written:
+                try:
+                    self.on_written(connection)
+                except Exception as e:
+                    logger.error(f"Game history follower failed: {e}")
+            # After on_written, so flush() also means the leaderboard has the games
+            for _ in batch:
+                self.queue.task_done()
+
+    def write(self, connection, batch):
+        with connection:
+            for (code, started_at, ended_at, word, imposter, winner, reason, players, votes, clues) in batch:
+                cursor = connection.execute(
+                    "INSERT INTO games (lobby, started_at, ended_at, word, imposter, winner, reason, clues)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (code, started_at, ended_at, word, imposter, winner, reason,
+                     json.dumps(clues, ensure_ascii=False)))
+                imposter_won = winner == "IMPOSTER"
+                connection.executemany(
+                    "INSERT INTO game_players (game_id, nickname, imposter, won, vote) VALUES (?, ?, ?, ?, ?)",
+                    [(cursor.lastrowid, nickname, nickname == imposter,
+                      (nickname == imposter) == imposter_won, votes.get(nickname))
+                     for nickname in players])
+        self.written += len(batch)
+        log_event("history_written", "Wrote %(games)s games to the history.", logging.DEBUG, games=len(batch))
+
+    def flush(self):
+        """Waits until every game recorded so far is in the database."""
+        if self.thread is not None:
+            self.queue.join()
+
+    def reader(self):
+        if self.path is None:
+            raise RuntimeError("game history is off")
+        connection = getattr(self.readers, "connection", None)
+        if connection is None:
+            connection = self.readers.connection = self.connect()
+        return connection
+
+    def player_stats(self, nickname):
+        """Games, wins, games and wins as the imposter, and citizen votes that found the imposter."""
+        row = self.reader().execute(
+            "SELECT COUNT(*), COALESCE(SUM(p.won), 0), COALESCE(SUM(p.imposter), 0),"
+            " COALESCE(SUM(p.imposter AND p.won), 0), COALESCE(SUM(NOT p.imposter AND p.vote = g.imposter), 0)"
+            " FROM game_players p JOIN games g ON g.id = p.game_id WHERE p.nickname = ?",
+            (nickname,)).fetchone()
+        games, wins, imposter_games, imposter_wins, correct_votes = row
+        return {
+            "nickname": nickname, "games": games, "wins": wins,
+            "imposter_games": imposter_games, "imposter_wins": imposter_wins,
+            "correct_votes": correct_votes,
+        }
+
+    def word_stats(self, word):
+        """How often a word was played and how often the imposter got away with it."""
+        games, imposter_wins = self.reader().execute(
+            "SELECT COUNT(*), COALESCE(SUM(winner = 'IMPOSTER'), 0) FROM games WHERE word = ?",
+            (word,)).fetchone()
+        return {"word": word, "games": games, "imposter_wins": imposter_wins}
+
+
+# Global instance
+history = GameHistory()
@@ -0,0 +1,235 @@
+import json
+import os
+import threading
+import time
+from logger import logger
+from ranked_keys import RankedKeys
+
+# Boards a LEADERBOARD request can ask for
+BOARD_GAMES = "games"
+BOARD_IMPOSTER_WIN_RATE = "imposter_win_rate"
+BOARD_CATCH_RATE = "catch_rate"
+BOARDS = (BOARD_GAMES, BOARD_IMPOSTER_WIN_RATE, BOARD_CATCH_RATE)
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+# Games as imposter (or citizen) before a player shows up on a rate board
+DEFAULT_MIN_GAMES = 5
+CHECKPOINT_VERSION = 1
+# Rows read from the history per lock hold while catching up; a full chunk
+# means a backlog (startup), so boards are re-sorted once at the end instead
+CATCH_UP_CHUNK = 1000
+
+# Per-player counters, in this order
+GAMES, WINS, IMPOSTER_GAMES, IMPOSTER_WINS, CITIZEN_GAMES, CATCHES = range(6)
+
+
+class Leaderboard:
+    """Player counters and ranked boards, kept up to date from the game history.
+
+    Nothing is recomputed per request: every finished game adds to the
+    counters of the players in it and moves them on each board, a RankedKeys
+    of (-score, ..., nickname) keys. top() reads the first block and a
+    player's rank is a couple of bisects.
+
+    The counters are derived data. catch_up() reads the games the history
+    has gained since last_game_id (from every shard sharing the database);
+    the history writer calls it after each batch. Every checkpoint_seconds
+    the counters are written to a JSON checkpoint, so a restart only
+    replays the games after it; without one, or with a stale one, they are
+    rebuilt from the whole history.
+
+    Shards each write their own checkpoint (leaderboard.json.shard0, ...),
+    like their log files. Every shard catches up from the same shared
+    history, so each file is a complete copy of the counters as of its
+    last_game_id rather than a slice: merging them means keeping the one
+    with the highest last_game_id (e.g. copy it to leaderboard.json when
+    going back to a single process); the games after it are replayed from
+    the history on start.
+    """
+    def __init__(self):
+        self.players = {} # nickname -> [counters]
+        self.boards = {board: RankedKeys() for board in BOARDS}
+        self.keys = {board: {} for board in BOARDS}   # nickname -> its key on that board
+        self.last_game_id = 0
+        self.checked = False # last_game_id compared with the database yet?
+        self.min_games = DEFAULT_MIN_GAMES
+        self.checkpoint_path = None
+        self.checkpoint_seconds = 60
+        self.last_checkpoint = time.monotonic()
+        self.lock = threading.Lock()
+
+    def start(self, settings, checkpoint_suffix=""):
+        """Reads the settings and the last checkpoint; catch_up() does the rest.
+
+        checkpoint_suffix keeps processes sharing a working directory (shards)
+        from overwriting each other's checkpoint.
+        """
+        self.min_games = max(1, settings.get("leaderboard_min_games", DEFAULT_MIN_GAMES))
+        self.checkpoint_seconds = settings.get("leaderboard_checkpoint_seconds", 60)
+        path = settings.get("leaderboard_checkpoint")
+        if path and not os.path.isabs(path):
+            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+        self.checkpoint_path = path + checkpoint_suffix if path else None
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            try:
+                self.load(self.checkpoint_path)
+            except Exception as e:
+                logger.warning(f"Ignoring leaderboard checkpoint {self.checkpoint_path}: {e}")
+                self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.players = {}
+            self.boards = {board: RankedKeys() for board in BOARDS}
+            self.keys = {board: {} for board in BOARDS}
+            self.last_game_id = 0
+
+    def board_key(self, board, counts, nickname):
+        """Where a player sorts on a board, or None if they don't qualify yet."""
+        if board == BOARD_GAMES:
+            return (-counts[GAMES], nickname)
+        if board == BOARD_IMPOSTER_WIN_RATE:
+            played, won = counts[IMPOSTER_GAMES], counts[IMPOSTER_WINS]
+        else:
+            played, won = counts[CITIZEN_GAMES], counts[CATCHES]
+        if played < self.min_games:
+            return None
+        # Equal rates: more games first
+        return (-won / played, -played, nickname)
+
+    def rerank(self, nickname, counts):
+        for board in BOARDS:
+            ranked = self.boards[board]
+            keys = self.keys[board]
+            old = keys.get(nickname)
+            if old is not None:
+                ranked.remove(old)
+            new = self.board_key(board, counts, nickname)
+            if new is None:
+                keys.pop(nickname, None)
+            else:
+                ranked.add(new)
+                keys[nickname] = new
+
+    def rebuild_boards(self):
+        """Sorts every board from the counters (after a load or a backlog)."""
+        keys = {}
+        for board in BOARDS:
+            keys[board] = {}
+            for nickname, counts in self.players.items():
+                key = self.board_key(board, counts, nickname)
+                if key is not None:
+                    keys[board][nickname] = key
+        self.keys = keys
+        self.boards = {board: RankedKeys(keys[board].values()) for board in BOARDS}
+
+    def add(self, nickname, imposter, won, caught, rerank=True):
+        """One player's part in one finished game."""
+        counts = self.players.get(nickname)
+        if counts is None:
+            counts = self.players[nickname] = [0] * 6
+        counts[GAMES] += 1
+        counts[WINS] += won
+        if imposter:
+            counts[IMPOSTER_GAMES] += 1
+            counts[IMPOSTER_WINS] += won
+        else:
+            counts[CITIZEN_GAMES] += 1
+            counts[CATCHES] += caught
+        if rerank:
+            self.rerank(nickname, counts)
+
+    def catch_up(self, connection):
+        """Applies the games written since last_game_id; returns how many players rows it read."""
+        if not self.checked:
+            (newest,) = connection.execute("SELECT COALESCE(MAX(id), 0) FROM games").fetchone()
+            if newest < self.last_game_id:
+                logger.warning("Leaderboard checkpoint is ahead of the game history, rebuilding.")
+                self.reset()
+            self.checked = True
+
+        cursor = connection.execute(
+            "SELECT g.id, p.nickname, p.imposter, p.won, p.vote = g.imposter"
+            " FROM games g JOIN game_players p ON p.game_id = g.id WHERE g.id > ? ORDER BY g.id",
+            (self.last_game_id,))
+        applied = 0
+        backlog = False
+        while True:
+            rows = cursor.fetchmany(CATCH_UP_CHUNK)
+            if not rows:
+                break
+            backlog = backlog or len(rows) == CATCH_UP_CHUNK
+            with self.lock:
+                for game_id, nickname, imposter, won, caught in rows:
+                    self.add(nickname, imposter, won, (not imposter and caught) or 0, rerank=not backlog)
+                    self.last_game_id = game_id
+            applied += len(rows)
+        if backlog:
+            with self.lock:
+                self.rebuild_boards()
+
+        if self.checkpoint_path and time.monotonic() - self.last_checkpoint >= self.checkpoint_seconds:
+            self.checkpoint(self.checkpoint_path)
+        return applied
+
+    def checkpoint(self, path):
+        """Writes the counters (not the boards, they're rebuilt on load) atomically."""
+        with self.lock:
+            state = {
+                "version": CHECKPOINT_VERSION,
+                "last_game_id": self.last_game_id,
+                "players": {nickname: list(counts) for nickname, counts in self.players.items()},
+            }
+        self.last_checkpoint = time.monotonic()
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temp_path, path)
+
+    def load(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"checkpoint version {state.get('version')}")
+        players = {nickname: [int(n) for n in counts] for nickname, counts in state["players"].items()}
+        with self.lock:
+            self.players = players
+            self.rebuild_boards()
+            self.last_game_id = state["last_game_id"]
+            self.checked = False
+
+    def entry(self, board, key):
+        nickname = key[-1]
+        counts = self.players[nickname]
+        if board == BOARD_GAMES:
+            return {"nickname": nickname, "value": counts[GAMES], "games": counts[GAMES]}
+        return {"nickname": nickname, "value": round(-key[0], 4), "games": -key[1]}
+
+    def top(self, board, limit=DEFAULT_LIMIT):
+        """The first `limit` entries of a board: nickname, value and the games behind it."""
+        limit = max(1, min(MAX_LIMIT, limit or DEFAULT_LIMIT))
+        with self.lock:
+            return [self.entry(board, key) for key in self.boards[board].first(limit)]
+
+    def player(self, nickname, board):
+        """A player's counters and 1-based rank on a board (None if not ranked there)."""
+        with self.lock:
+            counts = self.players.get(nickname)
+            if counts is None:
+                return None
+            key = self.keys[board].get(nickname)
+            return {
+                "nickname": nickname,
+                "rank": self.boards[board].rank(key) + 1 if key is not None else None,
+                "games": counts[GAMES],
+                "wins": counts[WINS],
+                "imposter_games": counts[IMPOSTER_GAMES],
+                "imposter_wins": counts[IMPOSTER_WINS],
+                "citizen_games": counts[CITIZEN_GAMES],
+                "catches": counts[CATCHES],
+            }
+
+
+# Global instance
+leaderboard = Leaderboard()
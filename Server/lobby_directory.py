@@ -0,0 +1,157 @@
+import threading
+from beacon import LOBBY_STATES
+from protocol import MSG_LIST_LOBBIES, serialize_message
+from ranked_keys import RankedKeys
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+# Lobby settings that are listed and can be filtered on
+LISTED_SETTINGS = ("max_players", "min_players", "rounds_before_vote", "word_pack",
+                   "clue_timeout_seconds", "vote_timeout_seconds")
+# Cached pages kept before the cache starts over
+MAX_CACHED_PAGES = 4096
+
+
+class DirectoryError(ValueError):
+    """A LIST_LOBBIES request with filters we don't understand."""
+
+
+class LobbyDirectory:
+    """Every lobby's public entry for LIST_LOBBIES, kept current by the GameManager.
+
+    update() is called from Lobby.changed() (joins, leaves, state changes)
+    and remove() when a lobby goes away; both bump version. Codes are kept
+    sorted in RankedKeys, so a page is "the next matching entries after
+    the cursor code": stable while lobbies come and go, no offsets. Besides
+    all codes there is one RankedKeys per state and one of the lobbies with
+    a free seat, and a page walks the smallest of them that covers the
+    query: "WAITING with free seats" only ever looks at joinable lobbies,
+    however many games are running.
+
+    Built pages are cached per (filters, cursor, size) along with their
+    serialized payload per codec, so a repeated poll costs a dict lookup and
+    an encryption. A cached page is only reused while version hasn't moved:
+    a lobby that just filled up or started is never listed as joinable.
+    """
+    def __init__(self):
+        self.entries = {} # code -> entry dict as sent
+        self.codes = RankedKeys()
+        self.by_state = {state: RankedKeys() for state in LOBBY_STATES}
+        self.joinable = RankedKeys() # codes with free > 0
+        self.version = 0
+        self.cache = {} # query key -> [version, message, {codec name: payload}]
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _index(self, entry, add):
+        keys = (self.by_state[entry["state"]],) + ((self.joinable,) if entry["free"] > 0 else ())
+        for index in keys:
+            if add:
+                index.add(entry["code"])
+            else:
+                index.remove(entry["code"])
+
+    def update(self, lobby):
+        settings = lobby.settings
+        entry = {
+            "code": lobby.code,
+            "state": lobby.state,
+            "players": len(lobby.players),
+            "free": lobby.open_seats(),
+            "host": lobby.get_host_name(),
+            "settings": {key: settings[key] for key in LISTED_SETTINGS if key in settings},
+        }
+        with self.lock:
+            old = self.entries.get(lobby.code)
+            if old == entry:
+                return
+            if old is None:
+                self.codes.add(lobby.code)
+            else:
+                self._index(old, add=False)
+            self._index(entry, add=True)
+            self.entries[lobby.code] = entry
+            self.version += 1
+
+    def remove(self, code):
+        with self.lock:
+            entry = self.entries.pop(code, None)
+            if entry is not None:
+                self.codes.remove(code)
+                self._index(entry, add=False)
+                self.version += 1
+
+    def candidates(self, state, min_free):
+        """The smallest index holding every lobby that can match (None: nothing can)."""
+        if min_free > 0:
+            # Only WAITING lobbies have free seats
+            return self.joinable if state in (None, "WAITING") else None
+        if state is not None:
+            return self.by_state[state]
+        return self.codes
+
+    @staticmethod
+    def query_key(request):
+        """Validated (state, min_free, settings, cursor, size) from a LIST_LOBBIES message."""
+        state = request.get("state")
+        if state is not None and state not in LOBBY_STATES:
+            raise DirectoryError(f"Unknown state: {state}")
+        min_free = request.get("min_free") or 0
+        if not isinstance(min_free, int):
+            raise DirectoryError("min_free must be a number")
+        wanted = request.get("settings") or {}
+        if not isinstance(wanted, dict) or any(key not in LISTED_SETTINGS for key in wanted):
+            raise DirectoryError(f"Lobbies can only be filtered on {', '.join(LISTED_SETTINGS)}")
+        if any(not isinstance(value, (str, int, float)) for value in wanted.values()):
+            raise DirectoryError("Setting filters must be plain values")
+        cursor = request.get("cursor")
+        if cursor is not None and not isinstance(cursor, str):
+            raise DirectoryError("Bad cursor")
+        size = request.get("limit")
+        size = max(1, min(MAX_PAGE_SIZE, size)) if isinstance(size, int) else DEFAULT_PAGE_SIZE
+        return (state, min_free, tuple(sorted(wanted.items())), cursor, size)
+
+    def page(self, key):
+        """The LIST_LOBBIES reply for a query key (built, or from the cache)."""
+        cached = self.cache.get(key)
+        if cached is not None and cached[0] == self.version:
+            return cached
+        state, min_free, wanted, cursor, size = key
+        lobbies = []
+        next_cursor = None
+        with self.lock:
+            version = self.version
+            index = self.candidates(state, min_free)
+            for code in index.after(cursor) if index is not None else ():
+                entry = self.entries[code]
+                if entry["free"] < min_free:
+                    continue
+                if wanted and any(entry["settings"].get(name) != value for name, value in wanted):
+                    continue
+                if len(lobbies) == size:
+                    next_cursor = lobbies[-1]["code"]
+                    break
+                lobbies.append(entry)
+            total = len(self.entries)
+        message = {
+            "type": MSG_LIST_LOBBIES,
+            "lobbies": lobbies,
+            "next_cursor": next_cursor,
+            "version": version,
+            "total": total,
+        }
+        if len(self.cache) >= MAX_CACHED_PAGES:
+            self.cache = {}
+        cached = self.cache[key] = [version, message, {}]
+        return cached
+
+    def payload(self, request, codec):
+        """Serialized LIST_LOBBIES reply for this request in this codec."""
+        cached = self.page(self.query_key(request))
+        payloads = cached[2]
+        payload = payloads.get(codec.name)
+        if payload is None:
+            payload = payloads[codec.name] = serialize_message(cached[1], codec)
+        return payload
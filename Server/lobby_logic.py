@@ -1,12 +1,35 @@
+import hmac
 import random
+import secrets
+import threading
+import time
+from collections import deque
 from protocol import *
-from logger import logger
+import logging
+from logger import logger, log_event
+from history import history
+from metrics import metrics
+from outbound import coalesce_key_for
+from spectators import SpectatorFeed
+from timers import scheduler
+from word_bank import DEFAULT_PACK, WordSampler
+
+# What everyone sees instead of a clue when a turn times out
+SKIPPED_CLUE = "(no clue, time ran out)"
+
+# Shortest clue/vote time limit a lobby can ask for (0 turns the limit off)
+MIN_TIME_LIMIT = 5
+
+# Watchers per lobby unless the settings say otherwise
+DEFAULT_MAX_SPECTATORS = 10000
 
 class Lobby:
-    def __init__(self, code, settings):
+    def __init__(self, code, settings, word_bank, game_seed=None, word_seed=None):
         self.code = code
         self.settings = settings
         self.players = {}  # nickname -> ClientHandler
+        # Watchers: no seat, no word, public events only (see spectators.py)
+        self.spectators = SpectatorFeed(code)
         self.state = "WAITING"
         self.secret_word = ""
         self.imposter_nickname = None
@@ -14,24 +37,99 @@ class Lobby:
         self.current_turn_index = 0
         self.round_count = 0
         self.votes = {}
+        # Bumped on every join and leave; LOBBY snapshots and deltas carry it
+        self.version = 0
+        self.clues = [] # [sender, clue] this game, replayed to players who resume
+        self.started_at = None
+        # nickname -> token a dropped player can RESUME with, and the grace
+        # timers of players whose seats are held until they do
+        self.resume_tokens = {}
+        self.away = {}
         
-        # Load words from file
-        self.word_list = []
-        try:
-            with open("words.txt", "r", encoding="utf-8") as f:
-                self.word_list = [line.strip() for line in f if line.strip()]
-        except Exception as e:
-            logger.error(f"Failed to load words.txt: {e}")
-            self.word_list = ["Pizza", "Bicicletta", "Sole"] # Fallback
+        # Shared read-only tuple from the GameManager's WordBank (no per-lobby copy)
+        self.word_list = word_bank.get_words(settings.get("word_pack", DEFAULT_PACK))
+        # No repeats until the whole pack has been played; word_seed makes it
+        # deterministic (simulations only: whoever knows it knows the words)
+        self.word_sampler = WordSampler(self.word_list, word_seed)
+        # Roles and turn order; game_seed gives a private, reproducible RNG
+        # (simulations, tests; whoever knows it knows the imposter)
+        self.rng = random.Random(game_seed) if game_seed is not None else random
+        # Set by the GameManager: called with the lobby when players or state
+        # change (drives the LAN beacon's deltas and the quick-play index)
+        self.on_change = None
+        self.closed = False # removed from the registry; nobody may join any more
+        # Last time a player did something here (the manager reaps idle lobbies)
+        self.last_activity = time.monotonic()
+        # Pending clue/vote timeout; deadline_serial invalidates ones already queued
+        self.deadline = None
+        self.deadline_serial = 0
+
+        # Commands from every player's thread run one at a time, in order
+        self.commands = deque()
+        self.command_lock = threading.Lock()
+        self.draining = False
+
+    def submit(self, command, *args):
+        """Runs command(*args) after every command submitted before it, never two at once.
+
+        No thread of its own: whoever finds the lobby idle runs the queue
+        until it is empty, including commands other threads add meanwhile.
+        Submitting from inside a command just queues it behind the current one.
+        """
+        with self.command_lock:
+            self.commands.append((command, args))
+            if self.draining:
+                return
+            self.draining = True
+        while True:
+            with self.command_lock:
+                if not self.commands:
+                    self.draining = False
+                    return
+                command, args = self.commands.popleft()
+            try:
+                command(*args)
+            except Exception as e:
+                logger.error(f"Lobby {self.code} command {getattr(command, '__name__', command)} failed: {e}")
 
     def is_full(self):
         return len(self.players) >= self.settings["max_players"]
 
+    def open_seats(self):
+        """Seats a newcomer could take right now (0 once the game starts)."""
+        if self.closed or self.state != "WAITING":
+            return 0
+        return max(0, self.settings["max_players"] - len(self.players))
+
     def get_host_name(self):
-        if not self.players:
-            return "Unknown"
         # First player added is considered host
-        return list(self.players.keys())[0]
+        return next(iter(self.players), "Unknown")
+
+    def changed(self):
+        if self.on_change:
+            self.on_change(self)
+
+    def touch(self):
+        self.last_activity = time.monotonic()
+
+    def time_limit(self, key):
+        """Seconds allowed for a clue or vote, None if unlimited."""
+        seconds = self.settings.get(key)
+        if not seconds or seconds <= 0:
+            return None
+        return max(MIN_TIME_LIMIT, seconds)
+
+    def set_deadline(self, seconds, command):
+        """Queues command(serial) after `seconds` unless the game moves on first."""
+        self.cancel_deadline()
+        if seconds:
+            self.deadline = scheduler.call_later(seconds, self.submit, command, self.deadline_serial)
+
+    def cancel_deadline(self):
+        self.deadline_serial += 1 # a timeout already in the queue will see it's stale
+        if self.deadline is not None:
+            scheduler.cancel(self.deadline)
+            self.deadline = None
 
     def add_player(self, nickname, handler):
         if self.settings["anti_cheat_enabled"]:
@@ -39,7 +137,9 @@ class Lobby:
             # But for now we just want to handle duplicates for playability.
             pass
         
-        if self.state != "WAITING":
+        if self.closed:
+            return False, "Lobby not found"
+        if self.state != "WAITING" or self.is_full():
             return False, ERR_GAME_FULL
 
         # Handle Duplicate Names
@@ -51,15 +151,131 @@ class Lobby:
 
         self.players[nickname] = handler
         handler.lobby = self # Link handler to this lobby
-        logger.info(f"Player {nickname} joined Lobby {self.code}.")
-        self.broadcast_state()
+        self.touch()
+        self.version += 1
+        log_event("player_joined", "Player %(nickname)s joined Lobby %(code)s.", nickname=nickname, code=self.code)
+        self.changed()
+        self.broadcast_players({"joined": nickname}, newcomer=nickname)
+        if self.settings.get("auto_start") and len(self.players) >= self.settings["min_players"]:
+            # Queued, so the newcomer's JOIN_SUCCESS goes out before GAME_START
+            self.submit(self.auto_start)
         return True, nickname
 
+    def auto_start(self):
+        """Matchmaking lobbies start on their own once min_players are in."""
+        if self.state == "WAITING" and len(self.players) >= self.settings["min_players"]:
+            self.start_game(self.get_host_name())
+
+    def add_spectator(self, handler):
+        """Lets someone watch, in any state. Returns (True, feed fields or None) or (False, error)."""
+        if self.closed:
+            return False, "Lobby not found"
+        if len(self.spectators) >= self.settings.get("max_spectators", DEFAULT_MAX_SPECTATORS):
+            return False, "Too many spectators"
+        return True, self.spectators.add(handler)
+
+    def spectator_snapshot(self):
+        """What a new spectator needs to draw the lobby or the game: never the word or the imposter."""
+        message = {
+            "type": MSG_SPECTATE,
+            "code": self.code,
+            "state": self.state,
+            "players": list(self.players.keys()),
+            "host": self.get_host_name(),
+            "version": self.version,
+            "spectators": len(self.spectators)
+        }
+        if self.state in ("PLAYING", "VOTING"):
+            message["turn_order"] = self.turn_order
+            message["clues"] = self.clues
+            if self.state == "PLAYING":
+                message["current_turn"] = self.turn_order[self.current_turn_index]
+            else:
+                message["candidates"] = list(self.players.keys())
+        return message
+
+    def issue_resume_token(self, nickname):
+        token = secrets.token_urlsafe(16)
+        self.resume_tokens[nickname] = token
+        return token
+
+    def hold_seat(self, nickname):
+        """A player dropped mid-game: keeps their seat (and turn) for
+        resume_grace_seconds instead of resetting the game. False if there's
+        no game to protect or no way for them to come back."""
+        grace = self.settings.get("resume_grace_seconds")
+        if not grace or self.state not in ("PLAYING", "VOTING") or nickname not in self.resume_tokens:
+            return False
+        self.away[nickname] = scheduler.call_later(grace, self.submit, self.seat_expired,
+                                                   nickname, self.resume_tokens[nickname])
+        log_event("seat_held", "Player %(nickname)s dropped from Lobby %(code)s, holding the seat for %(grace)ss.",
+                  nickname=nickname, code=self.code, grace=grace)
+        return True
+
+    def seat_expired(self, nickname, token):
+        if self.away.get(nickname) is None or self.resume_tokens.get(nickname) != token:
+            return # resumed (or left) meanwhile
+        log_event("seat_expired", "Player %(nickname)s did not come back to Lobby %(code)s.", nickname=nickname, code=self.code)
+        self.remove_player(nickname)
+
+    def resume_player(self, nickname, token, handler):
+        """Puts a reconnected player back in their seat. Returns (True, new token) or (False, error)."""
+        expected = self.resume_tokens.get(nickname)
+        if self.closed or expected is None or not token or not hmac.compare_digest(expected, token):
+            return False, ERR_SESSION_EXPIRED
+        timer = self.away.pop(nickname, None)
+        if timer is not None:
+            scheduler.cancel(timer)
+        old = self.players.get(nickname)
+        if old is not None and old is not handler:
+            # The old connection may not have noticed it's dead yet
+            old.lobby = None
+            old.drop_connection()
+        self.players[nickname] = handler # same key, so the seat (and host) order is kept
+        handler.lobby = self
+        self.touch()
+        log_event("player_resumed", "Player %(nickname)s resumed in Lobby %(code)s.", nickname=nickname, code=self.code)
+        return True, self.issue_resume_token(nickname)
+
+    def resume_snapshot(self, nickname):
+        """Everything a resumed player needs to redraw the lobby or the game."""
+        message = {
+            "type": MSG_RESUME_SUCCESS,
+            "code": self.code,
+            "nickname": nickname,
+            "resume_token": self.resume_tokens[nickname],
+            "state": self.state,
+            "players": list(self.players.keys()),
+            "host": self.get_host_name(),
+            "version": self.version
+        }
+        if self.state in ("PLAYING", "VOTING"):
+            is_imposter = nickname == self.imposter_nickname
+            message.update({
+                "role": "IMPOSTER" if is_imposter else "CITIZEN",
+                "word": "SECRET" if is_imposter else self.secret_word,
+                "turn_order": self.turn_order,
+                "clues": self.clues,
+            })
+            if self.state == "PLAYING":
+                message["current_turn"] = self.turn_order[self.current_turn_index]
+            else:
+                message["candidates"] = list(self.players.keys())
+                message["voted"] = nickname in self.votes
+        return message
+
     def remove_player(self, nickname):
+        timer = self.away.pop(nickname, None)
+        if timer is not None:
+            scheduler.cancel(timer)
+        self.resume_tokens.pop(nickname, None)
         if nickname in self.players:
             is_host_leaving = (nickname == self.get_host_name())
             del self.players[nickname]
-            logger.info(f"Player {nickname} left Lobby {self.code}.")
+            log_event("player_left", "Player %(nickname)s left Lobby %(code)s.", nickname=nickname, code=self.code)
+            self.touch()
+            self.version += 1
+            self.changed()
             
             if self.players:
                 # If host left, assign new host
@@ -77,13 +293,10 @@ class Lobby:
                     # Or we could try to continue if not crucial (but roles break)
                     self.reset_game("Player disconnected. Game Reset.", new_host_override=self.get_host_name())
                 else:
-                    self.broadcast({
-                        "type": MSG_STATE_UPDATE,
-                        "phase": "LOBBY",
-                        "players": list(self.players.keys()),
-                        "host": self.get_host_name(),
-                        "info": info_msg
-                    })
+                    change = {"left": nickname}
+                    if is_host_leaving:
+                        change["host"] = self.get_host_name()
+                    self.broadcast_players(change, info_msg)
         
         # If empty, maybe the manager should delete this lobby? Handled by manager.
 
@@ -91,21 +304,29 @@ class Lobby:
         host = self.get_host_name()
         if requestor_nickname != host:
             return False, "Only the Host can start the game!"
+        if self.state != "WAITING":
+            return False, "The game has already started!"
 
         min_p = self.settings["min_players"]
         if len(self.players) < min_p: 
              return False, f"Not enough players (min {min_p})"
 
         self.state = "PLAYING"
-        self.secret_word = random.choice(self.word_list)
-        self.imposter_nickname = random.choice(list(self.players.keys()))
+        self.touch()
+        self.changed()
+        self.secret_word = self.word_sampler.draw()
+        self.imposter_nickname = self.rng.choice(list(self.players.keys()))
         self.turn_order = list(self.players.keys())
-        random.shuffle(self.turn_order)
+        self.rng.shuffle(self.turn_order)
         self.current_turn_index = 0
         self.round_count = 0
         self.votes = {}
+        self.clues = []
+        self.started_at = time.time()
 
-        logger.info(f"Lobby {self.code} Started. {self.secret_word} / {self.imposter_nickname}")
+        # Never log the word or the imposter: log files outlive the game
+        log_event("game_started", "Lobby %(code)s started with %(players)s players.",
+                  code=self.code, players=len(self.turn_order))
         
         for nick, handler in self.players.items():
             role = "IMPOSTER" if nick == self.imposter_nickname else "CITIZEN"
@@ -116,6 +337,8 @@ class Lobby:
                 "word": word,
                 "turn_order": self.turn_order
             })
+        if self.spectators:
+            self.spectators.publish({"type": MSG_GAME_START, "role": "SPECTATOR", "turn_order": self.turn_order})
         
         self.broadcast_turn()
         return True, None
@@ -125,12 +348,32 @@ class Lobby:
         
         if self.turn_order[self.current_turn_index] != nickname: return
 
+        self.touch()
+        self.clues.append([nickname, clue_word])
         self.broadcast({
             "type": MSG_CLUE,
             "sender": nickname,
             "clue": clue_word
         })
+        self.next_turn()
 
+    def turn_timed_out(self, serial):
+        if serial != self.deadline_serial or self.state != "PLAYING": return
+
+        # The player is AFK: skip them instead of freezing the game
+        nickname = self.turn_order[self.current_turn_index]
+        log_event("turn_skipped", "Lobby %(code)s: %(nickname)s ran out of time, turn skipped.",
+                  code=self.code, nickname=nickname)
+        self.clues.append([nickname, SKIPPED_CLUE])
+        self.broadcast({
+            "type": MSG_CLUE,
+            "sender": nickname,
+            "clue": SKIPPED_CLUE,
+            "skipped": True
+        })
+        self.next_turn()
+
+    def next_turn(self):
         self.current_turn_index += 1
         if self.current_turn_index >= len(self.turn_order):
             self.current_turn_index = 0
@@ -143,23 +386,38 @@ class Lobby:
 
     def start_voting(self):
         self.state = "VOTING"
+        self.changed()
         self.votes = {}
-        self.broadcast({
+        time_limit = self.time_limit("vote_timeout_seconds")
+        self.set_deadline(time_limit, self.vote_timed_out)
+        message = {
             "type": MSG_STATE_UPDATE,
             "phase": "VOTING",
             "candidates": list(self.players.keys())
-        })
+        }
+        if time_limit:
+            message["time_limit"] = time_limit
+        self.broadcast(message)
 
     def handle_vote(self, voter, suspect):
         if self.state != "VOTING": return
-        if voter in self.votes: return
+        if voter not in self.players or voter in self.votes: return
         
         self.votes[voter] = suspect
-        logger.info(f"Vote received from {voter}. Total: {len(self.votes)}/{len(self.players)}")
+        self.touch()
+        log_event("vote_received", "Lobby %(code)s: vote from %(voter)s, %(votes)s/%(players)s.", logging.DEBUG,
+                  code=self.code, voter=voter, votes=len(self.votes), players=len(self.players))
         if len(self.votes) >= len(self.players):
-            logger.info("All votes received. Calculating results...")
             self.calculate_results()
 
+    def vote_timed_out(self, serial):
+        if serial != self.deadline_serial or self.state != "VOTING": return
+
+        # Count whatever arrived (no votes at all means the imposter wins)
+        log_event("vote_deadline", "Lobby %(code)s: voting time is up with %(votes)s/%(players)s votes.",
+                  code=self.code, votes=len(self.votes), players=len(self.players))
+        self.calculate_results()
+
     def calculate_results(self):
         vote_counts = {}
         for suspect in self.votes.values():
@@ -200,6 +458,7 @@ class Lobby:
         self.broadcast_game_over(winner, reason)
 
     def broadcast_game_over(self, winner, reason):
+        self.cancel_deadline()
         self.state = "GAME_OVER"
         self.broadcast({
             "type": MSG_GAME_OVER,
@@ -208,12 +467,16 @@ class Lobby:
             "imposter": self.imposter_nickname,
             "word": self.secret_word
         })
+        # Queued for the history writer, nothing here waits on the disk
+        history.record(self.code, self.started_at, self.secret_word, self.imposter_nickname,
+                       winner, reason, self.turn_order, self.votes, self.clues)
         
         # Reset lobby after a short delay (or let clients handle it)
         # For simplicity, we reset logic but keep players connected
         self.secret_word = ""
         self.imposter_nickname = None
         self.state = "WAITING"
+        self.changed()
         
         # We don't broadcast lobby state immediately to let them see the Game Over screen?
         # Or we broadcast it so they know they are back in lobby.
@@ -222,32 +485,80 @@ class Lobby:
 
     def broadcast_turn(self):
         current_player = self.turn_order[self.current_turn_index]
-        self.broadcast({
+        time_limit = self.time_limit("clue_timeout_seconds")
+        self.set_deadline(time_limit, self.turn_timed_out)
+        message = {
             "type": MSG_STATE_UPDATE,
             "phase": "CLUE_PHASE",
             "current_turn": current_player
-        })
+        }
+        if time_limit:
+            message["time_limit"] = time_limit
+        self.broadcast(message)
 
-    def broadcast_state(self):
-        self.broadcast({
+    def lobby_snapshot(self, info=None, host=None):
+        """The whole player list, for newcomers, old clients and SYNC requests."""
+        message = {
             "type": MSG_STATE_UPDATE,
             "phase": "LOBBY",
             "players": list(self.players.keys()),
-            "host": self.get_host_name()
-        })
+            "host": host or self.get_host_name(),
+            "version": self.version
+        }
+        if info:
+            message["info"] = info
+        return message
 
-    def broadcast(self, message):
-        for handler in self.players.values():
-            handler.send_message(message)
+    def broadcast_state(self):
+        self.broadcast(self.lobby_snapshot())
+
+    def broadcast_players(self, change, info=None, newcomer=None):
+        """After a join or leave: a LOBBY_DELTA to clients that asked for
+        deltas, the whole list to everyone else (and to the newcomer)."""
+        delta = {"type": MSG_LOBBY_DELTA, "version": self.version, **change}
+        if info:
+            delta["info"] = info
+        delta_handlers = []
+        full_handlers = []
+        for nickname, handler in self.players.items():
+            if handler.lobby_deltas and nickname != newcomer:
+                delta_handlers.append(handler)
+            else:
+                full_handlers.append(handler)
+        if delta_handlers:
+            self.broadcast(delta, delta_handlers)
+        if full_handlers:
+            self.broadcast(self.lobby_snapshot(info), full_handlers)
+        if self.spectators:
+            self.spectators.publish(self.lobby_snapshot(info))
+
+    def broadcast(self, message, handlers=None):
+        # Serialize once per codec and encrypt once per (codec, cipher) pair,
+        # then hand the same bytes to every player using that pair. Legacy
+        # clients share the global Fernet cipher; session-key clients each
+        # get their own seal of the shared payload. Spectators get it after
+        # the players, from the fan-out (see spectators.py).
+        coalesce_key = coalesce_key_for(message)
+        payloads = {}
+        packets = {}
+        for handler in handlers if handlers is not None else list(self.players.values()):
+            codec = handler.codec
+            packet = packets.get((codec, handler.cipher))
+            if packet is None:
+                payload = payloads.get(codec)
+                if payload is None:
+                    payload = payloads[codec] = serialize_message(message, codec)
+                start = time.perf_counter()
+                packet = packets[(codec, handler.cipher)] = seal_payload(payload, handler.cipher)
+                metrics.observe("encrypt_seconds", time.perf_counter() - start)
+            handler.send_packet(packet, coalesce_key)
+        if handlers is None:
+            self.spectators.publish(message)
 
     def reset_game(self, reason, new_host_override=None):
+        self.cancel_deadline()
         self.state = "WAITING"
+        self.changed()
         self.secret_word = ""
         self.imposter_nickname = None
-        self.broadcast({
-            "type": MSG_STATE_UPDATE,
-            "phase": "LOBBY",
-            "players": list(self.players.keys()),
-            "host": new_host_override if new_host_override else self.get_host_name(),
-            "info": reason
-        })
+        self.broadcast(self.lobby_snapshot(reason, new_host_override))
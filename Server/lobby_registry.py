@@ -0,0 +1,65 @@
+import threading
+
+DEFAULT_STRIPES = 16
+
+
+class LobbyRegistry:
+    """code -> Lobby map guarded by striped locks.
+
+    Each code hashes to one of N stripes with its own dict and lock, so
+    lookups, creates and removes in different stripes never wait on each
+    other and there is no global lock. Whole-table reads (items(), len())
+    take each stripe in turn and return a snapshot.
+    """
+    def __init__(self, stripes=DEFAULT_STRIPES):
+        self.stripes = tuple(({}, threading.Lock()) for _ in range(max(1, stripes)))
+
+    def _stripe(self, code):
+        return self.stripes[hash(code) % len(self.stripes)]
+
+    def get(self, code, default=None):
+        table, lock = self._stripe(code)
+        with lock:
+            return table.get(code, default)
+
+    def add(self, code, lobby):
+        """Registers a lobby; False (and no change) if the code is taken."""
+        table, lock = self._stripe(code)
+        with lock:
+            if code in table:
+                return False
+            table[code] = lobby
+            return True
+
+    def pop(self, code, default=None):
+        table, lock = self._stripe(code)
+        with lock:
+            return table.pop(code, default)
+
+    def __contains__(self, code):
+        table, lock = self._stripe(code)
+        with lock:
+            return code in table
+
+    def items(self):
+        found = []
+        for table, lock in self.stripes:
+            with lock:
+                found.extend(table.items())
+        return found
+
+    def keys(self):
+        return [code for code, lobby in self.items()]
+
+    def values(self):
+        return [lobby for code, lobby in self.items()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        total = 0
+        for table, lock in self.stripes:
+            with lock:
+                total += len(table)
+        return total
@@ -1,35 +1,173 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
 import sys
+import time
 
-def setup_logger(log_file="server_log.txt"):
-    """Configures the server logger to write to file and console."""
-    logger = logging.getLogger("ImposterServer")
-    logger.setLevel(logging.DEBUG)
+# Game threads only put records on a queue; one listener thread formats them
+# and does the (possibly slow) disk and console writes. The file gets one
+# JSON object per line, the console the usual one-line text.
+DEFAULT_LOG_FILE = "server_log.jsonl"
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+DEFAULT_ROTATE_SECONDS = 24 * 3600
+# Records waiting for the listener; beyond this they are dropped, not waited on
+QUEUE_SIZE = 10000
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener untouched and never waits.
+
+    The stock QueueHandler formats every record in the calling thread; here
+    the message (and its args) stays unformatted until the listener writes
+    it. A full queue means the disk is stalled: the record is counted and
+    dropped rather than blocking a game thread.
+    """
+    def __init__(self, log_queue):
+        logging.handlers.QueueHandler.__init__(self, log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+log_queue = queue.Queue(QUEUE_SIZE)
+queue_handler = NonBlockingQueueHandler(log_queue)
+sampling = {} # event -> fraction of those events to keep
+listener = None # QueueListener doing the actual writes
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """{"ts", "level", "event", "msg", ...event fields} per line."""
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "event": getattr(record, "event", "log"),
+            "msg": record.getMessage(),
+        }
+        if isinstance(record.args, dict):
+            entry.update(record.args)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SizeAndTimeRotatingHandler(logging.handlers.RotatingFileHandler):
+    """Numbered backups (.1 is the newest), rolled over when the file passes
+    max_bytes or has been written to for rotate_seconds, whichever comes first."""
+    def __init__(self, filename, max_bytes, backup_count, rotate_seconds):
+        logging.handlers.RotatingFileHandler.__init__(
+            self, filename, maxBytes=max_bytes, backupCount=max(1, backup_count), encoding="utf-8", delay=True)
+        self.rotate_seconds = rotate_seconds
+        self.rollover_at = time.time() + rotate_seconds if rotate_seconds else None
+
+    def shouldRollover(self, record):
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return True
+        return logging.handlers.RotatingFileHandler.shouldRollover(self, record)
+
+    def doRollover(self):
+        logging.handlers.RotatingFileHandler.doRollover(self)
+        if self.rotate_seconds:
+            self.rollover_at = time.time() + self.rotate_seconds
 
-    # File Handler
-    file_handler = logging.FileHandler(log_file, encoding='utf-8')
-    file_handler.setLevel(logging.DEBUG)
-    file_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    file_handler.setFormatter(file_formatter)
 
-    # Console Handler
+def make_handlers(log_file, max_bytes, backup_count, rotate_seconds, console_level):
+    # Relative to the Server directory, like the other files in the settings
+    if not os.path.isabs(log_file):
+        log_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), log_file)
+    file_handler = SizeAndTimeRotatingHandler(log_file, max_bytes, backup_count, rotate_seconds)
+    file_handler.setFormatter(JsonLinesFormatter())
+
     console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.INFO)
-    console_formatter = logging.Formatter('%(levelname)s: %(message)s')
-    console_handler.setFormatter(console_formatter)
+    console_handler.setLevel(console_level)
+    console_handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
+    return file_handler, console_handler
+
 
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+def setup_logger(log_file=DEFAULT_LOG_FILE):
+    """Configures the server logger: a queue in front of a rotating JSONL file and the console."""
+    logger = logging.getLogger("ImposterServer")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(queue_handler)
 
+    global listener
+    listener = logging.handlers.QueueListener(
+        log_queue, *make_handlers(log_file, DEFAULT_MAX_BYTES, DEFAULT_BACKUP_COUNT,
+                                  DEFAULT_ROTATE_SECONDS, logging.INFO),
+        respect_handler_level=True)
+    listener.start()
     return logger
 
+
+def configure_logging(settings, log_suffix=""):
+    """Applies the server settings (file, rotation, debug mode, sampling).
+
+    log_suffix keeps processes that share a working directory (shards) from
+    rotating each other's files.
+    """
+    global listener
+    debug = settings.get("debug_mode", False)
+    handlers = make_handlers(
+        settings.get("log_file", DEFAULT_LOG_FILE) + log_suffix,
+        settings.get("log_max_bytes", DEFAULT_MAX_BYTES),
+        settings.get("log_backup_count", DEFAULT_BACKUP_COUNT),
+        settings.get("log_rotate_seconds", DEFAULT_ROTATE_SECONDS),
+        logging.DEBUG if debug else logging.INFO)
+    # stop() writes out what's queued with the old handlers first
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+
+    sampling.clear()
+    sampling.update(settings.get("log_sampling", {}))
+    set_debug_mode(debug)
+
+
 def set_debug_mode(enabled: bool):
-    """Updates console logger level based on debug flag."""
-    level = logging.DEBUG if enabled else logging.INFO
-    for handler in logger.handlers:
-        if isinstance(handler, logging.StreamHandler):
-            handler.setLevel(level)
+    """DEBUG events are only created (let alone written) in debug mode."""
+    logger.setLevel(logging.DEBUG if enabled else logging.INFO)
     logger.info(f"Debug Mode: {'ON' if enabled else 'OFF'}")
 
+
+def log_event(event, template, level=logging.INFO, **fields):
+    """Structured log line: 'event' plus fields, formatted on the listener thread.
+
+    template uses %(field)s placeholders for the console text. Returns at
+    once if the level is off; events listed in log_sampling are only kept
+    with that probability (and carry sample_rate so counts can be scaled).
+    """
+    if not logger.isEnabledFor(level):
+        return
+    rate = sampling.get(event)
+    if rate is not None:
+        if random.random() >= rate:
+            return
+        fields["sample_rate"] = rate
+    if fields:
+        logger.log(level, template, fields, extra={"event": event})
+    else:
+        logger.log(level, template, extra={"event": event})
+
+
+@atexit.register
+def flush_logs():
+    listener.stop()
+
+
 # Global logger instance
 logger = setup_logger()
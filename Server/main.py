@@ -6,60 +6,101 @@ from logger import logger
 from client_handler import ClientHandler
 from cryptography.fernet import Fernet
 
-def start_server():
-    # Derive encryption key
-    try:
-        key = get_protocol_key()
-        cipher = Fernet(key)
-        logger.info(f"Server starting.")
-    except Exception as e:
-        logger.error(f"Failed to generate key: {e}")
-        return
-
+def open_listener(port, reuse_port=False):
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     # Allow reuse address to avoid 'Address already in use' during testing
     server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    
+    if reuse_port:
+        # Several shard processes share the public port; the kernel spreads connections
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    server_socket.bind(("", port)) # Bind to all interfaces
+    server_socket.listen(socket.SOMAXCONN)
+    logger.info(f"Server listening on port {port}")
+    return server_socket
+
+def accept_loop(server_socket, cipher):
     try:
-        server_socket.bind(("", DEFAULT_PORT)) # Bind to all interfaces
-        server_socket.listen(5)
-        logger.info(f"Server listening on port {DEFAULT_PORT}")
-        
         while True:
             conn, addr = server_socket.accept()
             handler = ClientHandler(conn, addr, cipher)
             handler.start()
-            
     except Exception as e:
         logger.error(f"Server crashed: {e}")
     finally:
         server_socket.close()
 
+def start_server(port=DEFAULT_PORT, engine=None, extra_ports=(), reuse_port=False):
+    # Derive encryption key
+    try:
+        key = get_protocol_key()
+        cipher = Fernet(key)
+        logger.info(f"Server starting.")
+    except Exception as e:
+        logger.error(f"Failed to generate key: {e}")
+        return
+
+    # Idle lobby reaping runs on the shared timer thread
+    game_manager.start_reaper()
+    # Finished games go to the history database from a writer thread of its
+    # own; the leaderboard picks them up from there (one checkpoint per shard,
+    # named like the shard's log file)
+    suffix = f".shard{game_manager.shard_index}" if game_manager.shard_count > 1 else ""
+    leaderboard.start(game_manager.settings, suffix)
+    history.on_written = leaderboard.catch_up
+    history.start(game_manager.settings)
+
+    # "threaded" (one thread per client) or "asyncio" (single event loop)
+    engine = engine or game_manager.settings.get("server_engine", "threaded")
+    if engine == "asyncio":
+        from async_server import run_async_server
+        run_async_server(cipher, port, extra_ports, reuse_port)
+        return
+
+    try:
+        server_socket = open_listener(port, reuse_port)
+        # Extra ports (a shard's private redirect port) get their own accept thread
+        for extra_port in extra_ports:
+            threading.Thread(target=accept_loop, args=(open_listener(extra_port), cipher), daemon=True).start()
+    except Exception as e:
+        logger.error(f"Server crashed: {e}")
+        return
+    accept_loop(server_socket, cipher)
+
 from game_manager import game_manager
+from history import history
+from leaderboard import leaderboard
 
 def udp_beacon(port, server_code):
-    """Broadcasting server existence and active lobbies."""
+    """Broadcasting server existence and active lobbies.
+
+    All lobbies go out packed into MTU-sized datagrams (see beacon.py): a
+    full snapshot every few intervals and only the changes in between.
+    """
+    from beacon import BeaconEncoder
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    interval = game_manager.settings.get("beacon_interval", 2.0)
+    encoder = BeaconEncoder(port, game_manager.settings.get("beacon_full_every", 3))
     
     logger.info("UDP Beacon started.")
     
     while True:
         try:
-            # 2. Announce Active Lobbies
-            active_lobbies = list(game_manager.lobbies.keys())
-            for code in active_lobbies:
-                lobby = game_manager.get_lobby(code)
-                host = lobby.get_host_name() if lobby else "Unknown"
-                msg_lobby = f"IMPOSTOR_GAME:{code}:{host}".encode()
-                sock.sendto(msg_lobby, ('<broadcast>', port))
+            for datagram in encoder.tick(game_manager.lobbies, game_manager.drain_lobby_changes()):
+                sock.sendto(datagram, ('<broadcast>', port))
             
-            threading.Event().wait(2.0)
+            threading.Event().wait(interval)
         except Exception as e:
             logger.error(f"Beacon error: {e}")
             break
 
 if __name__ == "__main__":
+    shards = game_manager.settings.get("shards", 1)
+    if shards > 1:
+        from sharding import run_sharded
+        run_sharded(shards)
+        sys.exit(0)
+
     # Start UDP Beacon in background
     beacon_thread = threading.Thread(target=udp_beacon, args=(DEFAULT_PORT, "CENTRAL"), daemon=True)
     beacon_thread.start()
@@ -0,0 +1,70 @@
+import bisect
+import threading
+
+
+class OpenLobbyIndex:
+    """WAITING lobbies with free seats, bucketed by how many seats are free.
+
+    buckets[free] keeps its codes in insertion order (a dict used as an
+    ordered set) and counts is the sorted list of free-seat values that
+    have a non-empty bucket. Finding the fullest lobby that still has room
+    is counts[0] and the oldest code in that bucket: a bisect over at most
+    max_players values, however many lobbies there are. Lobbies report
+    their free seats through update() whenever players or state change.
+    """
+    def __init__(self):
+        self.buckets = {} # free seats -> {code: None}
+        self.counts = []  # sorted free-seat values with a non-empty bucket
+        self.slots = {}   # code -> free seats it's filed under
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.slots)
+
+    def _unfile(self, code):
+        free = self.slots.pop(code, None)
+        if free is None:
+            return
+        bucket = self.buckets[free]
+        del bucket[code]
+        if not bucket:
+            del self.buckets[free]
+            del self.counts[bisect.bisect_left(self.counts, free)]
+
+    def _file(self, code, free):
+        bucket = self.buckets.get(free)
+        if bucket is None:
+            bucket = self.buckets[free] = {}
+            bisect.insort(self.counts, free)
+        bucket[code] = None
+        self.slots[code] = free
+
+    def update(self, code, free):
+        """Files a lobby under its free seats; 0 (full, playing, closed) takes it out."""
+        with self.lock:
+            if self.slots.get(code) == free:
+                return
+            self._unfile(code)
+            if free > 0:
+                self._file(code, free)
+
+    def discard(self, code):
+        with self.lock:
+            self._unfile(code)
+
+    def take(self):
+        """Code of the fullest lobby with a free seat, or None.
+
+        The seat is counted as taken right away, so players asking at the
+        same moment spread over lobbies instead of all picking the one with
+        a single seat left; the lobby's next update() puts the real number back.
+        """
+        with self.lock:
+            if not self.counts:
+                return None
+            free = self.counts[0]
+            code = next(iter(self.buckets[free]))
+            self._unfile(code)
+            if free > 1:
+                self._file(code, free - 1)
+            return code
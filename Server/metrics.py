@@ -0,0 +1,124 @@
+import bisect
+import json
+import threading
+import time
+
+# Default histogram buckets, in seconds (upper bounds; a final +Inf bucket is implicit)
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+class _Shard:
+    """One thread's private counters and histograms. Only its owner writes to it."""
+    __slots__ = ("thread", "counters", "histograms")
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.counters = {}   # name -> int
+        self.histograms = {} # name -> [bucket counts..., total count, sum]
+
+
+class MetricsRegistry:
+    """Counters and fixed-bucket histograms with no lock on the hot path.
+
+    Each thread updates its own shard; snapshot() sums the shards. Shards of
+    threads that have exited are folded into a retired shard so thread churn
+    (one thread per connection) doesn't grow the registry.
+    """
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _Shard(None)
+        self._lock = threading.Lock() # registration and snapshots only
+        self._bounds = {}             # histogram name -> bucket bounds
+        self._gauges = {}             # name -> fn(counters) -> value
+        self.started = time.time()
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = _Shard(threading.current_thread())
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def inc(self, name, amount=1):
+        counters = self._shard().counters
+        counters[name] = counters.get(name, 0) + amount
+
+    def observe(self, name, value):
+        """Adds a sample to a histogram (LATENCY_BUCKETS unless registered otherwise)."""
+        bounds = self._bounds.get(name, LATENCY_BUCKETS)
+        histograms = self._shard().histograms
+        hist = histograms.get(name)
+        if hist is None:
+            hist = histograms[name] = [0] * (len(bounds) + 3)
+        hist[bisect.bisect_left(bounds, value)] += 1
+        hist[-2] += 1
+        hist[-1] += value
+
+    def register_histogram(self, name, bounds):
+        self._bounds[name] = tuple(bounds)
+
+    def register_gauge(self, name, fn):
+        """fn(counters) is called at snapshot time, never on the hot path."""
+        self._gauges[name] = fn
+
+    def snapshot(self):
+        counters = {}
+        histograms = {}
+        with self._lock:
+            live = []
+            for shard in self._shards:
+                if not shard.thread.is_alive():
+                    # The owner is gone, so nobody writes here any more
+                    self._merge(self._retired, shard)
+                else:
+                    live.append(shard)
+            self._shards = live
+            for shard in [self._retired] + live:
+                for name, value in dict(shard.counters).items():
+                    counters[name] = counters.get(name, 0) + value
+                for name, hist in dict(shard.histograms).items():
+                    total = histograms.get(name)
+                    values = list(hist)
+                    histograms[name] = values if total is None else [a + b for a, b in zip(total, values)]
+
+        gauges = {}
+        for name, fn in list(self._gauges.items()):
+            try:
+                gauges[name] = fn(counters)
+            except Exception as e:
+                gauges[name] = f"error: {e}"
+
+        return {
+            "timestamp": time.time(),
+            "uptime": round(time.time() - self.started, 3),
+            "counters": counters,
+            "gauges": gauges,
+            "histograms": {name: self._describe(name, hist) for name, hist in histograms.items()},
+        }
+
+    def _merge(self, into, shard):
+        for name, value in shard.counters.items():
+            into.counters[name] = into.counters.get(name, 0) + value
+        for name, hist in shard.histograms.items():
+            total = into.histograms.get(name)
+            into.histograms[name] = list(hist) if total is None else [a + b for a, b in zip(total, hist)]
+
+    def _describe(self, name, hist):
+        bounds = self._bounds.get(name, LATENCY_BUCKETS)
+        buckets = [[bound, count] for bound, count in zip(bounds + ("+Inf",), hist[:-2])]
+        count, total = hist[-2], hist[-1]
+        return {"count": count, "sum": total, "mean": total / count if count else 0.0, "buckets": buckets}
+
+    def dump(self, path):
+        """Writes a snapshot to disk as JSON; returns the snapshot."""
+        snap = self.snapshot()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(snap, f, indent=2)
+        return snap
+
+# Global registry
+metrics = MetricsRegistry()
@@ -0,0 +1,99 @@
+import collections
+import threading
+from protocol import *
+
+# What to do when a client's outbound queue is full
+POLICY_DROP = "drop"         # disconnect the client
+POLICY_COALESCE = "coalesce" # keep only the newest queued state update per phase, drop if that's not enough
+
+DEFAULT_QUEUE_SIZE = 256
+
+def coalesce_key_for(message):
+    """Messages that fully supersede older ones of the same kind can be coalesced.
+
+    A STATE_UPDATE for a phase carries the whole phase state, so only the newest
+    one matters to a client that is behind. Everything else (clues, game start,
+    game over) must be delivered.
+    """
+    if message.get("type") == MSG_STATE_UPDATE:
+        return message.get("phase")
+    return None
+
+class OutboundQueue:
+    """Bounded per-connection send queue, drained by that connection's own writer.
+
+    put() never blocks, so a broadcast costs the same whether a receiver is
+    fast, slow or gone; the writer is the only thing that waits on the socket.
+    """
+    def __init__(self, max_size=DEFAULT_QUEUE_SIZE, policy=POLICY_DROP):
+        self.max_size = max_size
+        self.policy = policy
+        self.entries = collections.deque() # [coalesce_key, packet]
+        self.latest = {}                   # coalesce_key -> its live entry
+        self.size = 0                      # live entries only
+        self.coalesced = 0                 # entries a newer update superseded, ever
+        self.closed = False
+        self.cond = threading.Condition()
+
+    def put(self, packet, coalesce_key=None):
+        """Queues a packet. Returns False if the client overflowed and must be dropped."""
+        with self.cond:
+            if self.closed:
+                return True
+            if self.size >= self.max_size and self.policy == POLICY_COALESCE:
+                stale = self.latest.get(coalesce_key) if coalesce_key is not None else None
+                if stale is not None:
+                    stale[1] = None # the new update supersedes the queued one
+                self._compact()
+            if self.size >= self.max_size:
+                return False
+
+            entry = [coalesce_key, packet]
+            self.entries.append(entry)
+            if coalesce_key is not None:
+                self.latest[coalesce_key] = entry
+            self.size += 1
+            self.cond.notify()
+            return True
+
+    def take(self, timeout=None):
+        """Blocks until data is queued; returns everything queued as one chunk.
+
+        Returns None once the queue is closed and empty (or on timeout).
+        """
+        with self.cond:
+            while not self.size and not self.closed:
+                if not self.cond.wait(timeout):
+                    return None
+            return self._drain() or None
+
+    def take_nowait(self):
+        """Returns everything queued (possibly b"") without waiting."""
+        with self.cond:
+            return self._drain()
+
+    def _compact(self):
+        """Drops every keyed entry that a newer one (queued or incoming) supersedes."""
+        live = collections.deque()
+        for entry in self.entries:
+            key, packet = entry
+            if packet is None:
+                continue
+            if key is not None and self.latest.get(key) is not entry:
+                continue
+            live.append(entry)
+        self.entries = live
+        self.coalesced += self.size - len(live)
+        self.size = len(live)
+
+    def _drain(self):
+        chunks = [packet for _, packet in self.entries if packet is not None]
+        self.entries.clear()
+        self.latest.clear()
+        self.size = 0
+        return b"".join(chunks)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
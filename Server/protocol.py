@@ -1,7 +1,10 @@
-import json
 import base64
 import hashlib
+import struct
 from cryptography.fernet import Fernet
+from codec import JSON_CODEC, BINARY_CODEC, CODECS, PREFERRED_CODECS, choose_codec, decode_payload
+from session_crypto import (SessionError, PREFERRED_AEADS, offer_session, accept_session, complete_session,
+                            open_feed, is_feed_frame)
 
 # Message Types
 MSG_LOGIN = "LOGIN"
@@ -13,18 +16,42 @@ MSG_VOTE = "VOTE"
 MSG_STATE_UPDATE = "STATE_UPDATE"
 MSG_GAME_OVER = "GAME_OVER"
 MSG_ERROR = "ERROR"
+MSG_REDIRECT = "REDIRECT" # lobby lives on another shard: reconnect to 'port'
+MSG_STATS = "STATS"       # admin, loopback only: metrics snapshot
+MSG_LOBBY_DELTA = "LOBBY_DELTA" # who joined/left and the new host, one lobby version at a time
+MSG_SYNC = "SYNC"               # client missed a LOBBY_DELTA: send the full player list again
+MSG_RESUME = "RESUME"           # reconnected client takes its seat back with the token from JOIN_SUCCESS
+MSG_RESUME_SUCCESS = "RESUME_SUCCESS" # seat restored; carries everything needed to redraw the game
+MSG_LEAVE = "LEAVE"             # leaving on purpose: free the seat now instead of holding it
+MSG_LEADERBOARD = "LEADERBOARD" # top players on a board ('board', 'limit'), plus where the asker stands
+MSG_QUICK_PLAY = "QUICK_PLAY"   # put me in the fullest open lobby (or a new one); answered with JOIN_SUCCESS
+MSG_LIST_LOBBIES = "LIST_LOBBIES" # one page of lobbies matching the filters, from 'cursor' on
+MSG_SPECTATE = "SPECTATE"       # watch a lobby ('code') without a seat or the word; answered with a snapshot
+
+# Optional behaviours a client asks for at LOGIN ("features"); LOGIN_SUCCESS
+# lists the ones the server turned on. Old clients ask for none.
+FEATURE_LOBBY_DELTAS = "lobby_deltas"
+SUPPORTED_FEATURES = (FEATURE_LOBBY_DELTAS,)
 
 # Error Codes
 ERR_NAME_TAKEN = "NAME_TAKEN"
 ERR_INVALID_CODE = "INVALID_CODE"
 ERR_GAME_FULL = "GAME_FULL"
+ERR_SESSION_EXPIRED = "SESSION_EXPIRED"
 
 # Network Defaults
 DEFAULT_PORT = 5555
 BUFFER_SIZE = 4096
 
+# Framing: every message on the TCP stream is a 4-byte big-endian length
+# followed by that many payload bytes (the encrypted token or sealed frame).
+FRAME_HEADER = struct.Struct("!I")
+MAX_FRAME_SIZE = 64 * 1024
+
 # Static Key for Initial Connection (In a real app, this should be better managed)
 # We bake a key derived from a static string so both client and server know it.
+# It only covers LOGIN / LOGIN_SUCCESS for clients that negotiate a session key
+# (see session_crypto.py); older clients use it for everything.
 GLOBAL_KEY_SOURCE = "IMPOSTOR_GAME_GLOBAL_SECURE_KEY_2026"
 GLOBAL_KEY = base64.urlsafe_b64encode(hashlib.sha256(GLOBAL_KEY_SOURCE.encode()).digest())
 
@@ -32,12 +59,63 @@ def get_protocol_key() -> bytes:
     """Returns the fixed protocol key."""
     return GLOBAL_KEY
 
-def encrypt_message(data: dict, cipher: Fernet) -> bytes:
+def serialize_message(data: dict, codec=JSON_CODEC) -> bytes:
+    """Encodes a dictionary payload to bytes (before encryption)."""
+    return codec.encode(data)
+
+def encrypt_message(data: dict, cipher: Fernet, codec=JSON_CODEC) -> bytes:
     """Encrypts a dictionary payload."""
-    json_data = json.dumps(data).encode('utf-8')
-    return cipher.encrypt(json_data)
+    return cipher.encrypt(serialize_message(data, codec))
 
 def decrypt_message(token: bytes, cipher: Fernet) -> dict:
-    """Decrypts a token into a dictionary payload."""
-    decrypted_data = cipher.decrypt(token)
-    return json.loads(decrypted_data.decode('utf-8'))
+    """Decrypts a token into a dictionary payload (any codec)."""
+    return decode_payload(cipher.decrypt(token))
+
+def pack_message(data: dict, cipher: Fernet, codec=JSON_CODEC) -> bytes:
+    """Encrypts a dictionary payload and frames it, ready for sendall()."""
+    return encode_frame(encrypt_message(data, cipher, codec))
+
+def seal_payload(payload: bytes, cipher: Fernet) -> bytes:
+    """Encrypts and frames an already serialized payload.
+
+    Lets a broadcast serialize once and encrypt once per distinct cipher.
+    """
+    return encode_frame(cipher.encrypt(payload))
+
+class FrameError(ValueError):
+    """Raised when the peer sends a frame we refuse to buffer."""
+
+def encode_frame(payload: bytes) -> bytes:
+    """Prefixes a payload with its length."""
+    if len(payload) > MAX_FRAME_SIZE:
+        raise FrameError(f"Frame of {len(payload)} bytes exceeds {MAX_FRAME_SIZE}")
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+class FrameDecoder:
+    """Incremental decoder for length-prefixed frames.
+
+    Feed it whatever recv() returned; it hands back every complete frame in
+    that data and keeps the partial tail for the next call.
+    """
+    def __init__(self, max_frame_size=MAX_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+        self.buffer = bytearray()
+
+    def feed(self, data: bytes) -> list:
+        buf = self.buffer
+        buf += data
+        frames = []
+        offset = 0
+        header_size = FRAME_HEADER.size
+        while len(buf) - offset >= header_size:
+            (length,) = FRAME_HEADER.unpack_from(buf, offset)
+            if length > self.max_frame_size:
+                raise FrameError(f"Frame of {length} bytes exceeds {self.max_frame_size}")
+            end = offset + header_size + length
+            if end > len(buf):
+                break
+            frames.append(bytes(buf[offset + header_size:end]))
+            offset = end
+        if offset:
+            del buf[:offset]
+        return frames
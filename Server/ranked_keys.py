@@ -0,0 +1,75 @@
+import bisect
+
+# A block is split once it grows past this many keys
+BLOCK_SIZE = 1000
+
+
+class RankedKeys:
+    """Sorted keys kept in blocks, with the largest key of each block in maxes.
+
+    A plain sorted list moves everything after the changed spot on every
+    insert and delete; here only one block (at most BLOCK_SIZE keys) moves,
+    so a change costs about the same with a million keys as with a thousand.
+    Not thread-safe: callers hold their own lock.
+    """
+    def __init__(self, keys=()):
+        keys = sorted(keys)
+        half = BLOCK_SIZE // 2
+        self.blocks = [keys[i:i + half] for i in range(0, len(keys), half)]
+        self.maxes = [block[-1] for block in self.blocks]
+
+    def __len__(self):
+        return sum(len(block) for block in self.blocks)
+
+    def add(self, key):
+        if not self.blocks:
+            self.blocks.append([key])
+            self.maxes.append(key)
+            return
+        i = bisect.bisect_left(self.maxes, key)
+        if i == len(self.blocks):
+            i -= 1
+            self.blocks[i].append(key)
+            self.maxes[i] = key
+        else:
+            bisect.insort(self.blocks[i], key)
+        block = self.blocks[i]
+        if len(block) > BLOCK_SIZE:
+            half = len(block) // 2
+            self.blocks.insert(i + 1, block[half:])
+            del block[half:]
+            self.maxes.insert(i, block[-1])
+
+    def remove(self, key):
+        i = bisect.bisect_left(self.maxes, key)
+        block = self.blocks[i]
+        del block[bisect.bisect_left(block, key)]
+        if not block:
+            del self.blocks[i]
+            del self.maxes[i]
+        else:
+            self.maxes[i] = block[-1]
+
+    def rank(self, key):
+        """0-based position of a key that's present."""
+        i = bisect.bisect_left(self.maxes, key)
+        return sum(len(block) for block in self.blocks[:i]) + bisect.bisect_left(self.blocks[i], key)
+
+    def first(self, count):
+        keys = []
+        for block in self.blocks:
+            keys.extend(block[:count - len(keys)])
+            if len(keys) >= count:
+                break
+        return keys
+
+    def after(self, key):
+        """Yields the keys greater than key (all of them for None), in order."""
+        if key is None:
+            i, j = 0, 0
+        else:
+            i = bisect.bisect_right(self.maxes, key)
+            j = bisect.bisect_right(self.blocks[i], key) if i < len(self.blocks) else 0
+        for block in self.blocks[i:]:
+            yield from block[j:]
+            j = 0
@@ -0,0 +1,164 @@
+import base64
+import itertools
+import os
+import struct
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey, X25519PublicKey
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+# Per-connection session keys. The client puts an ephemeral X25519 public key
+# ("kx") and the AEADs it supports ("aeads") in LOGIN, optionally with the
+# lobby code it is about to join ("bind"). The server answers LOGIN_SUCCESS
+# with its own public key and the AEAD it picked; both sides then run HKDF
+# over the shared secret and seal every later frame with their own key.
+# LOGIN and LOGIN_SUCCESS themselves still travel under the global Fernet key,
+# and clients that send no "kx" stay on Fernet for the whole session.
+#
+# Sealed frame: 8-byte big-endian counter + ciphertext + 16-byte tag. Each
+# direction has its own key, so the nonce is just the counter padded to 12
+# bytes. The receiver accepts any counter it hasn't seen inside a 64 message
+# window: frames superseded in the outbound queue leave gaps and two threads
+# may enqueue slightly out of order, but a replayed frame never opens.
+#
+# Spectator feeds (spectators.py) seal each lobby event once with a key shared
+# by all of that lobby's spectators, handed to each of them under their own
+# session key. Feed counters start at FEED_COUNTER_BASE, so a spectator tells
+# feed frames from its session's by the top bit of the first byte.
+
+AEAD_AESGCM = "aes-256-gcm"
+AEAD_CHACHA = "chacha20-poly1305"
+AEADS = {AEAD_AESGCM: AESGCM, AEAD_CHACHA: ChaCha20Poly1305}
+# AES-GCM first: every x86/ARM CPU we run on has AES instructions
+# (see bench/bench_crypto.py); ChaCha20 is the fallback without them.
+PREFERRED_AEADS = [AEAD_AESGCM, AEAD_CHACHA]
+
+COUNTER = struct.Struct("!Q")
+NONCE_PAD = bytes(4)
+REPLAY_WINDOW = 64
+KDF_INFO = b"pyImpostorGame session v1"
+FEED_COUNTER_BASE = 1 << 63
+
+
+class SessionError(ValueError):
+    """Raised for frames that fail authentication or replay checks."""
+
+
+class SessionCipher:
+    """Seals outgoing and opens incoming payloads for one connection.
+
+    Drop-in for the Fernet cipher: encrypt() and decrypt() on bytes.
+    """
+    def __init__(self, aead_name, send_key, recv_key, first_counter=1):
+        self.aead_name = aead_name
+        aead_class = AEADS[aead_name]
+        self.sealer = aead_class(send_key)
+        self.opener = aead_class(recv_key)
+        # next() on itertools.count is atomic under the GIL, so broadcasts
+        # from other threads can seal without a lock
+        self.send_counter = itertools.count(first_counter)
+        self.recv_highest = 0
+        self.recv_seen = 0 # bitmask of the REPLAY_WINDOW counters below recv_highest
+
+    def encrypt(self, payload):
+        header = COUNTER.pack(next(self.send_counter))
+        return header + self.sealer.encrypt(NONCE_PAD + header, payload, None)
+
+    def decrypt(self, token):
+        # Only the connection's reader calls this, so the window needs no lock
+        if len(token) < COUNTER.size + 16:
+            raise SessionError("Frame too short")
+        header = token[:COUNTER.size]
+        (counter,) = COUNTER.unpack(header)
+        offset = self.recv_highest - counter
+        if counter == 0 or offset >= REPLAY_WINDOW or (offset >= 0 and self.recv_seen >> offset & 1):
+            raise SessionError(f"Replayed or stale frame {counter}")
+        try:
+            payload = self.opener.decrypt(NONCE_PAD + header, token[COUNTER.size:], None)
+        except InvalidTag:
+            raise SessionError("Frame failed authentication")
+        if offset < 0:
+            # Newer than anything so far: slide the window up (a jump past the
+            # whole window leaves nothing of the old one, don't build a huge int)
+            if -offset >= REPLAY_WINDOW:
+                self.recv_seen = 1
+            else:
+                self.recv_seen = ((self.recv_seen << -offset) | 1) & ((1 << REPLAY_WINDOW) - 1)
+            self.recv_highest = counter
+        else:
+            self.recv_seen |= 1 << offset
+        return payload
+
+
+class KeyExchange:
+    """One side's ephemeral X25519 key pair."""
+    def __init__(self):
+        self.private_key = X25519PrivateKey.generate()
+        raw = self.private_key.public_key().public_bytes_raw()
+        self.public_raw = raw
+        self.public_b64 = base64.b64encode(raw).decode("ascii")
+
+    def derive(self, peer_b64, aead_name, is_server, bind=""):
+        """Builds the SessionCipher both sides agree on."""
+        peer_raw = base64.b64decode(peer_b64)
+        shared = self.private_key.exchange(X25519PublicKey.from_public_bytes(peer_raw))
+        client_pub, server_pub = (peer_raw, self.public_raw) if is_server else (self.public_raw, peer_raw)
+        keys = HKDF(
+            algorithm=hashes.SHA256(),
+            length=64,
+            salt=client_pub + server_pub,
+            info=b"|".join((KDF_INFO, aead_name.encode(), bind.encode())),
+        ).derive(shared)
+        to_server, to_client = keys[:32], keys[32:]
+        if is_server:
+            return SessionCipher(aead_name, to_client, to_server)
+        return SessionCipher(aead_name, to_server, to_client)
+
+
+def offer_session(bind=None):
+    """Client side: returns (KeyExchange, fields to add to LOGIN)."""
+    kx = KeyExchange()
+    fields = {"kx": kx.public_b64, "aeads": PREFERRED_AEADS}
+    if bind:
+        fields["bind"] = bind
+    return kx, fields
+
+def accept_session(message):
+    """Server side: answers a LOGIN's key offer.
+
+    Returns (fields to add to LOGIN_SUCCESS, SessionCipher), or (None, None)
+    when the client made no offer we can take.
+    """
+    peer = message.get("kx")
+    if not isinstance(peer, str):
+        return None, None
+    offered = message.get("aeads") or PREFERRED_AEADS
+    aead_name = next((name for name in offered if name in AEADS), None)
+    if aead_name is None:
+        return None, None
+    kx = KeyExchange()
+    cipher = kx.derive(peer, aead_name, is_server=True, bind=message.get("bind") or "")
+    return {"kx": kx.public_b64, "aead": aead_name}, cipher
+
+def complete_session(kx, reply, bind=None):
+    """Client side: builds the SessionCipher from LOGIN_SUCCESS, or None if the server stayed on Fernet."""
+    if "kx" not in reply or reply.get("aead") not in AEADS:
+        return None
+    return kx.derive(reply["kx"], reply["aead"], is_server=False, bind=bind or "")
+
+def new_feed(aead_name):
+    """Server side: a fresh spectator feed key. Returns (fields for the spectators, SessionCipher)."""
+    key = os.urandom(32)
+    fields = {"aead": aead_name, "key": base64.b64encode(key).decode("ascii")}
+    return fields, SessionCipher(aead_name, key, key, FEED_COUNTER_BASE)
+
+def open_feed(fields):
+    """Client side: the SessionCipher that opens a lobby's spectator feed, or None."""
+    if not isinstance(fields, dict) or fields.get("aead") not in AEADS:
+        return None
+    key = base64.b64decode(fields["key"])
+    return SessionCipher(fields["aead"], key, key)
+
+def is_feed_frame(token):
+    return len(token) > COUNTER.size and (token[0] & 0x80) != 0
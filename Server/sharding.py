@@ -0,0 +1,69 @@
+import multiprocessing
+import signal
+import socket
+import sys
+import threading
+from protocol import *
+from logger import logger, configure_logging
+
+# Lobbies are spread over N worker processes by their code. Every shard listens
+# on the public port (SO_REUSEPORT, the kernel balances new connections) and on
+# a private port (public port + 1 + shard index). A JOIN_GAME that lands on the
+# wrong shard gets a REDIRECT to the owner's private port.
+
+def shard_for_code(code, shard_count):
+    """Index of the shard that owns a lobby code."""
+    if shard_count <= 1:
+        return 0
+    try:
+        return int(code, 36) % shard_count
+    except (TypeError, ValueError):
+        return 0
+
+def shard_port(base_port, index):
+    """Private port of one shard, used for redirects."""
+    return base_port + 1 + index
+
+def supports_sharding():
+    return hasattr(socket, "SO_REUSEPORT")
+
+def run_shard(index, shard_count, base_port=DEFAULT_PORT, engine=None):
+    """Entry point of one worker process."""
+    from game_manager import game_manager
+    import main
+    game_manager.configure_shard(index, shard_count, base_port)
+    # One log file per shard, or they'd rotate each other's files away
+    configure_logging(game_manager.settings, f".shard{index}")
+    logger.info(f"Shard {index}/{shard_count} starting.")
+
+    # Each shard announces its own lobbies, so together they cover every lobby
+    beacon_thread = threading.Thread(target=main.udp_beacon, args=(base_port, "CENTRAL"), daemon=True)
+    beacon_thread.start()
+
+    main.start_server(base_port, engine, extra_ports=[shard_port(base_port, index)], reuse_port=True)
+
+def run_sharded(shard_count, base_port=DEFAULT_PORT, engine=None):
+    """Starts one worker per shard and waits for them."""
+    if not supports_sharding():
+        logger.error("SO_REUSEPORT not available on this platform. Running a single shard.")
+        shard_count = 1
+
+    workers = []
+    for index in range(shard_count):
+        worker = multiprocessing.Process(target=run_shard, args=(index, shard_count, base_port, engine),
+                                         name=f"shard-{index}", daemon=True)
+        worker.start()
+        workers.append(worker)
+    logger.info(f"Started {shard_count} shards on port {base_port}.")
+
+    # Make SIGTERM go through the cleanup below so workers don't outlive us
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
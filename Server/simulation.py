@@ -0,0 +1,162 @@
+import json
+import random
+import zlib
+from protocol import *
+from logger import logger
+from game_manager import GameManager
+
+# In-process game simulation: fake handlers instead of sockets, a seeded RNG
+# instead of players. Exercises the pure Lobby/GameManager state machine, so it
+# doubles as a fast, deterministic regression check for rule changes and as a
+# profiling target (see bench/bench_simulation.py).
+
+class PlainCipher:
+    """Stands in for Fernet so broadcasts skip the crypto."""
+    def encrypt(self, data):
+        return data
+
+PLAIN_CIPHER = PlainCipher()
+
+class FakeHandler:
+    """Duck-types SessionHandler for Lobby: records what it would have sent."""
+    def __init__(self, nickname, recorder):
+        self.nickname = nickname
+        self.cipher = PLAIN_CIPHER
+        self.codec = JSON_CODEC
+        self.lobby = None
+        self.lobby_deltas = False
+        self.recorder = recorder
+
+    def send_message(self, message_dict):
+        self.recorder.record(serialize_message(message_dict, self.codec))
+
+    def send_packet(self, packet, coalesce_key=None):
+        self.recorder.record(packet)
+
+
+class Recorder:
+    """Counts messages and folds them into a digest of the whole run."""
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+        self.digest = 0
+
+    def record(self, data):
+        self.messages += 1
+        self.bytes += len(data)
+        self.digest = zlib.crc32(data, self.digest)
+
+
+class SimulationError(AssertionError):
+    """A game-state invariant was broken."""
+
+
+def check(condition, what):
+    if not condition:
+        raise SimulationError(what)
+
+
+def disconnect(manager, lobby, nickname):
+    """Same steps as SessionHandler.cleanup()."""
+    lobby.remove_player(nickname)
+    if not lobby.players:
+        manager.remove_lobby(lobby.code)
+
+
+def play_game(manager, lobby, rng, disconnect_rate, stats):
+    """Plays one game in a WAITING lobby; returns False if the lobby emptied."""
+    host = lobby.get_host_name()
+    success, err = lobby.start_game(host)
+    check(success, f"start_game failed: {err}")
+    check(lobby.state == "PLAYING", "lobby not PLAYING after start")
+    check(sorted(lobby.turn_order) == sorted(lobby.players), "turn order is not a permutation of players")
+    check(lobby.imposter_nickname in lobby.players, "imposter is not a player")
+
+    while lobby.state == "PLAYING":
+        if rng.random() < disconnect_rate:
+            # Someone drops mid-game: the lobby resets and migrates host if needed
+            leaver = rng.choice(list(lobby.players))
+            was_host = leaver == lobby.get_host_name()
+            disconnect(manager, lobby, leaver)
+            stats["disconnects"] += 1
+            stats["resets"] += 1
+            if not lobby.players:
+                return False
+            check(lobby.state == "WAITING", "game not reset after a disconnect")
+            if was_host:
+                check(lobby.get_host_name() != leaver, "host did not migrate")
+                stats["host_migrations"] += 1
+            return True
+        current = lobby.turn_order[lobby.current_turn_index]
+        # A player out of turn must be ignored
+        bystander = rng.choice(lobby.turn_order)
+        if bystander != current:
+            before = lobby.current_turn_index
+            lobby.handle_clue(bystander, "out-of-turn")
+            check(lobby.current_turn_index == before, "out-of-turn clue was accepted")
+        lobby.handle_clue(current, f"clue{stats['clues']}")
+        stats["clues"] += 1
+
+    check(lobby.state == "VOTING", f"expected VOTING, got {lobby.state}")
+    candidates = list(lobby.players)
+    for voter in candidates:
+        lobby.handle_vote(voter, rng.choice(candidates))
+
+    check(lobby.state == "WAITING", "lobby not back to WAITING after the vote")
+    check(lobby.secret_word == "" and lobby.imposter_nickname is None, "game state not cleared")
+    stats["games"] += 1
+    return True
+
+
+def simulate(games=1000, seed=0, min_players=3, max_players=10, games_per_lobby=5,
+             disconnect_rate=0.02, rounds_before_vote=2):
+    """Plays `games` complete games and returns counters plus a transcript digest.
+
+    The same arguments always produce the same digest, so a changed digest
+    means a rule change altered what players see.
+    """
+    rng = random.Random(seed)
+    manager = GameManager()
+    recorder = Recorder()
+    stats = {"games": 0, "lobbies": 0, "clues": 0, "disconnects": 0, "resets": 0, "host_migrations": 0}
+
+    previous_level = logger.level
+    logger.setLevel("WARNING") # Per-join/per-game INFO lines would dominate the profile
+    try:
+        while stats["games"] < games:
+            size = rng.randint(min_players, max_players)
+            game_seed = rng.getrandbits(32)
+            code = manager.create_lobby({
+                "max_players": max_players,
+                "min_players": min_players,
+                "rounds_before_vote": rounds_before_vote,
+            }, game_seed=game_seed, word_seed=rng.getrandbits(32))
+            lobby = manager.get_lobby(code)
+            stats["lobbies"] += 1
+            for i in range(size):
+                success, nickname = lobby.add_player(f"Player{i % 4}", FakeHandler(f"Player{i % 4}", recorder))
+                check(success, f"add_player failed: {nickname}")
+            check(len(lobby.players) == size, "duplicate nicknames were not renamed")
+
+            for _ in range(games_per_lobby):
+                if stats["games"] >= games or len(lobby.players) < min_players:
+                    break
+                if not play_game(manager, lobby, rng, disconnect_rate, stats):
+                    break
+
+            # Everyone leaves; the lobby must go away with the last player
+            for nickname in list(lobby.players):
+                disconnect(manager, lobby, nickname)
+            check(manager.get_lobby(code) is None, "empty lobby was not removed")
+    finally:
+        logger.setLevel(previous_level)
+
+    stats.update({"messages": recorder.messages, "bytes": recorder.bytes, "digest": f"{recorder.digest:08x}"})
+    return stats
+
+
+if __name__ == "__main__":
+    import sys
+    result = simulate(games=int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+                      seed=int(sys.argv[2]) if len(sys.argv) > 2 else 0)
+    print(json.dumps(result, indent=2))
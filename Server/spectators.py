@@ -0,0 +1,181 @@
+import queue
+import threading
+import time
+from logger import logger
+from metrics import metrics
+from outbound import coalesce_key_for
+from protocol import seal_payload, serialize_message
+from session_crypto import new_feed
+
+# Spectators served per fan-out step; the rest of the batch is dispatched
+# again so player I/O on the same loop (or the GIL) gets a turn in between
+FANOUT_CHUNK = 256
+# Fields a spectator never gets, whatever the event (GAME_OVER names the word)
+SECRET_FIELDS = ("word",)
+
+
+class FanoutWorker:
+    """Runs spectator fan-out off the lobby's command path.
+
+    dispatch(callback, *args) queues work for one worker thread by default;
+    the asyncio engine swaps in loop.call_soon_threadsafe, like the timer
+    scheduler, so writers are only ever woken from the loop.
+    """
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+        self.start_lock = threading.Lock()
+        self.dispatch = self.enqueue
+
+    def enqueue(self, callback, *args):
+        if self.thread is None:
+            self.start()
+        self.queue.put((callback, args))
+
+    def start(self):
+        with self.start_lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="spectator-fanout", daemon=True)
+                self.thread.start()
+
+    def run(self):
+        while True:
+            callback, args = self.queue.get()
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.error(f"Spectator fan-out failed: {e}")
+            time.sleep(0) # hand the GIL to player threads between chunks
+
+
+class SpectatorFeed:
+    """A lobby's spectators and the public events queued for them.
+
+    The lobby only publish()es: an append, plus one dispatch if no flush is
+    running. The flush serializes each event once per codec and seals it
+    once per channel, so every spectator of a lobby gets the same bytes.
+    Legacy spectators share the global Fernet key; session-key spectators
+    share a feed key per AEAD (new_feed()), which SPECTATE hands them under
+    their own key. Events that a later one supersedes (same coalesce key)
+    are skipped before sealing, and each spectator's outbound queue
+    coalesces as well, so a slow spectator falls behind on its own.
+
+    One flush runs at a time per feed and it hands on to the next, so
+    spectators see events in order. Each member remembers the sequence
+    number at which it joined; older events are already in its snapshot.
+    """
+    def __init__(self, code):
+        self.code = code
+        self.members = {} # handler -> (codec, channel cipher, last seq before joining)
+        self.feeds = {}   # aead name -> (fields, SessionCipher)
+        self.pending = [] # (seq, message)
+        self.seq = 0
+        self.flushing = False
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.members)
+
+    def add(self, handler):
+        """Adds a spectator; returns the feed fields for its SPECTATE reply (None on legacy crypto)."""
+        aead_name = getattr(handler.cipher, "aead_name", None)
+        with self.lock:
+            if aead_name is None:
+                fields, channel = None, handler.cipher
+            else:
+                feed = self.feeds.get(aead_name)
+                if feed is None:
+                    feed = self.feeds[aead_name] = new_feed(aead_name)
+                fields, channel = feed
+            self.members[handler] = (handler.codec, channel, self.seq)
+        return fields
+
+    def remove(self, handler):
+        with self.lock:
+            self.members.pop(handler, None)
+
+    def publish(self, message):
+        if not self.members:
+            return
+        if any(field in message for field in SECRET_FIELDS):
+            message = {key: value for key, value in message.items() if key not in SECRET_FIELDS}
+        with self.lock:
+            if self.closed:
+                return
+            self.seq += 1
+            self.pending.append((self.seq, message))
+            if self.flushing:
+                return
+            self.flushing = True
+        fanout.dispatch(self.flush)
+
+    def close(self, message=None):
+        """The lobby is gone: delivers what's pending (and `message`), then lets everyone go."""
+        if message is not None:
+            self.publish(message)
+        with self.lock:
+            self.closed = True
+            if self.flushing:
+                return # the running flush lets them go
+            self.flushing = True
+        fanout.dispatch(self.flush)
+
+    def flush(self, batch=None, start=0):
+        began = time.perf_counter()
+        if batch is None:
+            with self.lock:
+                events, self.pending = self.pending, []
+                members = list(self.members.items())
+            batch = (self.frames(events), members)
+        frames, members = batch
+        end = start + FANOUT_CHUNK
+        for handler, (codec, channel, joined) in members[start:end]:
+            for seq, message, coalesce_key, payloads, packets in frames:
+                if seq <= joined:
+                    continue
+                packet = packets.get((codec, channel))
+                if packet is None:
+                    payload = payloads.get(codec)
+                    if payload is None:
+                        payload = payloads[codec] = serialize_message(message, codec)
+                    sealed = time.perf_counter()
+                    packet = packets[(codec, channel)] = seal_payload(payload, channel)
+                    metrics.observe("encrypt_seconds", time.perf_counter() - sealed)
+                handler.send_packet(packet, coalesce_key)
+        metrics.observe("spectator_fanout_seconds", time.perf_counter() - began)
+        if end < len(members):
+            fanout.dispatch(self.flush, batch, end)
+            return
+
+        gone = None
+        with self.lock:
+            more = bool(self.pending)
+            if not more:
+                self.flushing = False
+                if self.closed:
+                    gone, self.members = self.members, {}
+        if more:
+            fanout.dispatch(self.flush)
+        elif gone:
+            for handler in gone:
+                handler.stopped_watching(self)
+
+    @staticmethod
+    def frames(events):
+        """(seq, message, coalesce key, payloads, packets) per event a later one doesn't supersede."""
+        latest = {}
+        for seq, message in events:
+            key = coalesce_key_for(message)
+            if key is not None:
+                latest[key] = seq
+        frames = []
+        for seq, message in events:
+            key = coalesce_key_for(message)
+            if key is None or latest[key] == seq:
+                frames.append((seq, message, key, {}, {}))
+        return frames
+
+
+# Global instance
+fanout = FanoutWorker()
@@ -0,0 +1,93 @@
+import heapq
+import threading
+import time
+from logger import logger
+
+# Cancelled timers stay in the heap until they come due; once they are the
+# majority (and there are enough to matter) the heap is rebuilt without them
+COMPACT_MIN = 1024
+
+
+class TimerScheduler:
+    """Every deadline in the server on one heap, serviced by one thread.
+
+    call_later() returns a handle (a [when, seq, callback, args] list, treat
+    it as opaque) and cancel() just blanks its callback, so both are a heap
+    push or an assignment: millions of pending timers cost a list each and
+    no threads. Due callbacks go through dispatch(callback, *args), which
+    calls them on the timer thread by default; the asyncio engine swaps in
+    loop.call_soon_threadsafe so they run on the event loop instead.
+
+    Callbacks should be quick; lobby timeouts are queued with Lobby.submit.
+    """
+    def __init__(self):
+        self.heap = []
+        self.seq = 0
+        self.cancelled = 0
+        self.condition = threading.Condition(threading.Lock())
+        self.dispatch = self.call_direct
+        self.thread = None
+
+    @staticmethod
+    def call_direct(callback, *args):
+        callback(*args)
+
+    def call_later(self, delay, callback, *args):
+        with self.condition:
+            self.seq += 1
+            timer = [time.monotonic() + delay, self.seq, callback, args]
+            heapq.heappush(self.heap, timer)
+            if self.heap[0] is timer:
+                self.condition.notify() # new earliest deadline, the thread must wake sooner
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="timers", daemon=True)
+                self.thread.start()
+        return timer
+
+    def cancel(self, timer):
+        """Stops a pending timer; a no-op if it already ran or was cancelled."""
+        with self.condition:
+            if timer[2] is None:
+                return
+            timer[2] = None
+            timer[3] = ()
+            self.cancelled += 1
+            if self.cancelled > COMPACT_MIN and self.cancelled * 2 > len(self.heap):
+                self.heap = [t for t in self.heap if t[2] is not None]
+                heapq.heapify(self.heap)
+                self.cancelled = 0
+
+    def pending(self):
+        with self.condition:
+            return len(self.heap) - self.cancelled
+
+    def pop_due(self):
+        """Waits for the next deadline; returns [(callback, args)] that are due."""
+        with self.condition:
+            while True:
+                heap = self.heap
+                now = time.monotonic()
+                if heap and heap[0][0] <= now:
+                    break
+                self.condition.wait(heap[0][0] - now if heap else None)
+            due = []
+            while heap and heap[0][0] <= now:
+                timer = heapq.heappop(heap)
+                if timer[2] is None:
+                    self.cancelled -= 1
+                    continue
+                due.append((timer[2], timer[3]))
+                timer[2] = None # so a late cancel() doesn't count it again
+        return due
+
+    def run(self):
+        while True:
+            for callback, args in self.pop_due():
+                try:
+                    self.dispatch(callback, *args)
+                except Exception as e:
+                    logger.error(f"Timer {getattr(callback, '__name__', callback)} failed: {e}")
+
+
+# Global instance
+scheduler = TimerScheduler()
@@ -0,0 +1,154 @@
+import os
+import random
+import sys
+import threading
+from logger import logger
+
+DEFAULT_PACK = "default"
+FALLBACK_WORDS = ("Pizza", "Bicicletta", "Sole")
+
+class WordPack:
+    """One word list file plus its metadata. Words are loaded on first use."""
+    __slots__ = ("name", "path", "language", "category", "words")
+
+    def __init__(self, name, path, language=None, category=None):
+        self.name = name
+        self.path = path
+        self.language = language
+        self.category = category
+        self.words = None # tuple once loaded
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                # Dedupe (keeping file order) and intern so every lobby shares the same strings
+                words = tuple(sys.intern(w) for w in dict.fromkeys(line.strip() for line in f) if w)
+        except Exception as e:
+            logger.error(f"Failed to load word pack '{self.name}' from {self.path}: {e}")
+            words = ()
+        if not words:
+            words = FALLBACK_WORDS
+        self.words = words
+        logger.info(f"Loaded word pack '{self.name}': {len(words)} words, {self.memory_usage() // 1024} KiB")
+        return words
+
+    def memory_usage(self):
+        """Approximate bytes held by this pack (0 until it's loaded)."""
+        if self.words is None:
+            return 0
+        return sys.getsizeof(self.words) + sum(sys.getsizeof(w) for w in self.words)
+
+
+def _mix32(x):
+    """Cheap 32-bit integer hash used as the Feistel round function."""
+    x = ((x ^ (x >> 16)) * 0x45D9F3B) & 0xFFFFFFFF
+    x = ((x ^ (x >> 16)) * 0x45D9F3B) & 0xFFFFFFFF
+    return x ^ (x >> 16)
+
+class WordSampler:
+    """Per-lobby word draws without replacement, O(1) per draw.
+
+    Walks a keyed pseudo-random permutation of the shared word tuple (a small
+    Feistel network over the next even power of two, skipping indices past the
+    end) with a cursor, so no list is copied or shuffled and every word comes up
+    once before any repeats. State is a seed, an epoch, a cursor and 4 round keys.
+    """
+    __slots__ = ("words", "seed", "epoch", "cursor", "half_bits", "keys")
+    ROUNDS = 4
+
+    def __init__(self, words, seed=None):
+        self.words = words
+        self.reseed(seed)
+
+    def reseed(self, seed=None):
+        """Restarts the sequence; the same seed always gives the same draws."""
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.epoch = 0
+        self._start_epoch()
+
+    def _start_epoch(self):
+        bits = max(2, (len(self.words) - 1).bit_length())
+        bits += bits % 2
+        self.half_bits = bits // 2
+        rng = random.Random(self.seed * 1000003 + self.epoch)
+        self.keys = tuple(rng.getrandbits(32) for _ in range(self.ROUNDS))
+        self.cursor = 0
+
+    def _permute(self, i):
+        half_bits = self.half_bits
+        mask = (1 << half_bits) - 1
+        left, right = i >> half_bits, i & mask
+        for key in self.keys:
+            left, right = right, left ^ (_mix32(right ^ key) & mask)
+        return (left << half_bits) | right
+
+    def draw(self):
+        """Returns the next word; a new permutation starts once all were drawn."""
+        n = len(self.words)
+        domain = 1 << (2 * self.half_bits)
+        while True:
+            if self.cursor >= domain:
+                self.epoch += 1
+                self._start_epoch()
+            index = self._permute(self.cursor)
+            self.cursor += 1
+            if index < n:
+                return self.words[index]
+
+
+class WordBank:
+    """Shared, read-only word corpus owned by the GameManager.
+
+    Every lobby gets the same immutable tuple for its pack, so creating a lobby
+    costs no disk I/O and no per-lobby copy of the list.
+    """
+    def __init__(self, base_dir):
+        self.base_dir = base_dir
+        self.packs = {} # name -> WordPack
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings, base_dir):
+        """Builds the bank from 'word_list_file' (the default pack) and 'word_packs'."""
+        bank = cls(base_dir)
+        bank.add_pack(DEFAULT_PACK, settings.get("word_list_file", "words.txt"),
+                      settings.get("word_language"), settings.get("word_category"))
+        for pack in settings.get("word_packs", []):
+            bank.add_pack(pack["name"], pack["file"], pack.get("language"), pack.get("category"))
+        return bank
+
+    def add_pack(self, name, path, language=None, category=None):
+        if not os.path.isabs(path):
+            path = os.path.join(self.base_dir, path)
+        self.packs[name] = WordPack(name, path, language, category)
+
+    def get_words(self, name=DEFAULT_PACK):
+        """Returns the word tuple for a pack, loading it on first use."""
+        pack = self.packs.get(name)
+        if pack is None:
+            logger.warning(f"Unknown word pack '{name}', using '{DEFAULT_PACK}'.")
+            pack = self.packs[DEFAULT_PACK]
+        words = pack.words
+        if words is None:
+            with self.lock:
+                words = pack.words
+                if words is None:
+                    words = pack.load()
+        return words
+
+    def find_packs(self, language=None, category=None):
+        """Names of the packs matching a language and/or category."""
+        return [p.name for p in self.packs.values()
+                if (language is None or p.language == language)
+                and (category is None or p.category == category)]
+
+    def memory_report(self):
+        """pack name -> {'loaded', 'words', 'bytes'}."""
+        return {
+            p.name: {
+                "loaded": p.words is not None,
+                "words": len(p.words) if p.words is not None else 0,
+                "bytes": p.memory_usage(),
+            }
+            for p in self.packs.values()
+        }
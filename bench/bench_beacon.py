@@ -0,0 +1,120 @@
+"""LAN beacon cost per interval: one datagram per lobby vs the aggregated beacon.
+
+Fills a GameManager with N lobbies of fake players and times one beacon
+tick, sending to a loopback socket nobody reads (the kernel drops them, so
+sendto() cost is included but no receiver is). For the aggregated beacon it
+covers a full snapshot (cold start, after --churn of the lobbies changed,
+unchanged), a delta after the same churn, and an interval with no changes.
+
+    python bench/bench_beacon.py --lobbies 100 1000 5000
+"""
+import argparse
+import socket
+import time
+
+import harness
+from game_manager import GameManager
+from simulation import FakeHandler, Recorder
+from beacon import BeaconEncoder, BeaconView
+
+
+def legacy_tick(sock, target, manager):
+    """The old udp_beacon loop body, kept here for comparison."""
+    sent = bytes_sent = 0
+    for code in list(manager.lobbies.keys()):
+        lobby = manager.get_lobby(code)
+        host = list(lobby.players.keys())[0] if lobby and lobby.players else "Unknown"
+        datagram = f"IMPOSTOR_GAME:{code}:{host}".encode()
+        sock.sendto(datagram, target)
+        sent += 1
+        bytes_sent += len(datagram)
+    return sent, bytes_sent
+
+
+def aggregated_tick(sock, target, manager, encoder):
+    datagrams = encoder.tick(manager.lobbies, manager.drain_lobby_changes())
+    for datagram in datagrams:
+        sock.sendto(datagram, target)
+    return datagrams
+
+
+def timed(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        result = fn()
+    return (time.perf_counter() - start) / iterations * 1e6, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lobbies", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--players", type=int, default=5)
+    parser.add_argument("--churn", type=float, default=0.01, help="fraction of lobbies changed per interval")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args()
+
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(("127.0.0.1", 0))
+    target = sink.getsockname()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    results = []
+    for count in args.lobbies:
+        manager = GameManager()
+        recorder = Recorder()
+        for i in range(count):
+            lobby = manager.get_lobby(manager.create_lobby())
+            for p in range(args.players):
+                lobby.players[f"Player{p}"] = FakeHandler(f"Player{p}", recorder)
+        codes = list(manager.lobbies)
+        changed = codes[:max(1, int(count * args.churn))]
+
+        legacy_us, (legacy_datagrams, legacy_bytes) = timed(lambda: legacy_tick(sock, target, manager), args.iterations)
+
+        def fresh_full():
+            encoder = BeaconEncoder(5555)
+            return aggregated_tick(sock, target, manager, encoder)
+        full_us, full = timed(fresh_full, args.iterations)
+
+        encoder = BeaconEncoder(5555, full_every=1)
+        aggregated_tick(sock, target, manager, encoder)
+        cached_us, _ = timed(lambda: aggregated_tick(sock, target, manager, encoder), args.iterations)
+
+        def churned_full():
+            for code in changed:
+                manager.mark_lobby_changed(code)
+            return aggregated_tick(sock, target, manager, encoder)
+        churned_us, _ = timed(churned_full, args.iterations)
+
+        def delta():
+            for code in changed:
+                manager.mark_lobby_changed(code)
+            return aggregated_tick(sock, target, manager, encoder)
+        encoder = BeaconEncoder(5555, full_every=1 << 30)
+        aggregated_tick(sock, target, manager, encoder)
+        delta_us, deltas = timed(delta, args.iterations)
+        idle_us, _ = timed(lambda: aggregated_tick(sock, target, manager, encoder), args.iterations)
+
+        # Sanity: a receiver rebuilds exactly what the server has
+        view = BeaconView()
+        for datagram in full:
+            view.feed("127.0.0.1", datagram)
+        assert len(view.lobbies()) == count
+
+        results.append({
+            "lobbies": count,
+            "legacy": {"datagrams": legacy_datagrams, "bytes": legacy_bytes, "tick_us": round(legacy_us)},
+            "full": {"datagrams": len(full), "bytes": sum(map(len, full)), "tick_us": round(full_us)},
+            "full_after_churn": {"tick_us": round(churned_us)},
+            "full_unchanged": {"tick_us": round(cached_us)},
+            "delta": {"changed": len(changed), "datagrams": len(deltas), "bytes": sum(map(len, deltas)),
+                      "tick_us": round(delta_us)},
+            "unchanged": {"datagrams": 0, "tick_us": round(idle_us, 1)},
+        })
+
+    harness.write_results(args.output, {"benchmark": "beacon", "results": results})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""CPU cost of one Lobby.broadcast as a function of lobby size.
+
+Compares the old per-player path (json.dumps + Fernet encrypt for every
+recipient) with the encrypt-once fan-out. Handlers are in-memory, so the
+numbers are pure serialization/crypto cost, no socket I/O.
+
+    python bench/bench_broadcast.py --sizes 2 4 8 16 32 64 100
+"""
+import argparse
+import time
+
+import harness
+from cryptography.fernet import Fernet
+from protocol import *
+from game_manager import game_manager
+from client_handler import SessionHandler
+from lobby_logic import Lobby
+
+
+class NullHandler(SessionHandler):
+    """Counts bytes instead of queueing them for a socket."""
+    def __init__(self, cipher):
+        SessionHandler.__init__(self, ("bench", 0), cipher)
+        self.bytes_sent = 0
+
+    def send_packet(self, packet, coalesce_key=None):
+        self.bytes_sent += len(packet)
+
+
+def per_player_broadcast(lobby, message):
+    """The pre-fan-out implementation, kept here for comparison."""
+    for handler in lobby.players.values():
+        handler.send_message(message)
+
+
+def cpu_per_call(fn, iterations):
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2, 4, 8, 16, 32, 64, 100])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args()
+
+    cipher = Fernet(get_protocol_key())
+    message = {"type": MSG_STATE_UPDATE, "phase": "CLUE_PHASE", "current_turn": "Player 7"}
+    results = []
+    for size in args.sizes:
+        lobby = Lobby("BENCH1", {"max_players": size, "min_players": 3,
+                                 "rounds_before_vote": 2, "anti_cheat_enabled": False},
+                      game_manager.word_bank)
+        for i in range(size):
+            lobby.players[f"p{i}"] = NullHandler(cipher)
+
+        old = cpu_per_call(lambda: per_player_broadcast(lobby, message), args.iterations)
+        new = cpu_per_call(lambda: lobby.broadcast(message), args.iterations)
+        results.append({
+            "lobby_size": size,
+            "per_player_us": round(old * 1e6, 2),
+            "encrypt_once_us": round(new * 1e6, 2),
+            "speedup": round(old / new, 2) if new else None,
+        })
+    harness.write_results(args.output, {"benchmark": "broadcast", "results": results})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Bytes per message and encode/decode time per message, json vs bin1.
+
+Covers every message type in the protocol with a realistic sample. "wire"
+is the full framed Fernet token as sent on the socket.
+
+    python bench/bench_codec.py --iterations 20000
+"""
+import argparse
+import timeit
+
+import harness
+from cryptography.fernet import Fernet
+from protocol import *
+from codec import JSON_CODEC, BINARY_CODEC
+
+PLAYERS = ["Alice", "Bob", "Carla", "Dario", "Elena", "Fabio"]
+
+SAMPLES = {
+    "LOGIN": {"type": MSG_LOGIN, "nickname": "Alice", "codecs": ["bin1", "json"]},
+    "LOGIN_SUCCESS": {"type": "LOGIN_SUCCESS", "nickname": "Alice", "codec": "bin1"},
+    "CREATE_GAME": {"type": MSG_CREATE_GAME, "nickname": "Alice", "settings": {"rounds_before_vote": 3}},
+    "JOIN_GAME": {"type": MSG_JOIN_GAME, "code": "K7Q2ZD", "nickname": "Bob"},
+    "JOIN_SUCCESS": {"type": "JOIN_SUCCESS", "code": "K7Q2ZD", "nickname": "Bob", "lobby_state": "WAITING"},
+    "GAME_START": {"type": MSG_GAME_START, "role": "CITIZEN", "word": "Gelato", "turn_order": PLAYERS},
+    "CLUE": {"type": MSG_CLUE, "sender": "Carla", "clue": "freddo"},
+    "VOTE": {"type": MSG_VOTE, "suspect": "Dario"},
+    "STATE_UPDATE/LOBBY": {"type": MSG_STATE_UPDATE, "phase": "LOBBY", "players": PLAYERS, "host": "Alice"},
+    "STATE_UPDATE/CLUE_PHASE": {"type": MSG_STATE_UPDATE, "phase": "CLUE_PHASE", "current_turn": "Elena"},
+    "STATE_UPDATE/VOTING": {"type": MSG_STATE_UPDATE, "phase": "VOTING", "candidates": PLAYERS},
+    "GAME_OVER": {"type": MSG_GAME_OVER, "winner": "CITIZENS", "reason": "Imposter Fabio caught! Citizens Win!",
+                  "imposter": "Fabio", "word": "Gelato"},
+    "ERROR": {"type": MSG_ERROR, "message": "Lobby not found"},
+    "REDIRECT": {"type": MSG_REDIRECT, "code": "K7Q2ZD", "port": 5557},
+    "STATS": {"type": MSG_STATS, "dump": True},
+}
+
+
+def ns_per_call(fn, iterations):
+    return timeit.timeit(fn, number=iterations) / iterations * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args()
+
+    cipher = Fernet(get_protocol_key())
+    results = []
+    for name, message in SAMPLES.items():
+        row = {"message": name}
+        for codec in (JSON_CODEC, BINARY_CODEC):
+            payload = codec.encode(message)
+            assert codec.decode(payload) == message
+            row[codec.name] = {
+                "payload_bytes": len(payload),
+                "wire_bytes": len(pack_message(message, cipher, codec)),
+                "encode_ns": round(ns_per_call(lambda: codec.encode(message), args.iterations)),
+                "decode_ns": round(ns_per_call(lambda: codec.decode(payload), args.iterations)),
+            }
+        results.append(row)
+
+    totals = {codec: sum(r[codec]["wire_bytes"] for r in results) for codec in ("json", "bin1")}
+    harness.write_results(args.output, {"benchmark": "codec", "results": results, "total_wire_bytes": totals})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Lobby code allocation: random.choices retry loop vs CodeAllocator.
+
+Allocates --count codes with each strategy while --live lobbies stay alive
+(the oldest is removed on every create) and reports ns per allocation and
+retries. Also checks that --count fresh codes never repeat and stay on their
+shard, and measures the allocator's throughput from several threads at once.
+
+    python bench/bench_codes.py --count 2000000
+"""
+import argparse
+import random
+import string
+import threading
+import time
+from array import array
+from collections import deque
+
+import harness
+from code_allocator import CodeAllocator, code_to_int
+
+
+def legacy_allocate(lobbies, rng, shard_index=0, shard_count=1):
+    """The old GameManager.create_lobby loop, kept here for comparison."""
+    chars = string.ascii_uppercase + string.digits
+    tries = 0
+    while True:
+        tries += 1
+        code = ''.join(rng.choices(chars, k=6))
+        if code not in lobbies and int(code, 36) % shard_count == shard_index:
+            return code, tries
+
+
+def run_legacy(count, live, shard_count):
+    rng = random.Random(1)
+    lobbies = {}
+    retries = 0
+    start = time.perf_counter()
+    for _ in range(count):
+        code, tries = legacy_allocate(lobbies, rng, 0, shard_count)
+        retries += tries - 1
+        lobbies[code] = True
+        if len(lobbies) > live:
+            lobbies.pop(next(iter(lobbies)))
+    elapsed = time.perf_counter() - start
+    return {"ns_per_alloc": round(elapsed / count * 1e9), "retries": retries}
+
+
+def run_allocator(count, live, shard_count):
+    allocator = CodeAllocator(0, shard_count, seed=1, quarantine=0)
+    recent = deque()
+    start = time.perf_counter()
+    for _ in range(count):
+        recent.append(allocator.allocate())
+        if len(recent) > live:
+            allocator.release(recent.popleft())
+    elapsed = time.perf_counter() - start
+    return {"ns_per_alloc": round(elapsed / count * 1e9), "retries": 0}
+
+
+def check_fresh(count, shard_count):
+    """Allocates without releasing: every code must be new and on this shard."""
+    allocator = CodeAllocator(shard_count - 1, shard_count, seed=1)
+    values = array("L", (code_to_int(allocator.allocate()) for _ in range(count)))
+    values = sorted(values)
+    duplicates = sum(1 for i in range(1, len(values)) if values[i] == values[i - 1])
+    foreign = sum(1 for v in values if v % shard_count != shard_count - 1)
+    return {"codes": count, "duplicates": duplicates, "wrong_shard": foreign}
+
+
+def run_threads(count, threads):
+    allocator = CodeAllocator(seed=2)
+    codes = [[] for _ in range(threads)]
+
+    def worker(out):
+        for _ in range(count // threads):
+            out.append(allocator.allocate())
+
+    workers = [threading.Thread(target=worker, args=(out,)) for out in codes]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    total = sum(len(c) for c in codes)
+    unique = len(set(code for c in codes for code in c))
+    return {"threads": threads, "allocs_per_sec": round(total / elapsed), "unique": unique == total}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=2000000)
+    parser.add_argument("--live", type=int, default=10000, help="lobbies alive at once (older ones are removed)")
+    parser.add_argument("--shards", type=int, default=4, help="shard count for the sharded runs")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args()
+
+    results = []
+    for shard_count in (1, args.shards):
+        results.append({
+            "shards": shard_count,
+            "legacy": run_legacy(args.count, args.live, shard_count),
+            "allocator": run_allocator(args.count, args.live, shard_count),
+            "fresh_check": check_fresh(args.count, shard_count),
+        })
+    harness.write_results(args.output, {
+        "benchmark": "codes", "count": args.count, "live": args.live,
+        "results": results, "threaded": run_threads(args.count, args.threads),
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Compares the threaded and asyncio server engines.
+
+Opens many mostly idle connections (LOGIN only), then measures server RSS,
+thread count and LOGIN round-trip latency while those connections stay open.
+
+    python bench/bench_engines.py --connections 10000 --engines asyncio threaded
+"""
+import argparse
+import asyncio
+import time
+
+import harness
+from cryptography.fernet import Fernet
+from protocol import *
+
+
+async def read_frame(reader):
+    header = await reader.readexactly(FRAME_HEADER.size)
+    return await reader.readexactly(FRAME_HEADER.unpack(header)[0])
+
+
+async def open_client(port, cipher, index):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(pack_message({"type": MSG_LOGIN, "nickname": f"bot{index}"}, cipher))
+    await writer.drain()
+    await read_frame(reader)
+    return reader, writer
+
+
+async def ping(reader, writer, cipher):
+    start = time.perf_counter()
+    writer.write(pack_message({"type": MSG_LOGIN, "nickname": "ping"}, cipher))
+    await writer.drain()
+    await read_frame(reader)
+    return time.perf_counter() - start
+
+
+async def run_engine(engine, connections, concurrency, pings):
+    cipher = Fernet(get_protocol_key())
+    with harness.local_server(engine) as (pid, port):
+        idle_stats = harness.process_stats(pid)
+        clients = []
+        failures = 0
+        gate = asyncio.Semaphore(concurrency)
+
+        async def connect(i):
+            nonlocal failures
+            async with gate:
+                try:
+                    clients.append(await open_client(port, cipher, i))
+                except (OSError, asyncio.IncompleteReadError):
+                    failures += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(connect(i) for i in range(connections)))
+        connect_time = time.perf_counter() - start
+        await asyncio.sleep(0.5) # let the server settle before sampling
+        loaded_stats = harness.process_stats(pid)
+
+        latencies = []
+        for i in range(pings):
+            reader, writer = clients[i % len(clients)]
+            latencies.append(await ping(reader, writer, cipher))
+        latencies.sort()
+
+        for _, writer in clients:
+            writer.close()
+
+    per_conn = None
+    if idle_stats["rss_kb"] is not None and loaded_stats["rss_kb"] is not None and clients:
+        per_conn = (loaded_stats["rss_kb"] - idle_stats["rss_kb"]) / len(clients)
+    return {
+        "engine": engine,
+        "connections": len(clients),
+        "failed_connections": failures,
+        "connects_per_sec": round(len(clients) / connect_time, 1),
+        "idle_rss_kb": idle_stats["rss_kb"],
+        "loaded_rss_kb": loaded_stats["rss_kb"],
+        "rss_kb_per_connection": round(per_conn, 2) if per_conn is not None else None,
+        "server_threads": loaded_stats["threads"],
+        "login_rtt_ms_p50": round(harness.percentile(latencies, 50) * 1000, 3),
+        "login_rtt_ms_p99": round(harness.percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200, help="parallel connects in flight")
+    parser.add_argument("--pings", type=int, default=500)
+    parser.add_argument("--engines", nargs="+", default=["asyncio", "threaded"])
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args()
+
+    harness.raise_fd_limit()
+    results = [asyncio.run(run_engine(engine, args.connections, args.concurrency, args.pings))
+               for engine in args.engines]
+    harness.write_results(args.output, {"benchmark": "engines", "results": results})
+
+
+if __name__ == "__main__":
+    main()
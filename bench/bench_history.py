@@ -0,0 +1,110 @@
+"""Game-over latency and history write throughput.
+
+Plays --games simulated games (Server/simulation.py) three times:
+history off, queued for the history writer, and written inline (every game
+committed before broadcast_game_over returns, which is what writing from
+the game thread would cost). Reports games/sec and broadcast_game_over
+p50/p99 for each. Then feeds --sustained games to the writer as fast as
+its queue takes them and reports games written per second.
+
+    python bench/bench_history.py --games 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import harness
+import lobby_logic
+from history import GameHistory
+from lobby_logic import Lobby
+from simulation import simulate
+
+
+def timed_game_overs(latencies):
+    """Wraps Lobby.broadcast_game_over to time every call."""
+    original = Lobby.broadcast_game_over
+
+    def broadcast_game_over(self, winner, reason):
+        start = time.perf_counter()
+        original(self, winner, reason)
+        latencies.append(time.perf_counter() - start)
+
+    Lobby.broadcast_game_over = broadcast_game_over
+    return original
+
+
+def run(mode, games, path, batch_size, flush_interval):
+    history = GameHistory()
+    if mode != "off":
+        history.start({"history_db": path, "history_batch_size": 1 if mode == "inline" else batch_size,
+                       "history_flush_interval": 0 if mode == "inline" else flush_interval})
+    if mode == "inline":
+        queued = history.record
+
+        def record(*args):
+            queued(*args)
+            history.flush()
+        history.record = record
+    lobby_logic.history = history
+
+    latencies = []
+    original = timed_game_overs(latencies)
+    try:
+        start = time.perf_counter()
+        result = simulate(games=games, seed=1)
+        elapsed = time.perf_counter() - start
+        history.flush()
+        drained = time.perf_counter() - start
+    finally:
+        Lobby.broadcast_game_over = original
+    latencies.sort()
+    return {
+        "games_per_sec": round(result["games"] / elapsed, 1),
+        "game_over_us_p50": round(harness.percentile(latencies, 50) * 1e6, 1),
+        "game_over_us_p99": round(harness.percentile(latencies, 99) * 1e6, 1),
+        "written": history.written,
+        "all_written_after_s": round(drained, 3),
+    }
+
+
+def sustained(count, path, batch_size, flush_interval):
+    history = GameHistory()
+    history.start({"history_db": path, "history_batch_size": batch_size,
+                   "history_flush_interval": flush_interval})
+    players = [f"Player{i}" for i in range(6)]
+    votes = {player: players[1] for player in players}
+    clues = [[player, f"clue{i}"] for i, player in enumerate(players * 2)]
+    start = time.perf_counter()
+    for i in range(count):
+        while history.queue.full():
+            time.sleep(0.001)
+        history.record(f"L{i % 1000:05d}", time.time(), f"word{i % 500}", players[i % 6],
+                       "IMPOSTER" if i % 3 else "CITIZENS", "bench", players, votes, clues)
+    history.flush()
+    elapsed = time.perf_counter() - start
+    return {"games": history.written, "games_per_sec": round(history.written / elapsed), "dropped": history.dropped,
+            "db_bytes": sum(os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--sustained", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--flush-interval", type=float, default=0.5)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = {"benchmark": "history", "games": args.games, "batch_size": args.batch_size}
+        for mode in ("off", "queued", "inline"):
+            results[mode] = run(mode, args.games, os.path.join(directory, f"{mode}.db"),
+                                args.batch_size, args.flush_interval)
+        results["sustained"] = sustained(args.sustained, os.path.join(directory, "sustained.db"),
+                                         args.batch_size, args.flush_interval)
+    harness.write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Leaderboard upkeep and queries vs recomputing from the game history.
+
+Writes --games synthetic games among --players players (--per-game each)
+to a history database, then reports:
+
+  - a full rebuild from the history (catch-up from an empty leaderboard),
+  - the steady-state cost per finished game once the boards are full:
+    counters plus every player's move on every board,
+  - ns per top-10 query and per player rank, from the in-memory boards,
+  - ms per top-10 query recomputed with SQL over game_players (what a
+    LEADERBOARD request would cost without the aggregates),
+  - checkpoint size, write and load time.
+
+    python bench/bench_leaderboard.py --games 200000 --players 20000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import harness
+from history import GameHistory
+from leaderboard import Leaderboard, BOARDS, BOARD_IMPOSTER_WIN_RATE
+
+SQL_TOP_IMPOSTERS = (
+    "SELECT nickname, CAST(SUM(won) AS REAL) / COUNT(*) AS rate, COUNT(*) AS games"
+    " FROM game_players WHERE imposter GROUP BY nickname HAVING games >= ?"
+    " ORDER BY rate DESC, games DESC, nickname LIMIT 10")
+
+
+def fill_history(path, games, players, per_game):
+    history = GameHistory()
+    history.start({"history_db": path, "history_batch_size": 1000, "history_flush_interval": 0.01})
+    rng = random.Random(1)
+    names = [f"Player{i}" for i in range(players)]
+    for i in range(games):
+        seated = rng.sample(names, per_game)
+        imposter = rng.choice(seated)
+        votes = {nickname: rng.choice(seated) for nickname in seated}
+        while history.queue.full():
+            time.sleep(0.001)
+        history.record(f"L{i % 1000:05d}", time.time(), f"word{i % 500}", imposter,
+                       rng.choice(("IMPOSTER", "CITIZENS")), "bench", seated, votes, [])
+    history.flush()
+
+
+def per_call_ns(fn, calls):
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(i)
+    return round((time.perf_counter() - start) / calls * 1e9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=200000)
+    parser.add_argument("--players", type=int, default=20000)
+    parser.add_argument("--per-game", type=int, default=6)
+    parser.add_argument("--min-games", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=10000)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "history.db")
+        fill_history(path, args.games, args.players, args.per_game)
+        connection = sqlite3.connect(path)
+        settings = {"leaderboard_min_games": args.min_games}
+
+        board = Leaderboard()
+        board.start(settings)
+        start = time.perf_counter()
+        board.catch_up(connection)
+        rebuild = time.perf_counter() - start
+
+        names = list(board.players)
+        queries = {name: per_call_ns(lambda i: board.top(name, 10), args.queries) for name in BOARDS}
+        rank_ns = per_call_ns(lambda i: board.player(names[i % len(names)], BOARD_IMPOSTER_WIN_RATE), args.queries)
+
+        sql_calls = 5
+        start = time.perf_counter()
+        for _ in range(sql_calls):
+            sql_top = connection.execute(SQL_TOP_IMPOSTERS, (args.min_games,)).fetchall()
+        sql_ms = (time.perf_counter() - start) / sql_calls * 1000
+        same = [row[0] for row in sql_top] == [e["nickname"] for e in board.top(BOARD_IMPOSTER_WIN_RATE, 10)]
+
+        rng = random.Random(2)
+        steady = args.queries
+        start = time.perf_counter()
+        with board.lock:
+            for _ in range(steady):
+                seated = rng.sample(names, args.per_game)
+                won = rng.random() < 0.5
+                for seat, nickname in enumerate(seated):
+                    board.add(nickname, seat == 0, won == (seat == 0), rng.random() < 0.3)
+        incremental = (time.perf_counter() - start) / steady
+
+        checkpoint = os.path.join(directory, "leaderboard.json")
+        start = time.perf_counter()
+        board.checkpoint(checkpoint)
+        written = time.perf_counter() - start
+        loaded = Leaderboard()
+        loaded.start(settings)
+        start = time.perf_counter()
+        loaded.load(checkpoint)
+        load = time.perf_counter() - start
+
+        harness.write_results(args.output, {
+            "benchmark": "leaderboard", "games": args.games, "players": len(names),
+            "rebuild_s": round(rebuild, 3),
+            "incremental_us_per_game": round(incremental * 1e6, 2),
+            "top10_ns": queries,
+            "player_rank_ns": rank_ns,
+            "sql_top10_ms": round(sql_ms, 2),
+            "sql_matches_boards": same,
+            "checkpoint_bytes": os.path.getsize(checkpoint),
+            "checkpoint_write_ms": round(written * 1000, 1),
+            "checkpoint_load_ms": round(load * 1000, 1),
+        })
+
+
+if __name__ == "__main__":
+    main()
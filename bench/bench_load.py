@@ -0,0 +1,103 @@
+"""End-to-end load benchmark: M lobbies of N bot players against a local server.
+
+Reports connects/sec, messages/sec and p50/p95/p99 latency from a player
+sending its CLUE to that CLUE's broadcast coming back. Bots can be spread
+over several client processes so the load generator isn't the bottleneck.
+
+    python bench/bench_load.py --lobbies 50 --players 5 --games 3 --engine asyncio --output load.json
+    python bench/bench_load.py --lobbies 200 --shards 4 --client-procs 4
+"""
+import argparse
+import asyncio
+import multiprocessing
+import platform
+import time
+
+import harness
+from bots import BenchStats, LobbyBots
+
+
+async def drive(port, lobby_indices, players, games, seed, concurrency, codec="json", session_keys=False):
+    stats = BenchStats()
+    groups = [LobbyBots(i, players, games, stats, seed, codec, session_keys) for i in lobby_indices]
+    gate = asyncio.Semaphore(concurrency)
+
+    async def setup(group):
+        async with gate:
+            await group.setup(port)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(setup(g) for g in groups))
+    connect_time = time.perf_counter() - start
+
+    messages_before = stats.messages
+    start = time.perf_counter()
+    await asyncio.gather(*(g.run() for g in groups))
+    play_time = time.perf_counter() - start
+
+    return {
+        "connections": len(groups) * players,
+        "connect_time": connect_time,
+        "play_time": play_time,
+        "messages": stats.messages - messages_before,
+        "games": stats.games,
+        "errors": stats.errors,
+        "latencies": stats.latencies,
+    }
+
+
+def client_process(args):
+    port, lobby_indices, players, games, seed, concurrency, codec, session_keys = args
+    harness.raise_fd_limit()
+    return asyncio.run(drive(port, lobby_indices, players, games, seed, concurrency, codec, session_keys))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lobbies", type=int, default=20)
+    parser.add_argument("--players", type=int, default=4, help="players per lobby (min 3)")
+    parser.add_argument("--games", type=int, default=2, help="games per lobby")
+    parser.add_argument("--engine", choices=["threaded", "asyncio"], default="asyncio")
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--client-procs", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=50, help="lobbies being set up at once, per client process")
+    parser.add_argument("--codec", choices=["json", "bin1"], default="json", help="payload codec the bots offer at LOGIN")
+    parser.add_argument("--session-keys", action="store_true", help="bots negotiate per-session AEAD keys instead of Fernet")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args()
+
+    harness.raise_fd_limit()
+    with harness.local_server(args.engine, shards=args.shards) as (pid, port):
+        chunks = [list(range(i, args.lobbies, args.client_procs)) for i in range(args.client_procs)]
+        jobs = [(port, chunk, args.players, args.games, args.seed, args.concurrency, args.codec, args.session_keys)
+                for chunk in chunks if chunk]
+        if len(jobs) == 1:
+            parts = [client_process(jobs[0])]
+        else:
+            with multiprocessing.Pool(len(jobs)) as pool:
+                parts = pool.map(client_process, jobs)
+
+    connections = sum(p["connections"] for p in parts)
+    connect_time = max(p["connect_time"] for p in parts)
+    play_time = max(p["play_time"] for p in parts)
+    latencies = sorted(l for p in parts for l in p["latencies"])
+    ms = lambda pct: round(harness.percentile(latencies, pct) * 1000, 3) if latencies else None
+
+    harness.write_results(args.output, {
+        "benchmark": "load",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "connections": connections,
+        "games_completed": sum(p["games"] for p in parts),
+        "errors": sum(p["errors"] for p in parts),
+        "connects_per_sec": round(connections / connect_time, 1),
+        "messages_received": sum(p["messages"] for p in parts),
+        "messages_per_sec": round(sum(p["messages"] for p in parts) / play_time, 1),
+        "clue_latency_ms": {"samples": len(latencies), "p50": ms(50), "p95": ms(95), "p99": ms(99)},
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Bytes and CPU to fill a lobby one join at a time and empty it again.
+
+Every join and leave used to send the whole player list to everyone, so
+filling a lobby of N costs O(N^2) bytes. Clients that negotiate
+lobby_deltas get a LOBBY_DELTA instead and only newcomers get the full
+list. Handlers are in-memory (plain payloads, no crypto): the numbers are
+what the lobby hands to the outbound queues.
+
+    python bench/bench_lobby_fill.py --sizes 10 50 100 500
+"""
+import argparse
+import time
+
+import harness
+from protocol import *
+from logger import logger
+from game_manager import game_manager
+from client_handler import SessionHandler
+from lobby_logic import Lobby
+from simulation import PLAIN_CIPHER
+
+
+class CountingHandler(SessionHandler):
+    def __init__(self, deltas, codec):
+        SessionHandler.__init__(self, ("bench", 0), PLAIN_CIPHER)
+        self.lobby_deltas = deltas
+        self.codec = codec
+        self.bytes_sent = 0
+        self.messages = 0
+
+    def send_packet(self, packet, coalesce_key=None):
+        self.bytes_sent += len(packet)
+        self.messages += 1
+
+
+def fill_and_empty(size, deltas, codec):
+    lobby = Lobby("FILL01", {**game_manager.settings, "max_players": size}, game_manager.word_bank)
+    handlers = [CountingHandler(deltas, codec) for _ in range(size)]
+    start = time.process_time()
+    for i, handler in enumerate(handlers):
+        lobby.add_player(f"Player {i}", handler)
+    for i in range(size):
+        lobby.remove_player(f"Player {i}")
+    cpu = time.process_time() - start
+    return {
+        "bytes": sum(h.bytes_sent for h in handlers),
+        "messages": sum(h.messages for h in handlers),
+        "cpu_ms": round(cpu * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100, 500])
+    parser.add_argument("--codec", choices=sorted(CODECS), default="json")
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args()
+
+    logger.setLevel("WARNING")
+    codec = CODECS[args.codec]
+    results = []
+    for size in args.sizes:
+        full = fill_and_empty(size, False, codec)
+        delta = fill_and_empty(size, True, codec)
+        results.append({
+            "lobby_size": size,
+            "full_lists": full,
+            "deltas": delta,
+            "bytes_ratio": round(full["bytes"] / delta["bytes"], 1) if delta["bytes"] else None,
+        })
+    harness.write_results(args.output, {"benchmark": "lobby_fill", "codec": args.codec, "results": results})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""LIST_LOBBIES with many lobbies: maintained directory and page cache vs a scan.
+
+Creates --lobbies lobbies through the GameManager (random occupancy and
+rounds_before_vote), then measures:
+
+  - the directory's upkeep per lobby change (GameManager.lobby_changed),
+  - building a filtered page from the directory (cache cold),
+  - serving the same page again (cached payload, what repeated polls cost),
+  - --polls polls while --churn lobbies change between consecutive polls,
+    reporting the pages rebuilt and us per poll,
+  - the baseline: walk every lobby, filter, sort the codes, slice a page
+    and serialize it, per request.
+
+--playing makes that share of the lobbies running games, which a
+"WAITING with free seats" page never has to look at.
+
+    python bench/bench_lobby_list.py --lobbies 100000 --playing 0.9
+"""
+import argparse
+import random
+import time
+
+import harness
+from protocol import JSON_CODEC, MSG_LIST_LOBBIES, serialize_message
+from logger import logger
+from game_manager import game_manager
+from lobby_directory import LISTED_SETTINGS
+from simulation import FakeHandler, Recorder
+
+QUERY = {"type": MSG_LIST_LOBBIES, "state": "WAITING", "min_free": 3, "settings": {"rounds_before_vote": 2}, "limit": 20}
+
+
+def scan_page(manager, cursor=None, size=20):
+    matches = []
+    for lobby in manager.lobbies.values():
+        if lobby.state != "WAITING" or lobby.open_seats() < 3 or lobby.settings["rounds_before_vote"] != 2:
+            continue
+        if cursor is None or lobby.code > cursor:
+            matches.append(lobby)
+    matches.sort(key=lambda lobby: lobby.code)
+    page = [{"code": lobby.code, "state": lobby.state, "players": len(lobby.players), "free": lobby.open_seats(),
+             "host": lobby.get_host_name(),
+             "settings": {key: lobby.settings[key] for key in LISTED_SETTINGS if key in lobby.settings}}
+            for lobby in matches[:size]]
+    return serialize_message({"type": MSG_LIST_LOBBIES, "lobbies": page}, JSON_CODEC)
+
+
+def timed(fn, calls):
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(i)
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lobbies", type=int, default=100000)
+    parser.add_argument("--polls", type=int, default=100000)
+    parser.add_argument("--churn", type=int, default=1, help="lobby changes between consecutive polls")
+    parser.add_argument("--playing", type=float, default=0.0, help="share of lobbies with a game running")
+    parser.add_argument("--scans", type=int, default=10)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args()
+
+    logger.setLevel("WARNING")
+    rng = random.Random(1)
+    recorder = Recorder()
+    lobbies = []
+    for i in range(args.lobbies):
+        lobby = game_manager.get_lobby(game_manager.create_lobby({"rounds_before_vote": rng.choice((1, 2, 3))}))
+        for seat in range(rng.randrange(lobby.settings["max_players"])):
+            lobby.players[f"p{seat}"] = FakeHandler(f"p{seat}", recorder)
+        if rng.random() < args.playing:
+            lobby.state = "PLAYING"
+        lobbies.append(lobby)
+
+    upkeep = timed(lambda i: game_manager.lobby_changed(lobbies[i % len(lobbies)]), len(lobbies))
+    directory = game_manager.directory
+
+    cold = timed(lambda i: (directory.cache.clear(), directory.payload(QUERY, JSON_CODEC)), 200)
+    warm = timed(lambda i: directory.payload(QUERY, JSON_CODEC), args.polls)
+
+    # Changes between polls: one player joins or leaves some lobby
+    def churn_and_poll(i):
+        for _ in range(args.churn):
+            lobby = lobbies[rng.randrange(len(lobbies))]
+            if lobby.players and rng.random() < 0.5:
+                lobby.players.pop(next(iter(lobby.players)))
+            elif not lobby.is_full():
+                lobby.players[f"c{i}"] = FakeHandler(f"c{i}", recorder)
+            lobby.changed()
+        directory.payload(QUERY, JSON_CODEC)
+    directory.cache.clear()
+    builds = [0]
+    page = directory.page
+
+    def counting_page(key):
+        before = directory.cache.get(key)
+        result = page(key)
+        if result is not before:
+            builds[0] += 1
+        return result
+    directory.page = counting_page
+    churn = timed(churn_and_poll, args.polls)
+    directory.page = page
+
+    scan = timed(lambda i: scan_page(game_manager), args.scans)
+    harness.write_results(args.output, {
+        "benchmark": "lobby_list", "lobbies": args.lobbies, "playing": args.playing,
+        "upkeep_us_per_change": round(upkeep * 1e6, 2),
+        "page_cold_us": round(cold * 1e6, 1),
+        "page_cached_ns": round(warm * 1e9),
+        "churn": {"polls": args.polls, "changes_per_poll": args.churn, "pages_built": builds[0],
+                  "us_per_poll_with_churn": round(churn * 1e6, 2)},
+        "scan_ms": round(scan * 1000, 1),
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Hammers a single lobby from many threads and checks its state machine.
+
+Every player is a real SessionHandler driven through handle_message() (so
+commands go through the lobby's serial queue) on its own thread, spamming
+GAME_START, CLUE and VOTE with up to --think ms between them (0 starves
+whichever thread is draining the queue of its own turn: real clients can't
+outpace the lobby like that). A tiny GIL switch interval
+makes the threads interleave as badly as possible. Afterwards each player's
+transcript must read GAME_START ... VOTING, GAME_OVER, LOBBY for every game,
+every CLUE must come from the player whose turn was announced, and nothing
+may raise. The script exits 1 if the serialized run breaks any of that (or
+finishes no game at all).
+
+--unsafe also runs with the Lobby methods called directly, the way handlers
+did before lobbies had a command queue, for comparison (how badly that breaks
+depends on the core count and the interpreter); its result never fails the run.
+
+    python bench/bench_lobby_stress.py --players 10 --seconds 5
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+
+import harness
+from protocol import *
+from logger import logger
+from game_manager import game_manager
+from client_handler import SessionHandler
+from simulation import PLAIN_CIPHER
+
+
+class StressHandler(SessionHandler):
+    """Keeps (type or phase, whose turn / who sent it) for everything the lobby sends it."""
+    def __init__(self, index):
+        SessionHandler.__init__(self, ("stress", index), PLAIN_CIPHER)
+        self.transcript = []
+
+    def send_packet(self, packet, coalesce_key=None):
+        message = json.loads(packet[FRAME_HEADER.size:])
+        self.transcript.append((message.get("phase") or message["type"],
+                                message.get("current_turn") or message.get("sender")))
+
+
+def check_transcript(transcript):
+    """Returns (games completed, violations) for one player's view."""
+    games = 0
+    violations = 0
+    in_game = False
+    voting = False
+    turn = None
+    for event, who in transcript:
+        if event == "CLUE_PHASE":
+            turn = who
+        elif event == MSG_CLUE:
+            if who != turn:
+                violations += 1 # clue accepted out of turn
+            turn = None
+        elif event == MSG_GAME_START:
+            if in_game:
+                violations += 1
+            in_game, voting = True, False
+        elif event == "VOTING":
+            if not in_game or voting:
+                violations += 1
+            voting = True
+        elif event == MSG_GAME_OVER:
+            if not voting:
+                violations += 1 # a second GAME_OVER, or one without a vote
+            else:
+                games += 1
+            in_game = voting = False
+    return games, violations
+
+
+def player_loop(handler, lobby, names, deadline, unsafe, rng, errors, think):
+    while time.perf_counter() < deadline:
+        time.sleep(rng.random() * think)
+        roll = rng.random()
+        try:
+            if roll < 0.05:
+                message = {"type": MSG_GAME_START}
+            elif roll < 0.6:
+                message = {"type": MSG_CLUE, "clue": "x"}
+            else:
+                message = {"type": MSG_VOTE, "suspect": rng.choice(names)}
+            if not unsafe:
+                handler.handle_message(message)
+            elif message["type"] == MSG_GAME_START:
+                lobby.start_game(handler.nickname)
+            elif message["type"] == MSG_CLUE:
+                lobby.handle_clue(handler.nickname, message["clue"])
+            else:
+                lobby.handle_vote(handler.nickname, message["suspect"])
+        except Exception:
+            errors.append(sys.exc_info()[1])
+
+
+def run(players, seconds, unsafe, seed, think):
+    code = game_manager.create_lobby({"min_players": 2, "rounds_before_vote": 1})
+    lobby = game_manager.get_lobby(code)
+    handlers = [StressHandler(i) for i in range(players)]
+    for i, handler in enumerate(handlers):
+        handler.handle_message({"type": MSG_LOGIN, "nickname": f"P{i}"})
+        handler.handle_message({"type": MSG_JOIN_GAME, "code": code})
+    names = list(lobby.players)
+    for handler in handlers:
+        handler.transcript.clear()
+
+    errors = []
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=player_loop,
+                                args=(h, lobby, names, deadline, unsafe, random.Random(seed + i), errors, think))
+               for i, h in enumerate(handlers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    views = [check_transcript(h.transcript) for h in handlers]
+    game_manager.remove_lobby(code)
+    return {
+        "mode": "unsafe" if unsafe else "serialized",
+        "games": views[0][0],
+        "violations": sum(v for g, v in views),
+        "players_disagree": len(set(g for g, v in views)) > 1,
+        "exceptions": len(errors),
+        "messages": sum(len(h.transcript) for h in handlers),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=10)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--unsafe", action="store_true", help="also run without the command queue")
+    parser.add_argument("--think", type=float, default=0.5, help="max ms a player waits between commands")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args()
+
+    logger.setLevel("WARNING")
+    sys.setswitchinterval(1e-6)
+    think = args.think / 1000
+    results = [run(args.players, args.seconds, False, args.seed, think)]
+    if args.unsafe:
+        results.append(run(args.players, args.seconds, True, args.seed, think))
+    harness.write_results(args.output, {"benchmark": "lobby_stress", "players": args.players, "results": results})
+    serialized = results[0]
+    if serialized["violations"] or serialized["exceptions"] or serialized["players_disagree"] or not serialized["games"]:
+        print(f"FAIL: the serialized lobby broke its invariants: {serialized}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
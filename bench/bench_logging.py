@@ -0,0 +1,142 @@
+"""What a log call costs the game thread that makes it.
+
+Compares the old setup (f-string message, synchronous FileHandler at DEBUG
+plus console) with the queued pipeline in Server/logger.py (log_event,
+formatting and writes on the listener thread) for:
+
+  - an enabled INFO event,
+  - a disabled DEBUG event (vote_received outside debug mode),
+  - an enabled event while the disk stalls for --stall-ms on every write,
+  - a burst twice the queue size against that stalled disk.
+
+Both wall time and the calling thread's own CPU time are reported: the
+listener still needs the GIL, so the queue moves the formatting and I/O off
+the game thread rather than making it free.
+
+Console output goes to /dev/null so the terminal isn't what's measured.
+
+    python bench/bench_logging.py --calls 5000
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import harness
+import logger as server_logging
+from logger import log_event, make_handlers
+
+
+class StallingHandler(logging.Handler):
+    """A disk that takes stall seconds per write."""
+    def __init__(self, stall):
+        logging.Handler.__init__(self)
+        self.stall = stall
+
+    def emit(self, record):
+        self.format(record)
+        time.sleep(self.stall)
+
+
+def old_logger(path, extra_handler=None):
+    """The pre-queue setup: synchronous handlers on the calling thread."""
+    logger = logging.getLogger("bench.old")
+    logger.handlers.clear()
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    file_handler = logging.FileHandler(path, encoding="utf-8")
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    console_handler = logging.StreamHandler(open(os.devnull, "w"))
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
+    for handler in (file_handler, console_handler, extra_handler):
+        if handler:
+            logger.addHandler(handler)
+    return logger
+
+
+def use_new_pipeline(path, extra_handler=None):
+    file_handler, console_handler = make_handlers(path, 10 * 1024 * 1024, 1, 0, logging.INFO)
+    console_handler.setStream(open(os.devnull, "w"))
+    handlers = [file_handler, console_handler] + ([extra_handler] if extra_handler else [])
+    server_logging.listener.stop()
+    server_logging.listener = logging.handlers.QueueListener(
+        server_logging.log_queue, *handlers, respect_handler_level=True)
+    server_logging.listener.start()
+    server_logging.logger.setLevel(logging.INFO)
+
+
+def time_calls(fn, calls):
+    """(wall ns, calling-thread CPU ns) per call."""
+    start, start_cpu = time.perf_counter(), time.thread_time()
+    for i in range(calls):
+        fn(i)
+    wall, cpu = time.perf_counter() - start, time.thread_time() - start_cpu
+    return {"wall_ns": round(wall / calls * 1e9), "cpu_ns": round(cpu / calls * 1e9)}
+
+
+def drain():
+    """Waits for the listener to write everything queued so far."""
+    start = time.perf_counter()
+    server_logging.listener.stop()
+    server_logging.listener.start()
+    return time.perf_counter() - start
+
+
+def measure(calls, stall, directory):
+    code, voter = "ABC123", "Player 7"
+    old = old_logger(os.path.join(directory, "old.log"))
+    use_new_pipeline(os.path.join(directory, "new.jsonl"))
+    drain()
+
+    old_info = time_calls(lambda i: old.info(f"Player {voter} joined Lobby {code}."), calls)
+    new_info = time_calls(lambda i: log_event("player_joined", "Player %(nickname)s joined Lobby %(code)s.",
+                                              nickname=voter, code=code), calls)
+    # Listener time spent behind the calls: the work moved off the game thread, not removed
+    new_info["drain_ms"] = round(drain() * 1000, 1)
+
+    # The old logger ran at DEBUG, so the file got every vote line
+    old_debug = time_calls(lambda i: old.debug(f"Vote received from {voter}. Total: {i}/10"), calls)
+    new_debug = time_calls(lambda i: log_event("vote_received", "vote from %(voter)s", logging.DEBUG,
+                                               voter=voter, votes=i), calls)
+    results = {
+        "info": {"old": old_info, "new": new_info},
+        "disabled_debug": {"old": old_debug, "new": new_debug},
+    }
+
+    # A few hundred calls against a stalling disk: the old path waits on every one
+    stalled_calls = min(calls, 200)
+    old = old_logger(os.path.join(directory, "old.log"), StallingHandler(stall))
+    use_new_pipeline(os.path.join(directory, "new.jsonl"), StallingHandler(stall))
+    results["stalled_disk"] = {
+        "old": time_calls(lambda i: old.info(f"Player {voter} joined Lobby {code}."), stalled_calls),
+        "new": time_calls(lambda i: log_event("player_joined", "Player %(nickname)s joined Lobby %(code)s.",
+                                              nickname=voter, code=code), stalled_calls),
+    }
+
+    # A burst bigger than the queue while the disk is stalled: the excess is dropped, not waited on
+    burst = server_logging.QUEUE_SIZE * 2
+    results["stalled_burst"] = time_calls(lambda i: log_event("player_joined", "Player %(nickname)s joined.",
+                                                              nickname=voter), burst)
+    results["stalled_burst"]["calls"] = burst
+    results["dropped_records"] = server_logging.queue_handler.dropped
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=5000, help="kept under the queue size")
+    parser.add_argument("--stall-ms", type=float, default=1.0)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = measure(args.calls, args.stall_ms / 1000, directory)
+        # Don't wait on the stalled listener at exit
+        server_logging.log_queue.queue.clear()
+    harness.write_results(args.output, {"benchmark": "logging", "calls": args.calls, **results})
+
+
+if __name__ == "__main__":
+    main()
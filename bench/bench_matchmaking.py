@@ -0,0 +1,95 @@
+"""QUICK_PLAY placement with many open lobbies: OpenLobbyIndex vs a scan.
+
+Creates --lobbies WAITING matchmaking lobbies (auto start off, so they
+stay open) through the GameManager with random occupancy (players put straight into the lobby, then one changed() to file
+it), then places --placements players one at a time the way QUICK_PLAY
+does: GameManager.quick_play_lobby() plus Lobby.add_player(), which files
+the lobby again (and broadcasts the join). Reports lookup and whole
+placement p50/p99 and checks that each player
+went to a fullest open lobby. The baseline walks every lobby in the
+registry for the fullest WAITING, non-full one, as the code had to
+without the index.
+
+    python bench/bench_matchmaking.py --lobbies 100000
+"""
+import argparse
+import random
+import time
+
+import harness
+from logger import logger
+from game_manager import game_manager
+from simulation import FakeHandler, Recorder
+
+
+def scan_for_fullest(manager):
+    best = None
+    for lobby in manager.lobbies.values():
+        if lobby.settings.get("quick_play") and lobby.state == "WAITING" and not lobby.is_full():
+            if best is None or len(lobby.players) > len(best.players):
+                best = lobby
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lobbies", type=int, default=100000)
+    parser.add_argument("--placements", type=int, default=20000)
+    parser.add_argument("--scans", type=int, default=20)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args()
+
+    logger.setLevel("WARNING")
+    rng = random.Random(1)
+    recorder = Recorder()
+    max_players = game_manager.settings["max_players"]
+    start = time.perf_counter()
+    for i in range(args.lobbies):
+        lobby = game_manager.get_lobby(game_manager.create_lobby({"quick_play": True, "auto_start": False}))
+        for seat in range(rng.randrange(max_players)):
+            lobby.players[f"p{seat}"] = FakeHandler(f"p{seat}", recorder)
+        lobby.changed()
+    setup = time.perf_counter() - start
+
+    latencies = []
+    lookups = []
+    misplaced = 0
+    for i in range(args.placements):
+        handler = FakeHandler(f"q{i}", recorder)
+        fewest_free = game_manager.open_lobbies.counts[0]
+        start = time.perf_counter()
+        lobby = game_manager.quick_play_lobby()
+        lookups.append(time.perf_counter() - start)
+        success, nickname = lobby.add_player(handler.nickname, handler)
+        latencies.append(time.perf_counter() - start)
+        if not success:
+            raise RuntimeError(f"placement {i} failed: {nickname}")
+        # It had fewest_free seats before this player took one
+        if lobby.open_seats() != fewest_free - 1:
+            misplaced += 1
+
+    scans = []
+    for _ in range(args.scans):
+        start = time.perf_counter()
+        scan_for_fullest(game_manager)
+        scans.append(time.perf_counter() - start)
+
+    latencies.sort()
+    lookups.sort()
+    scans.sort()
+    harness.write_results(args.output, {
+        "benchmark": "matchmaking", "lobbies": args.lobbies, "placements": args.placements,
+        "open_lobbies_left": len(game_manager.open_lobbies),
+        "setup_s": round(setup, 2),
+        "index_lookup_us_p50": round(harness.percentile(lookups, 50) * 1e6, 1),
+        "index_lookup_us_p99": round(harness.percentile(lookups, 99) * 1e6, 1),
+        "index_place_us_p50": round(harness.percentile(latencies, 50) * 1e6, 1),
+        "index_place_us_p99": round(harness.percentile(latencies, 99) * 1e6, 1),
+        "misplaced": misplaced,
+        "scan_ms_p50": round(harness.percentile(scans, 50) * 1000, 1),
+        "scan_ms_max": round(scans[-1] * 1000, 1),
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Time from a dropped socket to the seat being back, and whether games survive.
+
+Starts a local server, fills --lobbies lobbies of --players real
+NetworkClients, starts every game, then cuts one random player's socket per
+lobby (shutdown, as a Wi-Fi blip would) --drops times. Each victim
+reconnects on its own with jittered backoff and sends RESUME. Reports
+drop-to-RESUME_SUCCESS latency and counts game resets (there should be none).
+
+    python bench/bench_resume.py --lobbies 10 --drops 5
+"""
+import argparse
+import os
+import random
+import socket
+import sys
+import threading
+import time
+
+import harness
+
+sys.path.insert(0, os.path.join(harness.ROOT, "Client"))
+from network_client import NetworkClient
+
+
+class Player:
+    def __init__(self, index):
+        self.index = index
+        self.client = NetworkClient()
+        self.client.on_message_callback = self.on_message
+        self.messages = []
+        self.resumed = threading.Event()
+        self.resumed_at = None
+        self.resets = 0
+
+    def on_message(self, message):
+        self.messages.append(message)
+        if message.get("type") == "RESUME_SUCCESS":
+            self.resumed_at = time.perf_counter()
+            self.resumed.set()
+        elif "Game Reset" in (message.get("info") or ""):
+            self.resets += 1
+
+    def wait_for(self, m_type, timeout=5.0):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            for message in self.messages:
+                if message.get("type") == m_type:
+                    return message
+            time.sleep(0.01)
+        raise RuntimeError(f"no {m_type} for player {self.index}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", choices=["threaded", "asyncio"], default="threaded")
+    parser.add_argument("--lobbies", type=int, default=10)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--drops", type=int, default=5, help="drops per lobby, one after the other")
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    latencies = []
+    failed = 0
+    with harness.local_server(args.engine) as (pid, port):
+        lobbies = []
+        for _ in range(args.lobbies):
+            players = [Player(i) for i in range(args.players)]
+            for player in players:
+                ok, err = player.client.connect("127.0.0.1", port, f"p{player.index}")
+                if not ok:
+                    raise RuntimeError(err)
+            players[0].client.send({"type": "CREATE_GAME"})
+            code = players[0].wait_for("JOIN_SUCCESS")["code"]
+            for player in players[1:]:
+                player.client.send({"type": "JOIN_GAME", "code": code})
+                player.wait_for("JOIN_SUCCESS")
+            players[0].client.send({"type": "GAME_START"})
+            for player in players:
+                player.wait_for("GAME_START")
+            lobbies.append(players)
+
+        for _ in range(args.drops):
+            victims = [rng.choice(players) for players in lobbies]
+            for victim in victims:
+                victim.resumed.clear()
+                victim.dropped_at = time.perf_counter()
+                victim.client.sock.shutdown(socket.SHUT_RDWR)
+            for victim in victims:
+                if victim.resumed.wait(10):
+                    latencies.append(victim.resumed_at - victim.dropped_at)
+                else:
+                    failed += 1
+
+    latencies.sort()
+    harness.write_results(args.output, {
+        "benchmark": "resume", "engine": args.engine, "drops": args.lobbies * args.drops,
+        "resumed": len(latencies), "failed": failed,
+        "game_resets": sum(p.resets for players in lobbies for p in players),
+        "resume_ms_p50": round(harness.percentile(latencies, 50) * 1000, 1) if latencies else None,
+        "resume_ms_p95": round(harness.percentile(latencies, 95) * 1000, 1) if latencies else None,
+        "resume_ms_max": round(latencies[-1] * 1000, 1) if latencies else None,
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Games per second through the pure Lobby/GameManager state machine.
+
+Uses Server/simulation.py (fake in-memory handlers, seeded RNG, no sockets or
+crypto). The digest is stable for a given seed and game count, so a changed
+digest after a rule change shows that players now see different messages.
+
+    python bench/bench_simulation.py --games 10000 --seed 1
+    python bench/bench_simulation.py --games 2000 --profile
+"""
+import argparse
+import cProfile
+import pstats
+import time
+
+import harness
+from simulation import simulate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--disconnect-rate", type=float, default=0.02)
+    parser.add_argument("--profile", action="store_true", help="print the top functions by cumulative time")
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args()
+
+    profiler = cProfile.Profile() if args.profile else None
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    result = simulate(games=args.games, seed=args.seed, disconnect_rate=args.disconnect_rate)
+    if profiler:
+        profiler.disable()
+    elapsed = time.perf_counter() - start
+
+    result.update({"benchmark": "simulation", "seconds": round(elapsed, 3),
+                   "games_per_sec": round(result["games"] / elapsed, 1)})
+    harness.write_results(args.output, result)
+    if profiler:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+
+
+if __name__ == "__main__":
+    main()
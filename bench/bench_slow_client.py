@@ -0,0 +1,105 @@
+"""Broadcast latency with one deliberately non-reading client in the lobby.
+
+Players are real ClientHandlers on socketpairs. The fast ones are read by a
+drain thread; the slow one is never read, so its kernel buffers fill up and
+its writer blocks. Broadcast time must stay flat, and the slow client must be
+dropped (policy "drop") or have its state updates coalesced ("coalesce");
+the script exits 1 if it was neither.
+
+    python bench/bench_slow_client.py --policy drop
+"""
+import argparse
+import socket
+import sys
+import threading
+import time
+
+import harness
+from cryptography.fernet import Fernet
+from protocol import *
+from game_manager import game_manager
+from client_handler import ClientHandler
+from lobby_logic import Lobby
+
+
+def drain_forever(sock):
+    try:
+        while sock.recv(65536):
+            pass
+    except OSError:
+        pass
+
+
+def make_player(lobby, nickname, cipher, reading):
+    server_end, client_end = socket.socketpair()
+    # Small buffers so the non-reading side backs up after a few messages
+    for s in (server_end, client_end):
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    handler = ClientHandler(server_end, (nickname, 0), cipher)
+    handler.nickname = nickname
+    handler.start()
+    lobby.players[nickname] = handler
+    handler.lobby = lobby
+    if reading:
+        threading.Thread(target=drain_forever, args=(client_end,), daemon=True).start()
+    return handler, client_end
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--policy", choices=["drop", "coalesce"], default="drop")
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--broadcasts", type=int, default=500)
+    parser.add_argument("--clue-every", type=int, default=10, help="every Nth broadcast is a (non-coalescable) CLUE")
+    parser.add_argument("--interval", type=float, default=0.001, help="seconds between broadcasts")
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args()
+
+    game_manager.settings["outbound_overflow_policy"] = args.policy
+    game_manager.settings["outbound_queue_size"] = args.queue_size
+    cipher = Fernet(get_protocol_key())
+    lobby = Lobby("SLOW01", {**game_manager.settings, "max_players": args.players + 1}, game_manager.word_bank)
+
+    sockets = []
+    for i in range(args.players):
+        sockets.append(make_player(lobby, f"fast{i}", cipher, reading=True)[1])
+    slow, slow_sock = make_player(lobby, "slow", cipher, reading=False)
+
+    timings = []
+    for i in range(args.broadcasts):
+        start = time.perf_counter()
+        if args.clue_every and i % args.clue_every == 0:
+            lobby.broadcast({"type": MSG_CLUE, "sender": "fast0", "clue": f"clue{i}"})
+        else:
+            lobby.broadcast({"type": MSG_STATE_UPDATE, "phase": "CLUE_PHASE", "current_turn": f"fast{i % args.players}"})
+        timings.append(time.perf_counter() - start)
+        time.sleep(args.interval)
+    time.sleep(0.5)
+    timings.sort()
+    dropped = "slow" not in lobby.players
+    coalesced = args.policy == "coalesce" and slow.outbound.coalesced > 0
+
+    harness.write_results(args.output, {
+        "benchmark": "slow_client",
+        "policy": args.policy,
+        "players": args.players + 1,
+        "broadcasts": args.broadcasts,
+        "broadcast_us_p50": round(harness.percentile(timings, 50) * 1e6, 2),
+        "broadcast_us_p99": round(harness.percentile(timings, 99) * 1e6, 2),
+        "broadcast_us_max": round(timings[-1] * 1e6, 2),
+        "slow_client_still_in_lobby": "slow" in lobby.players,
+        "slow_client_queued_messages": slow.outbound.size,
+        "slow_client_coalesced_messages": slow.outbound.coalesced,
+    })
+    for s in sockets + [slow_sock]:
+        s.shutdown(socket.SHUT_RDWR) # wakes the drain threads and the server-side readers
+        s.close()
+    if not (dropped or coalesced):
+        print(f"FAIL: the slow client was neither dropped nor coalesced (policy {args.policy})", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
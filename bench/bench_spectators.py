@@ -0,0 +1,160 @@
+"""Player latency with thousands of spectators in the lobby.
+
+Players are real ClientHandlers on socketpairs, each read by a thread that
+timestamps every frame it gets. Spectators are in-process stand-ins with a
+real coalescing OutboundQueue and session-key cipher: the fast ones take
+each packet straight back out (a writer that never waits), --slow of them
+never do. Three runs of the same
+broadcasts (every --clue-every'th a CLUE, the rest CLUE_PHASE updates):
+
+  none    no spectators
+  feed    spectators on the lobby's SpectatorFeed (shared frames, fan-out
+          off the lobby's path)
+  inline  the same spectators passed to Lobby.broadcast() as extra
+          handlers, each sealed under its own key on the lobby's path
+
+Reports the broadcast call p50/p99 (what the lobby's command pays),
+broadcast-to-last-player delivery p50/p99, seals per event, and what the
+slow spectators were left with.
+
+    python bench/bench_spectators.py --spectators 5000 --slow 500
+"""
+import argparse
+import os
+import socket
+import threading
+import time
+
+import harness
+from cryptography.fernet import Fernet
+from protocol import *
+from game_manager import game_manager
+from client_handler import ClientHandler
+from lobby_logic import Lobby
+from logger import logger
+from metrics import metrics
+from outbound import OutboundQueue, POLICY_COALESCE
+from session_crypto import AEAD_AESGCM, SessionCipher
+
+
+class BenchSpectator:
+    """Duck-types a spectating SessionHandler; nothing behind the queue."""
+    def __init__(self, queue_size, reading):
+        self.reading = reading
+        self.cipher = SessionCipher(AEAD_AESGCM, os.urandom(32), os.urandom(32))
+        self.codec = JSON_CODEC
+        self.lobby_deltas = False
+        self.outbound = OutboundQueue(queue_size, POLICY_COALESCE)
+        self.dropped = False
+
+    def send_packet(self, packet, coalesce_key=None):
+        if not self.outbound.put(packet, coalesce_key):
+            self.dropped = True
+        elif self.reading:
+            self.outbound.take_nowait()
+
+    def stopped_watching(self, feed):
+        pass
+
+
+def read_frames(sock, arrivals):
+    decoder = FrameDecoder()
+    try:
+        while True:
+            data = sock.recv(65536)
+            if not data:
+                break
+            now = time.perf_counter()
+            arrivals.extend(now for _ in decoder.feed(data))
+    except OSError:
+        pass
+
+
+def run(mode, args, cipher):
+    lobby = Lobby(f"SPEC{mode[:2].upper()}", {**game_manager.settings, "max_players": args.players}, game_manager.word_bank)
+    players = []
+    for i in range(args.players):
+        server_end, client_end = socket.socketpair()
+        handler = ClientHandler(server_end, (f"p{i}", 0), cipher)
+        handler.nickname = f"p{i}"
+        handler.start()
+        lobby.players[handler.nickname] = handler
+        handler.lobby = lobby
+        arrivals = []
+        threading.Thread(target=read_frames, args=(client_end, arrivals), daemon=True).start()
+        players.append((handler, client_end, arrivals))
+
+    count = args.spectators if mode != "none" else 0
+    spectators = [BenchSpectator(args.queue_size, reading=i >= args.slow) for i in range(count)]
+    if mode == "feed":
+        for spectator in spectators:
+            lobby.spectators.add(spectator)
+
+    seals_before = metrics.snapshot()["histograms"].get("encrypt_seconds", {}).get("count", 0)
+    audience = list(lobby.players.values()) + spectators if mode == "inline" else None
+    starts = []
+    calls = []
+    for i in range(args.broadcasts):
+        if args.clue_every and i % args.clue_every == 0:
+            message = {"type": MSG_CLUE, "sender": "p0", "clue": f"clue{i}"}
+        else:
+            message = {"type": MSG_STATE_UPDATE, "phase": "CLUE_PHASE", "current_turn": f"p{i % args.players}"}
+        start = time.perf_counter()
+        lobby.broadcast(message, audience)
+        calls.append(time.perf_counter() - start)
+        starts.append(start)
+        time.sleep(args.interval)
+
+    deadline = time.time() + 10
+    while any(len(arrivals) < args.broadcasts for _, _, arrivals in players) and time.time() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.2)
+    seals = metrics.snapshot()["histograms"].get("encrypt_seconds", {}).get("count", 0) - seals_before
+
+    delivery = []
+    for i, start in enumerate(starts):
+        delivery.append(max(arrivals[i] for _, _, arrivals in players) - start)
+    calls.sort()
+    delivery.sort()
+    slow = spectators[:args.slow]
+    result = {
+        "broadcast_us_p50": round(harness.percentile(calls, 50) * 1e6, 1),
+        "broadcast_us_p99": round(harness.percentile(calls, 99) * 1e6, 1),
+        "player_delivery_us_p50": round(harness.percentile(delivery, 50) * 1e6, 1),
+        "player_delivery_us_p99": round(harness.percentile(delivery, 99) * 1e6, 1),
+        "seals_per_event": round(seals / args.broadcasts, 1),
+    }
+    if slow:
+        result["slow_queued_max"] = max(spectator.outbound.size for spectator in slow)
+        result["slow_dropped"] = sum(spectator.dropped for spectator in slow)
+    if len(spectators) > args.slow:
+        result["fast_dropped"] = sum(spectator.dropped for spectator in spectators[args.slow:])
+    for handler, client_end, _ in players:
+        client_end.shutdown(socket.SHUT_RDWR)
+        client_end.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--spectators", type=int, default=5000)
+    parser.add_argument("--slow", type=int, default=500, help="spectators that never read")
+    parser.add_argument("--broadcasts", type=int, default=300)
+    parser.add_argument("--clue-every", type=int, default=10, help="every Nth broadcast is a (non-coalescable) CLUE")
+    parser.add_argument("--interval", type=float, default=0.005, help="seconds between broadcasts")
+    parser.add_argument("--queue-size", type=int, default=256)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args()
+
+    logger.setLevel("WARNING")
+    cipher = Fernet(get_protocol_key())
+    results = {"benchmark": "spectators", "players": args.players, "spectators": args.spectators,
+               "slow": args.slow, "broadcasts": args.broadcasts}
+    for mode in ("none", "feed", "inline"):
+        results[mode] = run(mode, args, cipher)
+    harness.write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
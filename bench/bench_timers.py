@@ -0,0 +1,117 @@
+"""Cost of the shared TimerScheduler with many pending deadlines.
+
+Schedules --count timers (far in the future, like clue/vote timeouts),
+cancels --cancel-ratio of them the way answered turns do, and reports ns per
+call_later/cancel, the heap left behind and the Python memory per pending
+timer. Then fires --fire timers spread over one second and measures how late
+they run. --thread-timers starts that many threading.Timer objects for
+comparison (one thread each, which is what the scheduler avoids).
+
+    python bench/bench_timers.py --count 1000000
+"""
+import argparse
+import random
+import threading
+import time
+import tracemalloc
+
+import harness
+from timers import TimerScheduler
+
+
+def noop():
+    pass
+
+
+def schedule_and_cancel(count, cancel_ratio):
+    scheduler = TimerScheduler()
+    rng = random.Random(1)
+    delays = [3600 + rng.random() * 60 for _ in range(count)]
+
+    start = time.perf_counter()
+    timers = [scheduler.call_later(delay, noop) for delay in delays]
+    scheduled = time.perf_counter() - start
+
+    # Memory on a second scheduler, tracemalloc would skew the timing above
+    sample = TimerScheduler()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    kept = [sample.call_later(delay, noop) for delay in delays]
+    memory = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del kept
+
+    doomed = timers[:int(count * cancel_ratio)]
+    rng.shuffle(doomed)
+    start = time.perf_counter()
+    for timer in doomed:
+        scheduler.cancel(timer)
+    cancelled = time.perf_counter() - start
+    return {
+        "timers": count,
+        "call_later_ns": round(scheduled / count * 1e9),
+        "cancel_ns": round(cancelled / max(1, len(doomed)) * 1e9),
+        "bytes_per_timer": round(memory / count),
+        "pending": scheduler.pending(),
+        "heap_after_cancel": len(scheduler.heap),
+        "threads": threading.active_count(),
+    }
+
+
+def fire_latency(count):
+    scheduler = TimerScheduler()
+    lateness = []
+    done = threading.Event()
+
+    def fired(deadline):
+        lateness.append(time.monotonic() - deadline)
+        if len(lateness) == count:
+            done.set()
+
+    rng = random.Random(2)
+    for _ in range(count):
+        delay = rng.random()
+        scheduler.call_later(delay, fired, time.monotonic() + delay)
+    done.wait(10)
+    lateness.sort()
+    return {
+        "timers": count,
+        "fired": len(lateness),
+        "late_ms_p50": round(harness.percentile(lateness, 50) * 1000, 3),
+        "late_ms_p99": round(harness.percentile(lateness, 99) * 1000, 3),
+        "late_ms_max": round(lateness[-1] * 1000, 3) if lateness else None,
+    }
+
+
+def thread_timers(count):
+    before = threading.active_count()
+    start = time.perf_counter()
+    timers = [threading.Timer(3600, noop) for _ in range(count)]
+    for timer in timers:
+        timer.start()
+    elapsed = time.perf_counter() - start
+    threads = threading.active_count() - before
+    for timer in timers:
+        timer.cancel()
+    return {"timers": count, "start_ns": round(elapsed / count * 1e9), "threads": threads}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1000000)
+    parser.add_argument("--cancel-ratio", type=float, default=0.9)
+    parser.add_argument("--fire", type=int, default=20000)
+    parser.add_argument("--thread-timers", type=int, default=1000)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args()
+
+    harness.write_results(args.output, {
+        "benchmark": "timers",
+        "scheduler": schedule_and_cancel(args.count, args.cancel_ratio),
+        "fire": fire_latency(args.fire),
+        "threading_timer": thread_timers(args.thread_timers) if args.thread_timers else None,
+    })
+
+
+if __name__ == "__main__":
+    main()
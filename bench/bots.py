@@ -0,0 +1,170 @@
+"""Headless bot clients that play real games over the real protocol.
+
+A LobbyBots group is one host plus N-1 joiners. The host creates the lobby,
+starts a game once everyone is in, and starts the next one after GAME_OVER
+until the requested number of games has been played. Every bot gives its
+clue as soon as it's its turn and votes at random.
+"""
+import asyncio
+import random
+import time
+
+from cryptography.fernet import Fernet
+from protocol import *
+from codec import CODECS, JSON_CODEC
+
+
+class Bot:
+    def __init__(self, group, nickname, is_host):
+        self.group = group
+        self.nickname = nickname
+        self.is_host = is_host
+        self.reader = None
+        self.writer = None
+        self.clue_sent_at = None
+        self.codec = JSON_CODEC
+        self.cipher = group.cipher
+
+    async def connect(self, port):
+        self.reader, self.writer = await asyncio.open_connection("127.0.0.1", port)
+        self.decoder = FrameDecoder()
+
+    def send(self, message):
+        self.writer.write(pack_message(message, self.cipher, self.codec))
+
+    async def login(self, port):
+        await self.connect(port)
+        self.codec = JSON_CODEC
+        self.cipher = self.group.cipher
+        login = {"type": MSG_LOGIN, "nickname": self.nickname, "codecs": [self.group.codec]}
+        kx = None
+        if self.group.session_keys:
+            kx, offer = offer_session()
+            login.update(offer)
+        self.send(login)
+        reply = await self.next_message("LOGIN_SUCCESS")
+        self.codec = CODECS.get(reply.get("codec"), JSON_CODEC)
+        if kx:
+            self.cipher = complete_session(kx, reply) or self.cipher
+
+    async def next_message(self, wanted_type):
+        while True:
+            for message in await self.read_messages():
+                if message.get("type") == wanted_type:
+                    return message
+
+    async def read_messages(self):
+        while True:
+            data = await self.reader.read(BUFFER_SIZE)
+            if not data:
+                raise ConnectionError(f"{self.nickname}: server closed the connection")
+            frames = self.decoder.feed(data)
+            if frames:
+                self.group.stats.messages += len(frames)
+                return [decrypt_message(f, self.cipher) for f in frames]
+
+    async def join(self, code):
+        self.send({"type": MSG_JOIN_GAME, "code": code})
+        while True:
+            for message in await self.read_messages():
+                if message["type"] == MSG_REDIRECT:
+                    # Lobby is on another shard
+                    self.writer.close()
+                    await self.login(message["port"])
+                    self.send({"type": MSG_JOIN_GAME, "code": code})
+                elif message["type"] == "JOIN_SUCCESS":
+                    return
+                elif message["type"] == MSG_ERROR:
+                    raise RuntimeError(f"{self.nickname}: {message['message']}")
+                else:
+                    self.group.pending[self.nickname].append(message)
+
+    async def play(self):
+        backlog = self.group.pending.pop(self.nickname, [])
+        while not self.group.finished:
+            messages, backlog = backlog + await self.read_messages(), []
+            for message in messages:
+                self.on_message(message)
+                if self.group.finished:
+                    break
+
+    def on_message(self, message):
+        m_type = message.get("type")
+        group = self.group
+        if m_type == MSG_STATE_UPDATE:
+            phase = message.get("phase")
+            if phase == "LOBBY":
+                if self.is_host and len(message.get("players", [])) == group.size and not group.in_game:
+                    group.in_game = True
+                    self.send({"type": MSG_GAME_START})
+            elif phase == "CLUE_PHASE":
+                if message.get("current_turn") == self.nickname:
+                    self.clue_sent_at = time.perf_counter()
+                    self.send({"type": MSG_CLUE, "clue": "bench"})
+            elif phase == "VOTING":
+                self.send({"type": MSG_VOTE, "suspect": group.rng.choice(message["candidates"])})
+        elif m_type == MSG_CLUE:
+            if message.get("sender") == self.nickname and self.clue_sent_at is not None:
+                group.stats.latencies.append(time.perf_counter() - self.clue_sent_at)
+                self.clue_sent_at = None
+        elif m_type == MSG_GAME_OVER and self.is_host:
+            group.games_played += 1
+            group.in_game = False
+            group.stats.games += 1
+            if group.games_played >= group.games:
+                group.finished = True
+        elif m_type == MSG_ERROR:
+            group.stats.errors += 1
+
+
+class BenchStats:
+    def __init__(self):
+        self.messages = 0
+        self.games = 0
+        self.errors = 0
+        self.latencies = []
+
+
+class LobbyBots:
+    """One lobby's worth of bots."""
+    def __init__(self, index, size, games, stats, seed=0, codec="json", session_keys=False):
+        self.size = size
+        self.codec = codec
+        self.session_keys = session_keys
+        self.games = games
+        self.stats = stats
+        self.cipher = Fernet(get_protocol_key())
+        self.rng = random.Random(seed * 7919 + index)
+        self.games_played = 0
+        self.in_game = False
+        self.finished = False
+        self.bots = [Bot(self, f"L{index}P{i}", i == 0) for i in range(size)]
+        self.pending = {bot.nickname: [] for bot in self.bots}
+
+    async def setup(self, port):
+        """Connects every bot and fills the lobby; returns the lobby code."""
+        host = self.bots[0]
+        await host.login(port)
+        host.send({"type": MSG_CREATE_GAME})
+        code = (await host.next_message("JOIN_SUCCESS"))["code"]
+        for bot in self.bots[1:]:
+            await bot.login(port)
+            await bot.join(code)
+        return code
+
+    async def run(self):
+        # The host may have missed the last LOBBY update while joiners were still arriving
+        self.in_game = True
+        self.bots[0].send({"type": MSG_GAME_START})
+        tasks = [asyncio.ensure_future(bot.play()) for bot in self.bots]
+        try:
+            # The host's task ends after the last GAME_OVER (or any task fails)
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for bot in self.bots:
+                bot.writer.close()
@@ -0,0 +1,113 @@
+"""Shared helpers for the benchmark scripts: start a local server, sample it, save results."""
+import contextlib
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_DIR = os.path.join(ROOT, "Server")
+
+# Bench scripts speak the real protocol, so they import it straight from the server tree
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def raise_fd_limit():
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = hard if hard != resource.RLIM_INFINITY else 65536
+    if target > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+
+
+def wait_for_port(port, proc, deadline):
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            if proc.poll() is not None or time.time() > deadline:
+                raise RuntimeError(f"Server failed to start on port {port}")
+            time.sleep(0.05)
+
+
+@contextlib.contextmanager
+def local_server(engine="threaded", port=None, shards=1, startup_timeout=10.0):
+    """Runs the server in a child process; yields (pid, port).
+
+    With shards > 1 it runs sharding.run_sharded(), which also uses the
+    shard ports port+1 .. port+shards. The game history and leaderboard
+    checkpoints go to a scratch directory that is removed afterwards.
+    """
+    port = port or free_port()
+    data_dir = tempfile.mkdtemp(prefix="bench-server-")
+    code = ("from game_manager import game_manager; "
+            f"game_manager.settings['history_db'] = {os.path.join(data_dir, 'game_history.db')!r}; "
+            f"game_manager.settings['leaderboard_checkpoint'] = {os.path.join(data_dir, 'leaderboard.json')!r}; ")
+    if shards > 1:
+        code += f"import sharding; sharding.run_sharded({shards}, {port}, {engine!r})"
+    else:
+        code += f"import main; main.start_server({port}, {engine!r})"
+    proc = subprocess.Popen([sys.executable, "-c", code], cwd=SERVER_DIR,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + startup_timeout
+        wait_for_port(port, proc, deadline)
+        for index in range(1, shards + 1 if shards > 1 else 1):
+            wait_for_port(port + index, proc, deadline)
+        yield proc.pid, port
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def process_stats(pid):
+    """RSS (KiB) and thread count of a local process, read from /proc."""
+    stats = {"rss_kb": None, "threads": None}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    stats["rss_kb"] = int(line.split()[1])
+                elif line.startswith("Threads:"):
+                    stats["threads"] = int(line.split()[1])
+    except OSError:
+        pass
+    return stats
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def write_results(path, results):
+    """Writes a JSON result file (or prints it when path is None)."""
+    text = json.dumps(results, indent=2)
+    if path:
+        with open(path, "w") as f:
+            f.write(text + "\n")
+    print(text)
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The server modules import each other as top-level modules (run from Server/)
+SERVER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Server")
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
@@ -0,0 +1,51 @@
+import pytest
+
+import protocol
+from codec import BINARY_CODEC, FIELD_TAGS, TYPE_TAGS, decode_payload
+
+# One message of every kind the server or client sends, with its usual fields
+SAMPLES = [
+    {"type": "LOGIN", "nickname": "Alice", "codecs": ["bin1", "json"], "kx": "a2V5", "aeads": ["aes-256-gcm"],
+     "bind": "K7Q2ZD"},
+    {"type": "LOGIN_SUCCESS", "nickname": "Alice", "codec": "bin1", "kx": "a2V5", "aead": "aes-256-gcm"},
+    {"type": "STATE_UPDATE", "phase": "CLUE_PHASE", "current_turn": "Bob", "time_limit": 60},
+    {"type": "CLUE", "sender": "Bob", "clue": "(no clue, time ran out)", "skipped": True},
+    {"type": "LOGIN", "nickname": "Alice", "features": ["lobby_deltas"]},
+    {"type": "LOBBY_DELTA", "version": 7, "joined": "Carla", "info": "Carla joined"},
+    {"type": "LOBBY_DELTA", "version": 8, "left": "Alice", "host": "Bob"},
+    {"type": "STATE_UPDATE", "phase": "LOBBY", "players": ["Bob", "Carla"], "host": "Bob", "version": 8},
+    {"type": "SYNC"},
+    {"type": "JOIN_SUCCESS", "code": "K7Q2ZD", "nickname": "Bob", "resume_token": "dG9rZW4", "lobby_state": "WAITING"},
+    {"type": "RESUME", "code": "K7Q2ZD", "nickname": "Bob", "token": "dG9rZW4"},
+    {"type": "RESUME_SUCCESS", "code": "K7Q2ZD", "nickname": "Bob", "resume_token": "bmV3", "state": "VOTING",
+     "players": ["Bob", "Carla"], "host": "Bob", "version": 3, "role": "CITIZEN", "word": "Gelato",
+     "turn_order": ["Carla", "Bob"], "clues": [["Carla", "freddo"]], "candidates": ["Bob", "Carla"], "voted": False},
+    {"type": "LEAVE"},
+    {"type": "LEADERBOARD", "board": "games", "limit": 10},
+    {"type": "LEADERBOARD", "board": "games", "entries": [{"nickname": "Bob", "value": 12, "games": 12}],
+     "min_games": 5, "you": None},
+    {"type": "QUICK_PLAY"},
+    {"type": "JOIN_SUCCESS", "code": "K7Q2ZD", "nickname": "Bob", "resume_token": "dG9rZW4", "lobby_state": "WAITING",
+     "quick_play": True},
+    {"type": "LIST_LOBBIES", "state": "WAITING", "min_free": 1, "settings": {"word_pack": "food"}, "cursor": "K7Q2ZD",
+     "limit": 20},
+    {"type": "LIST_LOBBIES", "lobbies": [{"code": "M3X9TB", "state": "WAITING", "players": 2, "free": 6, "host": "Bob",
+     "settings": {"max_players": 8, "word_pack": "food"}}], "next_cursor": "M3X9TB", "version": 41, "total": 130},
+    {"type": "SPECTATE", "code": "K7Q2ZD"},
+    {"type": "SPECTATE", "code": "K7Q2ZD", "state": "PLAYING", "players": ["Bob", "Carla", "Dan"], "host": "Bob",
+     "version": 5, "spectators": 120, "turn_order": ["Dan", "Bob", "Carla"], "clues": [["Dan", "cold"]],
+     "current_turn": "Bob", "feed": {"aead": "aes-256-gcm", "key": "a2V5"}},
+    {"type": "GAME_START", "role": "SPECTATOR", "turn_order": ["Dan", "Bob", "Carla"]},
+]
+
+
+@pytest.mark.parametrize("message", SAMPLES, ids=lambda m: m["type"])
+def test_bin1_tags_every_field(message):
+    assert message["type"] in TYPE_TAGS
+    assert [key for key in message if key != "type" and key not in FIELD_TAGS] == []
+    assert decode_payload(BINARY_CODEC.encode(message)) == message
+
+
+def test_every_message_type_has_a_tag():
+    types = [value for name, value in vars(protocol).items() if name.startswith("MSG_")]
+    assert [t for t in types + ["LOGIN_SUCCESS", "JOIN_SUCCESS"] if t not in TYPE_TAGS] == []
@@ -0,0 +1,13 @@
+from history import GameHistory
+
+
+def test_history_goes_where_the_settings_say(tmp_path):
+    path = tmp_path / "history.db"
+    history = GameHistory()
+    history.start({"history_db": str(path), "history_flush_interval": 0.01})
+    history.record("K7Q2ZD", 0.0, "Gelato", "Bob", "CITIZENS", "caught", ["Bob", "Carla", "Dan"],
+                   {"Carla": "Bob", "Dan": "Bob"}, [["Bob", "cold"]])
+    history.flush()
+    assert history.path == str(path) and path.exists()
+    assert history.player_stats("Carla")["wins"] == 1
+    assert history.word_stats("Gelato") == {"word": "Gelato", "games": 1, "imposter_wins": 0}
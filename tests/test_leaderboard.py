@@ -0,0 +1,34 @@
+import os
+
+import leaderboard
+from leaderboard import Leaderboard, BOARD_GAMES
+
+
+def test_shards_checkpoint_to_their_own_files(tmp_path):
+    path = str(tmp_path / "leaderboard.json")
+    boards = []
+    for shard in range(2):
+        board = Leaderboard()
+        board.start({"leaderboard_checkpoint": path}, f".shard{shard}")
+        board.add(f"player{shard}", imposter=False, won=True, caught=True)
+        board.last_game_id = shard + 1
+        board.checkpoint(board.checkpoint_path)
+        boards.append(board)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["leaderboard.json.shard0", "leaderboard.json.shard1"]
+
+    restored = Leaderboard()
+    restored.start({"leaderboard_checkpoint": path}, ".shard1")
+    assert restored.last_game_id == 2
+    assert [entry["nickname"] for entry in restored.top(BOARD_GAMES)] == ["player1"]
+
+
+def test_no_checkpoint_setting_means_no_file(tmp_path):
+    board = Leaderboard()
+    board.start({"leaderboard_checkpoint": ""}, ".shard0")
+    assert board.checkpoint_path is None
+
+
+def test_relative_checkpoint_is_under_the_server_directory():
+    board = Leaderboard()
+    board.start({"leaderboard_checkpoint": "leaderboard.json"}, ".shard3")
+    assert board.checkpoint_path == os.path.join(os.path.dirname(os.path.abspath(leaderboard.__file__)), "leaderboard.json.shard3")
@@ -0,0 +1,74 @@
+import random
+
+from lobby_directory import LobbyDirectory
+from protocol import JSON_CODEC, MSG_LIST_LOBBIES
+
+
+class FakeLobby:
+    def __init__(self, code, state, players, max_players=6, rounds=2):
+        self.code = code
+        self.state = state
+        self.players = {f"p{i}": None for i in range(players)}
+        self.settings = {"max_players": max_players, "rounds_before_vote": rounds}
+        self.closed = False
+
+    def open_seats(self):
+        if self.state != "WAITING":
+            return 0
+        return max(0, self.settings["max_players"] - len(self.players))
+
+    def get_host_name(self):
+        return next(iter(self.players), "Unknown")
+
+
+def all_pages(directory, request):
+    codes, cursor = [], None
+    while True:
+        message = directory.page(directory.query_key({**request, "cursor": cursor, "limit": 7}))[1]
+        codes += [entry["code"] for entry in message["lobbies"]]
+        cursor = message["next_cursor"]
+        if cursor is None:
+            return codes
+
+
+def test_filtered_pages_walk_only_the_matching_index():
+    rng = random.Random(3)
+    directory = LobbyDirectory()
+    lobbies = [FakeLobby(f"L{i:05d}", rng.choice(("WAITING", "PLAYING", "VOTING")), rng.randrange(7),
+                         rounds=rng.choice((1, 2))) for i in range(500)]
+    for lobby in lobbies:
+        directory.update(lobby)
+    # A few change state and go away, like real ones
+    for lobby in lobbies[:50]:
+        lobby.state = "PLAYING"
+        directory.update(lobby)
+    for lobby in lobbies[50:80]:
+        directory.remove(lobby.code)
+    live = lobbies[80:] + lobbies[:50]
+
+    joinable = sorted(l.code for l in live if l.open_seats() > 0)
+    assert directory.candidates("WAITING", 1) is directory.joinable
+    assert list(directory.joinable.after(None)) == joinable
+    assert all_pages(directory, {"state": "WAITING", "min_free": 1}) == joinable
+    assert all_pages(directory, {"min_free": 2, "settings": {"rounds_before_vote": 2}}) == sorted(
+        l.code for l in live if l.open_seats() >= 2 and l.settings["rounds_before_vote"] == 2)
+    assert all_pages(directory, {"state": "VOTING"}) == sorted(l.code for l in live if l.state == "VOTING")
+    assert all_pages(directory, {"state": "PLAYING", "min_free": 1}) == []
+    assert all_pages(directory, {}) == sorted(l.code for l in live)
+
+
+def test_cached_page_is_not_served_after_a_change():
+    directory = LobbyDirectory()
+    lobby = FakeLobby("K7Q2ZD", "WAITING", 2)
+    directory.update(lobby)
+    request = {"type": MSG_LIST_LOBBIES, "state": "WAITING", "min_free": 1}
+    assert b"K7Q2ZD" in directory.payload(request, JSON_CODEC)
+
+    # The game starts: the very next poll must not offer it any more
+    lobby.state = "PLAYING"
+    directory.update(lobby)
+    assert b"K7Q2ZD" not in directory.payload(request, JSON_CODEC)
+
+    # Nothing changed: same page object from the cache
+    key = directory.query_key(request)
+    assert directory.page(key) is directory.page(key)
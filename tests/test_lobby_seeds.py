@@ -0,0 +1,32 @@
+import random
+
+from game_manager import GameManager
+
+
+def test_word_seed_is_not_a_lobby_setting():
+    manager = GameManager()
+    lobby = manager.get_lobby(manager.create_lobby({"word_seed": 7}))
+    assert lobby.word_sampler.seed != 7
+
+
+def test_word_seed_from_the_simulation():
+    manager = GameManager()
+    first = manager.get_lobby(manager.create_lobby(word_seed=7))
+    second = manager.get_lobby(manager.create_lobby(word_seed=7))
+    assert [first.word_sampler.draw() for _ in range(5)] == [second.word_sampler.draw() for _ in range(5)]
+
+
+def test_create_game_overrides_are_whitelisted():
+    manager = GameManager()
+    lobby = manager.get_lobby(manager.create_lobby({"game_seed": 42, "rounds_before_vote": 3,
+                                                    "allow_legacy_crypto": False}))
+    assert lobby.settings["rounds_before_vote"] == 3
+    assert "game_seed" not in lobby.settings and lobby.rng is random
+    assert lobby.settings["allow_legacy_crypto"] == manager.settings["allow_legacy_crypto"]
+    assert manager.get_lobby(manager.create_lobby("not a dict")) is not None
+
+
+def test_game_seed_from_the_simulation():
+    manager = GameManager()
+    lobby = manager.get_lobby(manager.create_lobby(game_seed=42))
+    assert lobby.rng.random() == random.Random(42).random()
@@ -0,0 +1,43 @@
+import pytest
+
+from game_manager import GameManager, LobbySettingsError, game_manager
+from protocol import MSG_CREATE_GAME, MSG_ERROR, MSG_LOGIN
+from test_resume import RecordingHandler
+
+
+@pytest.mark.parametrize("override", [
+    {"clue_timeout_seconds": "30"},
+    {"vote_timeout_seconds": -1},
+    {"clue_timeout_seconds": 10 ** 9},
+    {"max_players": 1},
+    {"max_players": True},
+    {"min_players": 2.5},
+    {"min_players": 8, "max_players": 4},
+    {"auto_start": "yes"},
+    {"word_pack": ["food"]},
+    {"word_pack": "no-such-pack"},
+])
+def test_bad_overrides_are_refused(override):
+    manager = GameManager()
+    with pytest.raises(LobbySettingsError):
+        manager.create_lobby(override)
+    assert len(manager.lobbies) == 0
+
+
+def test_good_overrides_are_stored():
+    manager = GameManager()
+    lobby = manager.get_lobby(manager.create_lobby({"clue_timeout_seconds": 30.0, "vote_timeout_seconds": 0,
+                                                    "min_players": 2, "max_players": 4, "auto_start": True}))
+    assert lobby.settings["clue_timeout_seconds"] == 30 and type(lobby.settings["clue_timeout_seconds"]) is int
+    assert lobby.time_limit("vote_timeout_seconds") is None
+    assert (lobby.settings["min_players"], lobby.settings["max_players"], lobby.settings["auto_start"]) == (2, 4, True)
+
+
+def test_create_game_with_a_bad_setting_gets_an_error():
+    host = RecordingHandler("host")
+    host.handle_message({"type": MSG_LOGIN, "nickname": "host"})
+    before = len(game_manager.lobbies)
+    host.handle_message({"type": MSG_CREATE_GAME, "settings": {"clue_timeout_seconds": "30"}})
+    assert host.received[-1]["type"] == MSG_ERROR
+    assert "clue_timeout_seconds" in host.received[-1]["message"]
+    assert host.lobby is None and len(game_manager.lobbies) == before
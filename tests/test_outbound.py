@@ -0,0 +1,49 @@
+from outbound import OutboundQueue, POLICY_DROP, POLICY_COALESCE, coalesce_key_for
+from protocol import MSG_CLUE, MSG_STATE_UPDATE
+
+
+def test_drop_policy_reports_overflow():
+    queue = OutboundQueue(3, POLICY_DROP)
+    for i in range(3):
+        assert queue.put(b"state%d" % i, "CLUE_PHASE")
+    assert not queue.put(b"state3", "CLUE_PHASE")
+    assert queue.coalesced == 0
+
+
+def test_coalesce_policy_keeps_newest_state_update():
+    queue = OutboundQueue(3, POLICY_COALESCE)
+    assert queue.put(b"clue|")
+    for i in range(10):
+        assert queue.put(b"turn%d|" % i, "CLUE_PHASE")
+    assert queue.size <= 3
+    assert queue.coalesced > 0
+    # Coalescing only kicks in at capacity: the clue survives, the newest update is last
+    chunk = queue.take_nowait()
+    assert chunk.startswith(b"clue|") and chunk.endswith(b"turn9|")
+    assert chunk.count(b"|") <= 3
+
+
+def test_coalesce_policy_still_drops_when_nothing_can_go():
+    queue = OutboundQueue(3, POLICY_COALESCE)
+    for i in range(3):
+        assert queue.put(b"clue%d" % i)
+    assert not queue.put(b"clue3")
+
+
+def test_keeps_order_across_phases():
+    queue = OutboundQueue(4, POLICY_COALESCE)
+    for packet, key in ((b"a", "CLUE_PHASE"), (b"b", None), (b"c", "VOTING"), (b"d", "CLUE_PHASE"), (b"e", None)):
+        assert queue.put(packet, key)
+    assert queue.take_nowait() == b"bcde"
+
+
+def test_closed_queue_swallows_puts():
+    queue = OutboundQueue(1, POLICY_DROP)
+    queue.close()
+    assert queue.put(b"late")
+    assert queue.take() is None
+
+
+def test_only_state_updates_coalesce():
+    assert coalesce_key_for({"type": MSG_STATE_UPDATE, "phase": "VOTING"}) == "VOTING"
+    assert coalesce_key_for({"type": MSG_CLUE, "sender": "a", "clue": "b"}) is None
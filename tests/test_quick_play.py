@@ -0,0 +1,48 @@
+from game_manager import game_manager
+from protocol import MSG_CREATE_GAME, MSG_LEAVE, MSG_LOGIN, MSG_QUICK_PLAY
+from test_resume import RecordingHandler
+
+
+def logged_in(name):
+    handler = RecordingHandler(name)
+    handler.handle_message({"type": MSG_LOGIN, "nickname": name})
+    return handler
+
+
+def test_quick_play_never_joins_a_private_lobby():
+    host = logged_in("host")
+    host.handle_message({"type": MSG_CREATE_GAME})
+    private = host.lobby
+
+    stranger = logged_in("stranger")
+    stranger.handle_message({"type": MSG_QUICK_PLAY})
+    assert stranger.lobby is not None and stranger.lobby is not private
+    assert list(private.players) == ["host"]
+    assert stranger.received[-1]["quick_play"] is True
+
+    for handler in (host, stranger):
+        handler.cleanup()
+
+
+def test_host_can_open_a_lobby_to_quick_play():
+    host = logged_in("host")
+    host.handle_message({"type": MSG_CREATE_GAME, "settings": {"quick_play": True, "auto_start": False}})
+    stranger = logged_in("stranger")
+    stranger.handle_message({"type": MSG_QUICK_PLAY})
+    assert stranger.lobby is host.lobby
+
+    for handler in (host, stranger):
+        handler.cleanup()
+
+
+def test_players_matched_into_an_open_lobby_start_it():
+    players = [logged_in(f"p{i}") for i in range(game_manager.settings["min_players"])]
+    for player in players:
+        player.handle_message({"type": MSG_QUICK_PLAY})
+    lobby = players[0].lobby
+    assert all(player.lobby is lobby for player in players)
+    assert lobby.state == "PLAYING"
+
+    for player in players:
+        player.handle_message({"type": MSG_LEAVE})
+    assert game_manager.get_lobby(lobby.code) is None
@@ -0,0 +1,41 @@
+import json
+
+from client_handler import SessionHandler
+from game_manager import game_manager
+from protocol import FRAME_HEADER, MSG_CREATE_GAME, MSG_ERROR, MSG_JOIN_GAME, MSG_LOGIN, MSG_RESUME
+from simulation import PLAIN_CIPHER
+
+
+class RecordingHandler(SessionHandler):
+    def __init__(self, name):
+        SessionHandler.__init__(self, (name, 0), PLAIN_CIPHER)
+        self.received = []
+
+    def send_packet(self, packet, coalesce_key=None):
+        self.received.append(json.loads(packet[FRAME_HEADER.size:]))
+
+
+def test_resume_is_refused_while_seated():
+    host = RecordingHandler("host")
+    host.handle_message({"type": MSG_LOGIN, "nickname": "host"})
+    host.handle_message({"type": MSG_CREATE_GAME})
+    first = host.lobby
+    token = host.received[-1]["resume_token"]
+
+    other = RecordingHandler("other")
+    other.handle_message({"type": MSG_LOGIN, "nickname": "other"})
+    other.handle_message({"type": MSG_CREATE_GAME})
+    second = other.lobby
+    guest = RecordingHandler("guest")
+    guest.handle_message({"type": MSG_LOGIN, "nickname": "guest"})
+    guest.handle_message({"type": MSG_JOIN_GAME, "code": second.code})
+
+    # Seated in the second lobby, the guest tries to take the host's seat in the first
+    guest.handle_message({"type": MSG_RESUME, "code": first.code, "nickname": "host", "token": token})
+    assert guest.received[-1] == {"type": MSG_ERROR, "message": "Already in a lobby"}
+    assert guest.lobby is second and second.players["guest"] is guest
+    assert first.players["host"] is host
+
+    for handler in (host, other, guest):
+        handler.cleanup()
+    assert game_manager.get_lobby(first.code) is None and game_manager.get_lobby(second.code) is None
@@ -0,0 +1,60 @@
+import os
+import time
+
+import pytest
+
+from session_crypto import (AEAD_AESGCM, COUNTER, FEED_COUNTER_BASE, REPLAY_WINDOW, SessionCipher, SessionError,
+                            accept_session, complete_session, offer_session)
+
+
+def pair():
+    kx, offer = offer_session()
+    fields, server = accept_session({"kx": offer["kx"], "aeads": offer["aeads"]})
+    return complete_session(kx, fields), server
+
+
+def test_round_trip_both_ways():
+    client, server = pair()
+    assert server.decrypt(client.encrypt(b"hello")) == b"hello"
+    assert client.decrypt(server.encrypt(b"world")) == b"world"
+
+
+def test_replayed_frame_is_refused():
+    client, server = pair()
+    frame = client.encrypt(b"vote")
+    server.decrypt(frame)
+    with pytest.raises(SessionError):
+        server.decrypt(frame)
+
+
+def test_out_of_order_inside_the_window():
+    client, server = pair()
+    frames = [client.encrypt(b"%d" % i) for i in range(10)]
+    for frame in reversed(frames):
+        server.decrypt(frame)
+
+
+def test_huge_counter_jump_is_cheap():
+    key = os.urandom(32)
+    sender = SessionCipher(AEAD_AESGCM, key, key)
+    receiver = SessionCipher(AEAD_AESGCM, key, key)
+    receiver.decrypt(sender.encrypt(b"first"))
+    start = time.perf_counter()
+    for jump in (1 << 31, 1 << 40, FEED_COUNTER_BASE):
+        sender.send_counter = iter([receiver.recv_highest + jump])
+        receiver.decrypt(sender.encrypt(b"far ahead"))
+        assert receiver.recv_seen == 1
+        assert receiver.recv_seen.bit_length() <= REPLAY_WINDOW
+    assert time.perf_counter() - start < 0.1
+    # Everything from before the jump is now stale
+    sender.send_counter = iter([1])
+    with pytest.raises(SessionError):
+        receiver.decrypt(sender.encrypt(b"old"))
+
+
+def test_tampered_frame_is_refused():
+    client, server = pair()
+    frame = bytearray(client.encrypt(b"clue"))
+    frame[COUNTER.size] ^= 1
+    with pytest.raises(SessionError):
+        server.decrypt(bytes(frame))
@@ -0,0 +1,90 @@
+import socket
+import threading
+import time
+
+import pytest
+from cryptography.fernet import Fernet
+
+from client_handler import ClientHandler
+from game_manager import game_manager
+from lobby_logic import Lobby
+from protocol import FrameDecoder, MSG_CLUE, MSG_STATE_UPDATE, get_protocol_key
+
+BROADCASTS = 200
+FAST_PLAYERS = 3
+
+
+def count_frames(sock, counts, index):
+    decoder = FrameDecoder()
+    try:
+        while True:
+            data = sock.recv(65536)
+            if not data:
+                break
+            counts[index] += len(decoder.feed(data))
+    except OSError:
+        pass
+
+
+def make_player(lobby, nickname, cipher):
+    server_end, client_end = socket.socketpair()
+    # Small buffers so the non-reading side backs up after a few messages
+    for s in (server_end, client_end):
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    handler = ClientHandler(server_end, (nickname, 0), cipher)
+    handler.nickname = nickname
+    handler.start()
+    lobby.players[nickname] = handler
+    handler.lobby = lobby
+    return handler, client_end
+
+
+@pytest.mark.parametrize("policy", ["drop", "coalesce"])
+def test_client_that_never_reads_does_not_hold_up_the_others(policy, monkeypatch):
+    monkeypatch.setitem(game_manager.settings, "outbound_overflow_policy", policy)
+    monkeypatch.setitem(game_manager.settings, "outbound_queue_size", 32)
+    cipher = Fernet(get_protocol_key())
+    lobby = Lobby(f"SLOW{policy[:2].upper()}", {**game_manager.settings, "max_players": FAST_PLAYERS + 1},
+                  game_manager.word_bank)
+
+    counts = [0] * FAST_PLAYERS
+    sockets = []
+    for i in range(FAST_PLAYERS):
+        client_end = make_player(lobby, f"fast{i}", cipher)[1]
+        threading.Thread(target=count_frames, args=(client_end, counts, i), daemon=True).start()
+        sockets.append(client_end)
+    slow, slow_end = make_player(lobby, "slow", cipher)
+    sockets.append(slow_end)
+
+    slowest = 0
+    for i in range(BROADCASTS):
+        # Drop policy: clues can't be coalesced away, so the queue has to overflow
+        if policy == "drop" and i % 10 == 0:
+            message = {"type": MSG_CLUE, "sender": "fast0", "clue": f"clue{i}"}
+        else:
+            message = {"type": MSG_STATE_UPDATE, "phase": "CLUE_PHASE", "current_turn": f"fast{i % FAST_PLAYERS}"}
+        start = time.perf_counter()
+        lobby.broadcast(message)
+        slowest = max(slowest, time.perf_counter() - start)
+        time.sleep(0.002)
+
+    deadline = time.time() + 5
+    while min(counts) < BROADCASTS and time.time() < deadline:
+        time.sleep(0.01)
+    try:
+        # (plus the "slow left" update once the slow client is dropped)
+        assert all(count >= BROADCASTS for count in counts)
+        assert slowest < 0.5 # never waited on the slow client's socket
+        if policy == "drop":
+            while "slow" in lobby.players and time.time() < deadline:
+                time.sleep(0.01)
+            assert "slow" not in lobby.players
+        else:
+            assert lobby.players.get("slow") is slow
+            assert slow.outbound.coalesced > 0
+            assert slow.outbound.size <= 32
+    finally:
+        for s in sockets:
+            s.shutdown(socket.SHUT_RDWR)
+            s.close()
@@ -0,0 +1,51 @@
+import time
+
+from game_manager import game_manager
+from outbound import POLICY_COALESCE
+from protocol import MSG_CREATE_GAME, MSG_LOGIN, MSG_SPECTATE
+from test_resume import RecordingHandler
+
+
+def logged_in(name):
+    handler = RecordingHandler(name)
+    handler.handle_message({"type": MSG_LOGIN, "nickname": name})
+    return handler
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_closed_lobby_lets_its_spectators_go():
+    host = logged_in("host")
+    host.handle_message({"type": MSG_CREATE_GAME})
+    lobby = host.lobby
+    watcher = logged_in("watcher")
+    watcher.handle_message({"type": MSG_SPECTATE, "code": lobby.code})
+    assert watcher.watching is lobby and watcher.outbound.policy == POLICY_COALESCE
+
+    host.cleanup() # last player gone: the lobby closes
+    assert wait_for(lambda: watcher.watching is None)
+    assert watcher.outbound.policy == game_manager.settings.get("outbound_overflow_policy", "drop")
+    watcher.cleanup()
+
+
+def test_late_notice_from_an_old_feed_does_not_undo_a_new_one():
+    hosts = [logged_in(f"host{i}") for i in range(2)]
+    for host in hosts:
+        host.handle_message({"type": MSG_CREATE_GAME})
+    first, second = (host.lobby for host in hosts)
+    watcher = logged_in("watcher")
+    watcher.handle_message({"type": MSG_SPECTATE, "code": first.code})
+    watcher.handle_message({"type": MSG_SPECTATE, "code": second.code})
+    assert watcher.watching is second
+
+    # The first feed's close notice arrives after the switch
+    watcher.unwatch_command(first)
+    assert watcher.watching is second and watcher.outbound.policy == POLICY_COALESCE
+
+    for handler in hosts + [watcher]:
+        handler.cleanup()